@@ -0,0 +1,146 @@
+"""
+BGE 编码器推理后端对比
+在固定语料上分别用各个后端编码，和 fp32 PyTorch 基线比较：
+- 一致性：逐条余弦相似度（平均 / 最小）和语料内 top-k 近邻的重合率
+- 吞吐：每秒编码的文本数
+
+用法：
+    python benchmarks/embedding_backends.py
+    python benchmarks/embedding_backends.py --backends torch onnx-int8 --corpus-file texts.txt
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.embedding_backends import BACKENDS, BACKEND_TORCH
+from core.embedding_processor import BgeTextEmbedder
+
+# 固定语料：部件名称（短）和部件描述（长）混合
+DEFAULT_CORPUS = [
+    "轮毂", "座椅", "方向盘", "前大灯", "尾灯", "发动机", "变速箱", "中控屏", "天窗", "后视镜",
+    "刹车卡钳", "轮胎", "车门把手", "仪表盘", "空调出风口", "后备箱", "充电口", "雨刮器", "进气格栅", "排气管",
+    "19英寸双五辐铝合金轮毂，搭配低滚阻轮胎，兼顾操控与续航",
+    "主驾座椅支持十二向电动调节，带通风、加热和按摩功能",
+    "三辐式多功能方向盘，真皮包裹，集成语音和自适应巡航按键",
+    "矩阵式LED前大灯，支持自动远近光切换和随动转向照明",
+    "贯穿式LED尾灯，点亮后辨识度高，夜间行车更醒目",
+    "2.0T涡轮增压发动机，最大功率185千瓦，峰值扭矩380牛米",
+    "8速手自一体变速箱，换挡平顺，支持运动模式和手动换挡",
+    "15.6英寸中控大屏，搭载车机系统，支持导航、音乐和车辆设置",
+    "全景天窗面积超过一平方米，带电动遮阳帘，后排视野开阔",
+    "电动折叠外后视镜，带加热和盲区监测提示",
+    "前轮四活塞固定式刹车卡钳，制动响应快，热衰减小",
+    "后备箱容积五百升，后排座椅放倒后可进一步扩展装载空间",
+    "支持直流快充，三十分钟可从百分之三十充到百分之八十",
+    "隐藏式电动车门把手，靠近车辆时自动弹出，降低风阻",
+    "液晶仪表盘显示车速、续航、驾驶辅助状态等信息，支持多种主题",
+    "双温区自动空调，支持PM2.5过滤和远程开启",
+    "感应式自动雨刮，根据雨量自动调节刮刷频率",
+    "主动进气格栅在高速行驶时自动关闭，降低风阻提升续航",
+    "双边共两出排气布局，运动模式下声浪更饱满",
+    "车身采用高强度钢和铝合金混合结构，整体扭转刚度高，碰撞安全表现可靠。" * 3,
+]
+
+
+def load_corpus(path: str):
+    if not path:
+        return DEFAULT_CORPUS
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def topk_neighbors(vectors: np.ndarray, k: int) -> np.ndarray:
+    """语料内每条文本的 top-k 近邻（不含自身），向量已归一化，内积即余弦"""
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -np.inf)
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def run_backend(backend: str, corpus, repeat: int, batch_size: int):
+    """加载后端、预热并计时编码，返回向量和统计"""
+    start = time.perf_counter()
+    embedder = BgeTextEmbedder(backend=backend, use_cache=False)
+    load_seconds = time.perf_counter() - start
+
+    embedder.encode_batch(corpus[:batch_size], batch_size=batch_size)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        vectors = embedder.encode_batch(corpus, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return vectors, {
+        "load_seconds": load_seconds,
+        "texts_per_sec": len(corpus) * repeat / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BGE 推理后端一致性和吞吐对比")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--corpus-file", default=None, help="语料文件，每行一条文本")
+    parser.add_argument("--repeat", type=int, default=5, help="计时编码轮数")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=5, help="近邻重合率的 k")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="可接受的最小余弦相似度")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="可接受的最小近邻重合率")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_file)
+    k = min(args.top_k, len(corpus) - 1)
+    backends = [BACKEND_TORCH] + [b for b in args.backends if b != BACKEND_TORCH]
+    print(f"📊 语料 {len(corpus)} 条，计时 {args.repeat} 轮，batch_size={args.batch_size}")
+
+    baseline_vectors = None
+    baseline_neighbors = None
+    results = {}
+    for backend in backends:
+        try:
+            vectors, stats = run_backend(backend, corpus, args.repeat, args.batch_size)
+        except Exception as e:
+            print(f"❌ {backend}: 加载或编码失败 - {e}")
+            continue
+
+        if baseline_vectors is None:
+            baseline_vectors = vectors
+            baseline_neighbors = topk_neighbors(vectors, k)
+
+        cosines = np.sum(vectors * baseline_vectors, axis=1)
+        neighbors = topk_neighbors(vectors, k)
+        overlap = np.mean([
+            len(set(a) & set(b)) / k for a, b in zip(neighbors, baseline_neighbors)
+        ])
+        stats.update({
+            "cosine_mean": float(cosines.mean()),
+            "cosine_min": float(cosines.min()),
+            "recall_at_k": float(overlap),
+        })
+        results[backend] = stats
+        print(f"   {backend:<11} 加载 {stats['load_seconds']:.1f}s | {stats['texts_per_sec']:.1f} 条/s | "
+              f"余弦 平均 {stats['cosine_mean']:.5f} 最小 {stats['cosine_min']:.5f} | "
+              f"top-{k} 重合率 {stats['recall_at_k']:.3f}")
+
+    if BACKEND_TORCH not in results:
+        print("❌ fp32 基线不可用，无法比较")
+        return
+
+    baseline_speed = results[BACKEND_TORCH]["texts_per_sec"]
+    acceptable = [
+        b for b, s in results.items()
+        if s["cosine_min"] >= args.min_cosine and s["recall_at_k"] >= args.min_recall
+    ]
+    best = max(acceptable, key=lambda b: results[b]["texts_per_sec"])
+    print(f"\n✅ 推荐后端: {best}（{results[best]['texts_per_sec'] / baseline_speed:.2f}x fp32 吞吐，"
+          f"最小余弦 {results[best]['cosine_min']:.5f}）")
+    print(f"   设置环境变量 EMBEDDING_BACKEND={best} 启用")
+
+
+if __name__ == "__main__":
+    main()
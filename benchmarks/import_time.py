@@ -0,0 +1,96 @@
+"""
+导入耗时基准
+每个模块在全新的子进程里导入若干次，统计耗时中位数，并列出导入过程中被拉进来的
+重量级依赖（torch / transformers / openai / pymilvus）。
+
+用法：
+    python benchmarks/import_time.py
+    # 和改动前的版本对比
+    git worktree add /tmp/baseline <旧提交>
+    python benchmarks/import_time.py --baseline /tmp/baseline
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+DEFAULT_MODULES = ["config.config", "core.llm_client", "core.embedding_processor", "core.smart_dialogue"]
+HEAVY_MODULES = ["torch", "transformers", "openai", "pymilvus"]
+
+_PROBE = """
+import sys, time, json
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+try:
+    __import__({module!r})
+    error = None
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy, "error": error}}))
+"""
+
+
+def measure(root: str, module: str, repeat: int) -> dict:
+    """在 root 目录下用全新解释器导入 module，返回耗时中位数和加载的重量级依赖"""
+    samples, heavy, error = [], [], None
+    for _ in range(repeat):
+        code = _PROBE.format(root=root, module=module, heavy=HEAVY_MODULES)
+        proc = subprocess.run([sys.executable, "-c", code], cwd=root,
+                              capture_output=True, text=True)
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if not lines:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "无输出"
+            break
+        result = json.loads(lines[-1])
+        if result["error"]:
+            error = result["error"]
+            break
+        samples.append(result["seconds"])
+        heavy = result["heavy"]
+    return {
+        "median_ms": statistics.median(samples) * 1000 if samples else None,
+        "heavy": heavy,
+        "error": error
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模块导入耗时基准")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="要测量的模块")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块导入次数")
+    parser.add_argument("--baseline", default=None, help="用于对比的旧版本代码目录")
+    args = parser.parse_args()
+
+    roots = [("当前", project_root)]
+    if args.baseline:
+        roots.insert(0, ("基线", os.path.abspath(args.baseline)))
+
+    print(f"⏱️ 导入耗时基准（每个模块 {args.repeat} 次，取中位数）")
+    for module in args.modules:
+        print(f"\n📦 {module}")
+        results = {}
+        for label, root in roots:
+            result = measure(root, module, args.repeat)
+            results[label] = result
+            if result["error"]:
+                print(f"   {label}: ❌ 导入失败 - {result['error']}")
+            else:
+                heavy = ", ".join(result["heavy"]) or "无"
+                print(f"   {label}: {result['median_ms']:.1f}ms，加载的重量级依赖: {heavy}")
+
+        base, current = results.get("基线"), results["当前"]
+        if base and base["median_ms"] and current["median_ms"]:
+            print(f"   提升: {base['median_ms'] / current['median_ms']:.1f}x "
+                  f"（{base['median_ms'] - current['median_ms']:.1f}ms）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+检索索引的召回率 / 延迟评估与参数推荐
+1. 从向量库导出全部部件向量，暴力计算每个查询的精确 top-k 作为标准答案
+2. 遍历索引类型和参数（FLAT、IVF_FLAT、IVF_SQ8、HNSW），记录 recall@k、单条查询
+   p50 / p99 延迟和索引内存估算
+3. 在满足目标召回率的配置里选 p99 最低的，输出推荐的建索引参数和检索参数
+
+查询默认取库内向量加少量高斯噪声（模拟检测标签和部件名称不完全一致），
+也可以用 --query-file 提供真实的检测标签文本（需要加载 BGE 模型编码）。
+
+--engine milvus 在 Milvus 里为每个索引配置建一个临时集合（<collection_name>_bench），评测后删除；
+--engine local 使用进程内向量库，只支持 FLAT 和 IVF_FLAT。
+
+用法：
+    python benchmarks/retrieval_index.py
+    python benchmarks/retrieval_index.py --source local --engine local --top-k 5
+    python benchmarks/retrieval_index.py --source synthetic --num-vectors 5000 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import tempfile
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from config.config import MILVUS_CONFIG, MODEL_CONFIG
+from core.vector_store import BACKEND_LOCAL, BACKEND_MILVUS, create_vector_store
+
+INDEX_TYPES = ("FLAT", "IVF_FLAT", "IVF_SQ8", "HNSW")
+NPROBE_GRID = (1, 2, 4, 8, 16, 32, 64, 128)
+HNSW_M_GRID = (8, 16, 32)
+HNSW_EF_GRID = (16, 32, 64, 128, 256)
+
+
+# ================== 数据准备 ==================
+
+def load_vectors(source: str, num_vectors: int, seed: int) -> np.ndarray:
+    """从向量库导出全部向量；synthetic 时生成带聚类结构的归一化随机向量"""
+    if source == "synthetic":
+        rng = np.random.default_rng(seed)
+        dim = MODEL_CONFIG.embedding_dim
+        centers = rng.standard_normal((max(1, num_vectors // 50), dim))
+        vectors = centers[rng.integers(0, len(centers), num_vectors)] + 0.3 * rng.standard_normal((num_vectors, dim))
+        return _normalize(vectors)
+
+    store = create_vector_store(source, use_directory=False)
+    try:
+        _, vectors = store.export_vectors()
+    finally:
+        store.close()
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, num_queries: int, noise: float, seed: int,
+                 query_file: str = None) -> np.ndarray:
+    """查询向量：--query-file 中的文本编码结果，或库内向量加噪声"""
+    if query_file:
+        from core.embedding_processor import BgeTextEmbedder, USE_CASE_NAME
+        with open(query_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return BgeTextEmbedder(use_cache=False).encode_batch(texts, use_case=USE_CASE_NAME)
+
+    rng = np.random.default_rng(seed + 1)
+    picks = rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)
+    return _normalize(vectors[picks] + noise * rng.standard_normal((len(picks), vectors.shape[1])))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    return (matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)).astype(np.float32)
+
+
+def ground_truth(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    """暴力计算精确 top-k 行号（内积，向量已归一化）"""
+    scores = queries @ vectors.T
+    if MILVUS_CONFIG.metric_type == "L2":
+        scores = 2 * scores - np.einsum("ij,ij->i", vectors, vectors)[None, :]
+    top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+# ================== 参数网格 ==================
+
+def nlist_candidates(num_vectors: int):
+    """nlist 取 sqrt(N) 的 0.5 ~ 4 倍（取 2 的幂），再加上当前配置值作对比"""
+    base = math.sqrt(num_vectors)
+    values = {max(1, 2 ** round(math.log2(base * factor))) for factor in (0.5, 1, 2, 4)}
+    values.add(MILVUS_CONFIG.nlist)
+    return sorted(v for v in values if v <= num_vectors)
+
+
+def build_grid(index_types, num_vectors: int, top_k: int, hnsw_ef_construction: int):
+    """
+    Returns:
+        [(index_type, 建索引参数, [检索参数, ...]), ...]
+    """
+    grid = []
+    for index_type in index_types:
+        if index_type == "FLAT":
+            grid.append(("FLAT", {}, [{}]))
+        elif index_type in ("IVF_FLAT", "IVF_SQ8"):
+            for nlist in nlist_candidates(num_vectors):
+                grid.append((index_type, {"nlist": nlist},
+                             [{"nprobe": nprobe} for nprobe in NPROBE_GRID if nprobe <= nlist]))
+        elif index_type == "HNSW":
+            for m in HNSW_M_GRID:
+                grid.append(("HNSW", {"M": m, "efConstruction": hnsw_ef_construction},
+                             [{"ef": ef} for ef in HNSW_EF_GRID if ef >= top_k]))
+    return grid
+
+
+def estimate_index_bytes(index_type: str, build_params: dict, num_vectors: int, dim: int) -> int:
+    """索引内存估算（原始向量 + 量化 / 聚类中心 / 图结构），不含 Milvus 自身开销"""
+    raw = num_vectors * dim * 4
+    if index_type == "FLAT":
+        return raw
+    if index_type == "IVF_FLAT":
+        return raw + build_params["nlist"] * dim * 4
+    if index_type == "IVF_SQ8":
+        return num_vectors * dim + build_params["nlist"] * dim * 4
+    if index_type == "HNSW":
+        # 第 0 层每个节点 2M 条边，上层平均约 M / (M - 1) 倍的额外开销，每条边 4 字节
+        return raw + int(num_vectors * build_params["M"] * 2 * 4 * 1.1)
+    return raw
+
+
+# ================== 评测引擎 ==================
+
+class LocalEngine:
+    """进程内向量库（FLAT / IVF_FLAT）"""
+
+    supported = ("FLAT", "IVF_FLAT")
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.ids = [str(i) for i in range(len(vectors))]
+
+    def build(self, index_type: str, build_params: dict):
+        from core.local_vector_store import LocalVectorStore
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = LocalVectorStore(
+            store_dir=self._tmp.name,
+            index_type="FLAT" if index_type == "FLAT" else "IVF",
+            nlist=build_params.get("nlist"),
+            ivf_min_rows=0,
+            use_directory=False
+        )
+        self.store.upsert_components(self.ids, self.vectors, [""] * len(self.ids), flush=False)
+        self.store.search(self.vectors[:1], top_k=1)  # 触发 IVF 训练
+
+    def search(self, query: np.ndarray, top_k: int, search_params: dict):
+        hits = self.store.search(query[None, :], top_k=top_k, nprobe=search_params.get("nprobe"),
+                                 output_fields=())[0]
+        return [int(hit.component_id) for hit in hits]
+
+    def drop(self):
+        self.store.close()
+        self._tmp.cleanup()
+
+
+class MilvusEngine:
+    """为每个索引配置在 Milvus 里建一个临时集合"""
+
+    supported = INDEX_TYPES
+
+    def __init__(self, vectors: np.ndarray, insert_batch_size: int = 5000):
+        from pymilvus import connections, utility, Collection, CollectionSchema, FieldSchema, DataType
+        self._utility = utility
+        self._Collection = Collection
+        connections.connect(host=MILVUS_CONFIG.host, port=MILVUS_CONFIG.port)
+
+        self.vectors = vectors
+        self.insert_batch_size = insert_batch_size
+        self.collection_name = f"{MILVUS_CONFIG.collection_name}_bench"
+        self.schema = CollectionSchema(fields=[
+            FieldSchema(name="row", dtype=DataType.INT64, is_primary=True),
+            FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=vectors.shape[1])
+        ], description="索引参数评测临时集合")
+
+    def build(self, index_type: str, build_params: dict):
+        if self._utility.has_collection(self.collection_name):
+            self._utility.drop_collection(self.collection_name)
+        self.collection = self._Collection(name=self.collection_name, schema=self.schema)
+        for start in range(0, len(self.vectors), self.insert_batch_size):
+            chunk = self.vectors[start:start + self.insert_batch_size]
+            self.collection.insert([list(range(start, start + len(chunk))), chunk])
+        self.collection.flush()
+        self.collection.create_index(field_name="vector", index_params={
+            "index_type": index_type,
+            "metric_type": MILVUS_CONFIG.metric_type,
+            "params": build_params
+        })
+        self.collection.load()
+
+    def search(self, query: np.ndarray, top_k: int, search_params: dict):
+        results = self.collection.search(
+            data=query[None, :],
+            anns_field="vector",
+            param={"metric_type": MILVUS_CONFIG.metric_type, "params": search_params},
+            limit=top_k
+        )
+        return [int(hit.id) for hit in results[0]]
+
+    def drop(self):
+        self.collection.release()
+        self._utility.drop_collection(self.collection_name)
+
+
+def run_config(engine, index_type, build_params, search_grid, queries, truth, top_k, warmup):
+    """建一次索引，依次评测各组检索参数"""
+    build_start = time.perf_counter()
+    engine.build(index_type, build_params)
+    build_seconds = time.perf_counter() - build_start
+
+    rows = []
+    try:
+        for search_params in search_grid:
+            for query in queries[:warmup]:
+                engine.search(query, top_k, search_params)
+
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = engine.search(query, top_k, search_params)
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(set(found) & set(expected.tolist())) / top_k)
+
+            rows.append({
+                "index_type": index_type,
+                "build_params": build_params,
+                "search_params": search_params,
+                "recall": float(np.mean(recalls)),
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99)),
+                "memory_mb": estimate_index_bytes(index_type, build_params, *engine.vectors.shape) / 2 ** 20,
+                "build_seconds": build_seconds
+            })
+            print_row(rows[-1])
+    finally:
+        engine.drop()
+    return rows
+
+
+def recommend(rows, target_recall: float):
+    """满足目标召回率的配置里选 p99 最低的（相同时选内存小的）；都不满足时选召回率最高的"""
+    qualified = [row for row in rows if row["recall"] >= target_recall]
+    if qualified:
+        return min(qualified, key=lambda row: (round(row["p99_ms"], 2), row["memory_mb"]))
+    return max(rows, key=lambda row: (row["recall"], -row["p99_ms"]))
+
+
+def _params_text(params: dict) -> str:
+    return ",".join(f"{key}={value}" for key, value in params.items()) or "-"
+
+
+def print_row(row) -> None:
+    print(f"{row['index_type']:<10}{_params_text(row['build_params']):<28}{_params_text(row['search_params']):<14}"
+          f"{row['recall']:>9.4f}{row['p50_ms']:>10.3f}{row['p99_ms']:>10.3f}{row['memory_mb']:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检索索引召回率 / 延迟评估与参数推荐")
+    parser.add_argument("--source", default=MILVUS_CONFIG.backend,
+                        choices=[BACKEND_MILVUS, BACKEND_LOCAL, "synthetic"], help="向量来源")
+    parser.add_argument("--engine", choices=[BACKEND_MILVUS, BACKEND_LOCAL],
+                        help="评测引擎，默认与来源相同（synthetic 时为 local）")
+    parser.add_argument("--index-types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--num-vectors", type=int, default=5000, help="synthetic 时生成的向量数")
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--query-file", help="每行一个检测标签文本，用 BGE 编码后作为查询")
+    parser.add_argument("--noise", type=float, default=0.05, help="库内向量作查询时加的噪声标准差")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--hnsw-ef-construction", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把全部结果和推荐配置写到 JSON 文件")
+    args = parser.parse_args()
+
+    engine_name = args.engine or (BACKEND_LOCAL if args.source == "synthetic" else args.source)
+
+    vectors = load_vectors(args.source, args.num_vectors, args.seed)
+    if len(vectors) == 0:
+        print("❌ 向量库为空，先入库或使用 --source synthetic")
+        return
+    queries = make_queries(vectors, args.num_queries, args.noise, args.seed, args.query_file)
+    top_k = min(args.top_k, len(vectors))
+
+    truth_start = time.perf_counter()
+    truth = ground_truth(vectors, queries, top_k)
+    print(f"📊 {len(vectors)} 条向量 × {vectors.shape[1]} 维, {len(queries)} 个查询, "
+          f"精确 top-{top_k} 计算耗时 {time.perf_counter() - truth_start:.2f}s, 评测引擎: {engine_name}")
+
+    engine = MilvusEngine(vectors) if engine_name == BACKEND_MILVUS else LocalEngine(vectors)
+    index_types = [t for t in args.index_types if t in engine.supported]
+    skipped = [t for t in args.index_types if t not in engine.supported]
+    if skipped:
+        print(f"⚠️ {engine_name} 引擎不支持 {', '.join(skipped)}，已跳过（使用 --engine milvus 评测）")
+
+    print(f"\n{'index':<10}{'build':<28}{'search':<14}{f'recall@{top_k}':>9}{'p50 ms':>10}{'p99 ms':>10}{'mem MB':>11}")
+    print("-" * 92)
+    rows = []
+    for index_type, build_params, search_grid in build_grid(index_types, len(vectors), top_k,
+                                                            args.hnsw_ef_construction):
+        rows.extend(run_config(engine, index_type, build_params, search_grid, queries, truth,
+                               top_k, args.warmup))
+
+    best = recommend(rows, args.target_recall)
+    print(f"\n✅ 推荐配置（{len(vectors)} 条向量, 目标 recall@{top_k} >= {args.target_recall}）:")
+    print(f"  MilvusConfig.index_type          = {best['index_type']!r}")
+    print(f"  MilvusConfig.index_build_params  = {json.dumps(best['build_params'])}")
+    print(f"  MilvusConfig.index_search_params = {json.dumps(best['search_params'])}")
+    print(f"  已有集合用 MilvusDataManager.rebuild_index(IndexSpec(...)) 不停服切换")
+    print(f"  recall@{top_k} = {best['recall']:.4f}, p50 = {best['p50_ms']:.3f}ms, "
+          f"p99 = {best['p99_ms']:.3f}ms, 内存约 {best['memory_mb']:.1f}MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "num_vectors": len(vectors),
+                "dim": int(vectors.shape[1]),
+                "num_queries": len(queries),
+                "top_k": top_k,
+                "engine": engine_name,
+                "target_recall": args.target_recall,
+                "results": rows,
+                "recommended": best
+            }, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -127,9 +127,9 @@
 #
 # config/config.py
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from typing import Optional
-import torch
 
 # 获取当前文件路径
 current_file_dir = os.path.dirname(os.path.abspath(__file__))
@@ -137,18 +137,38 @@ current_file_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_file_dir)
 # print("当前文件路径",current_file_dir)
 # print("父目录",parent_dir)
+
+
+@lru_cache(maxsize=1)
+def detect_device() -> str:
+    """检测可用设备，首次调用时才导入 torch（导入 torch 要好几秒）"""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
 @dataclass           # 装饰器
 class ModelConfig:
     """模型配置 - 改为 BGE 文本嵌入"""
     # 移除 clip_model_name（不再适用）
     embedding_model: str = "BAAI/bge-small-zh-v1.5"  # 或 bge-small-zh-v1.5
     embedding_dim: int = 512  # bge-base 是 768；bge-small 是 512！注意匹配
-    device: str = "cuda" if torch.cuda.is_available() else "cpu"
+    device_override: Optional[str] = os.getenv("EMBEDDING_DEVICE")  # 手动指定设备，不指定时自动检测
+    max_length: int = 512                       # 长描述（passage）的分词截断长度
+    max_length_name: int = 64                   # 部件名称 / 检测标签（name）的分词截断长度
+    embedding_cache_size: int = 10000           # 向量内存缓存条数，0 表示不缓存
+    embedding_cache_dir: Optional[str] = os.getenv("EMBEDDING_CACHE_DIR")  # 向量磁盘缓存目录，None 时只用内存
     project_root = os.path.dirname(os.path.dirname(__file__))  # 假设当前文件在 core/ 下
     local_model_path: str = os.path.join(project_root, "models", "BAAI_bge-small-zh-v1.5")
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "torch")  # torch / torch-int8 / onnx / onnx-int8
+    backend_cache_dir: str = os.getenv("EMBEDDING_BACKEND_CACHE_DIR", os.path.join(project_root, "models", "optimized"))  # 量化 / ONNX 模型缓存目录
     # local_model_path: str = os.path.join(parent_dir, "models", "BAAI_bge-small-zh-v1.5")
     # local_model_path: str = "D:/Code/data_process/models/chinese-clip"
 
+    @property
+    def device(self) -> str:
+        """运行设备，第一次访问时才检测 CUDA"""
+        return self.device_override or detect_device()
+
 @dataclass
 class MilvusConfig:
     """Milvus 配置"""
@@ -157,13 +177,33 @@ class MilvusConfig:
     # host: str = os.getenv("MILVUS_HOST", "192.168.255.6")
     host: str = os.getenv("MILVUS_HOST", "192.168.110.217")
     port: int = int(os.getenv("MILVUS_PORT", "19530"))
-    collection_name: str = "RAG_data2"
+    collection_name: str = "RAG_data2"  # 读写都用这个名称；新建时它是指向 <name>_v1 的别名，重建索引时切换别名
 
     # 索引配置
-    index_type: str = "IVF_FLAT"    # 索引类型
+    index_type: str = os.getenv("MILVUS_INDEX_TYPE", "IVF_FLAT")  # FLAT / IVF_FLAT / IVF_SQ8 / IVF_PQ / HNSW / DISKANN
     metric_type: str = "IP"         # 内积，适合CLIP归一化向量
     nlist: int = 1024               # nlist：聚类中心数量（Number of Clusters）
     nprobe: int = 10                # nprobe：查询时扫描的簇数量
+    # 覆盖默认的建索引 / 检索参数（默认值见 core/index_spec.py），例如 HNSW: {"M": 32, "efConstruction": 256} / {"ef": 128}
+    index_build_params: dict = field(default_factory=dict)
+    index_search_params: dict = field(default_factory=dict)
+
+    # 写入配置
+    upsert_batch_size: int = 1000   # 批量写入时每次 upsert 的行数
+
+    # 检索结果缓存：同一个检测标签反复检索时直接返回，任何写入都会让缓存失效
+    result_cache_size: int = 2048               # 缓存的查询数，0 表示不缓存
+    result_cache_ttl: float = 60.0              # 有效期（秒），也是其他进程写入后最长的过期时间
+    result_cache_settle_seconds: float = 5.0    # Bounded 一致性下写入后这段时间内的检索结果不缓存
+
+    # 部件名称目录：检测标签与部件名称 / 别名精确匹配时跳过向量检索
+    alias_file: str = os.path.join(current_file_dir, "component_aliases.json")  # {"中控屏": ["中控大屏", ...]}，不存在时忽略
+    directory_refresh_seconds: float = 300.0  # 后台线程定期重新加载目录，同步其他进程的入库结果；<= 0 不刷新
+
+    # 存储后端："milvus" 使用 Milvus 服务；"local" 使用进程内 NumPy 向量库（开发 / CI / 离线演示，无需服务）
+    backend: str = os.getenv("VECTOR_STORE_BACKEND", "milvus")
+    local_store_dir: str = os.getenv("LOCAL_STORE_DIR", os.path.join(parent_dir, "data", "vector_store"))
+    local_index_type: str = "FLAT"  # local 后端的索引："FLAT" 暴力检索；"IVF" 倒排（簇数不超过 nlist）
 
     # 分片配置
     # shards_num: int = 2 # 可以在MIlvus集群时用，这里是（单机）模式，不是集群（Cluster）模式
@@ -181,6 +221,7 @@ class DataConfig:
     # data_root: str = "D:/RAG_img/data"
     data_root: str = os.path.join(parent_dir,"data")
     # print(data_root)
+    manifest_name: str = ".ingest_manifest.sqlite"  # 入库清单文件名，位于 data_root 下
 
 
 # 全局配置实例
@@ -0,0 +1,162 @@
+"""
+后台事件循环
+一个常驻线程运行一个 asyncio 事件循环，同步代码把协程提交进来执行。
+所有调用共享同一个事件循环，AsyncOpenAI 的 HTTP 连接池因此可以跨调用复用。
+"""
+
+import time
+import atexit
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import Future
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger("background_loop")
+
+# 进程内还在运行的后台事件循环；退出钩子只注册一次，弱引用不会让已丢弃的实例常驻内存
+_live_loops: "weakref.WeakSet[BackgroundLoop]" = weakref.WeakSet()
+_atexit_lock = threading.Lock()
+_atexit_registered = False
+
+
+def _close_live_loops() -> None:
+    """进程退出时关闭所有还在运行的后台事件循环"""
+    for background_loop in list(_live_loops):
+        background_loop.close()
+
+
+def _register_atexit_once() -> None:
+    global _atexit_registered
+    with _atexit_lock:
+        if not _atexit_registered:
+            atexit.register(_close_live_loops)
+            _atexit_registered = True
+
+
+class BackgroundLoop:
+    """常驻后台事件循环，限制同时在执行的协程数量"""
+
+    def __init__(self, max_in_flight: int = 8, name: str = "background-loop"):
+        """
+        Args:
+            max_in_flight: 同时在执行的协程数量上限
+            name: 后台线程名称
+        """
+        self.max_in_flight = max_in_flight
+        self.name = name
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环（首次访问时启动线程）"""
+        self._ensure_started()
+        return self._loop
+
+    def _ensure_started(self) -> None:
+        if self._loop is not None:
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("后台事件循环已关闭")
+            if self._loop is not None:
+                return
+
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=_run, name=self.name, daemon=True)
+            self._thread.start()
+            started.wait()
+            self._loop = loop
+            _live_loops.add(self)
+            _register_atexit_once()
+            logger.info(f"🔁 后台事件循环已启动: {self.name}")
+
+    def submit(self, coro: Coroutine, acquire_timeout: Optional[float] = None) -> Future:
+        """
+        提交协程到后台事件循环
+
+        Args:
+            coro: 要执行的协程
+            acquire_timeout: 等待执行名额的最长时间（秒），None 表示一直等待
+
+        Returns:
+            concurrent.futures.Future
+
+        Raises:
+            TimeoutError: 在 acquire_timeout 内没有空闲名额
+        """
+        if not self._slots.acquire(timeout=acquire_timeout):
+            coro.close()
+            raise TimeoutError(f"后台事件循环繁忙（在执行 {self.max_in_flight} 个任务）")
+
+        try:
+            future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        except Exception:
+            self._slots.release()
+            coro.close()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """
+        同步执行协程并等待结果，超时后取消后台任务
+
+        Args:
+            coro: 要执行的协程
+            timeout: 总超时时间（秒），包括等待执行名额的时间
+
+        Returns:
+            协程的返回值
+        """
+        start_time = time.monotonic()
+        future = self.submit(coro, acquire_timeout=timeout)
+        remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start_time))
+        try:
+            return future.result(timeout=remaining)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self, timeout: float = 5.0) -> None:
+        """停止事件循环并等待后台线程退出"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            loop, thread = self._loop, self._thread
+        _live_loops.discard(self)
+
+        if loop is None:
+            return
+
+        async def _shutdown():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await loop.shutdown_asyncgens()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ 关闭后台任务时出错: {e}")
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=timeout)
+        if not thread.is_alive():
+            loop.close()
+        logger.info(f"🛑 后台事件循环已关闭: {self.name}")
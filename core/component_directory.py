@@ -0,0 +1,122 @@
+"""
+部件名称目录
+部件入库时 component_id 就是文件夹名，检测模型输出的标签（如 "中控屏"、"方向盘"）
+大多能和名称精确对上。目录把归一化名称和别名映射到部件，精确命中时直接返回，
+不再经过 BGE 编码和向量检索；只有未知或模糊的标签才走向量检索。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import unicodedata
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+logger = logging.getLogger("component_directory")
+
+
+def normalize_name(name: str) -> str:
+    """NFKC 归一化、转小写并去掉所有空白：" 中控 屏" 和 "中控屏" 视为同一个名称"""
+    return "".join(unicodedata.normalize("NFKC", name or "").lower().split())
+
+
+class ComponentDirectory:
+    """归一化名称 / 别名 -> (component_id, description) 的内存目录"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, str]] = {}   # 归一化名称 -> (component_id, description)
+        self._aliases: Dict[str, str] = {}               # 归一化别名 -> component_id
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self._lookup_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ================== 维护 ==================
+
+    def load(self, rows: Iterable[Tuple[str, str]]) -> int:
+        """用 (component_id, description) 全量替换目录，返回条数"""
+        entries = {normalize_name(component_id): (component_id, description or "")
+                   for component_id, description in rows}
+        with self._lock:
+            self._entries = entries
+        return len(entries)
+
+    def upsert(self, component_ids: Sequence[str], descriptions: Sequence[str]) -> None:
+        """写入或更新部件（Milvus upsert 成功后调用）"""
+        with self._lock:
+            for component_id, description in zip(component_ids, descriptions):
+                self._entries[normalize_name(component_id)] = (component_id, description or "")
+
+    def remove(self, component_ids: Sequence[str]) -> None:
+        """删除部件（Milvus delete 后调用）"""
+        with self._lock:
+            for component_id in component_ids:
+                self._entries.pop(normalize_name(component_id), None)
+
+    def add_alias(self, alias: str, component_id: str) -> None:
+        """添加别名，例如 "中控大屏" -> "中控屏" """
+        with self._lock:
+            self._aliases[normalize_name(alias)] = component_id
+
+    def load_aliases(self, path: str) -> int:
+        """
+        从 JSON 文件加载别名，格式为 {"中控屏": ["中控大屏", "车机屏幕"], ...}
+
+        Returns:
+            加载的别名数量，文件不存在时为 0
+        """
+        if not path or not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                mapping = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取部件别名文件失败 {path}: {e}")
+            return 0
+
+        count = 0
+        for component_id, aliases in mapping.items():
+            for alias in aliases:
+                self.add_alias(alias, component_id)
+                count += 1
+        logger.info(f"📂 已加载 {count} 个部件别名: {path}")
+        return count
+
+    # ================== 查询 ==================
+
+    def lookup(self, label: str) -> Optional[Tuple[str, str]]:
+        """
+        按名称或别名精确查找
+
+        Returns:
+            (component_id, description)，未命中返回 None
+        """
+        start = time.perf_counter()
+        key = normalize_name(label)
+        entry = self._entries.get(key)
+        if entry is None and key in self._aliases:
+            entry = self._entries.get(normalize_name(self._aliases[key]))
+
+        self._lookup_seconds += time.perf_counter() - start
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def get_stats(self) -> Dict[str, float]:
+        """快速路径命中率和平均查找耗时"""
+        total = self.hits + self.misses
+        return {
+            "components": len(self._entries),
+            "aliases": len(self._aliases),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "avg_lookup_us": self._lookup_seconds / total * 1e6 if total else 0.0
+        }
@@ -1,8 +1,12 @@
 import os
 import sys
 import json
+import time
+import queue
 import logging
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, List
 from pathlib import Path
 from datetime import datetime
@@ -16,14 +20,18 @@ if project_root not in sys.path:
 
 try:
     from config.config import DATA_CONFIG, MODEL_CONFIG
-    from core.embedding_processor import BgeTextEmbedder
-    from core.milvus_manager import MilvusDataManager
+    from core.embedding_processor import BgeTextEmbedder, USE_CASE_NAME
+    from core.vector_store import create_vector_store
+    from core.ingest_manifest import IngestManifest, content_hash
 except ImportError as e:
     print(f"导入模块失败: {e}")
     raise
 
 logger = logging.getLogger(__name__)
 
+# 流水线各阶段之间传递的结束标记
+_PIPELINE_END = object()
+
 
 def check_model_exists(model_path: str) -> bool:
     """检查模型文件是否存在"""
@@ -52,10 +60,16 @@ def check_model_exists(model_path: str) -> bool:
     return True
 
 class TextDataProcessor:
-    def __init__(self, data_root: Optional[str] = None):
+    def __init__(self, data_root: Optional[str] = None, embedding_processes: int = 0,
+                 threads_per_process: Optional[int] = None):
         """
         初始化文本数据处理器
         仅处理文本：部件名称作为向量，txt文件作为描述
+
+        Args:
+            data_root: 数据根目录，默认读取配置
+            embedding_processes: 编码进程数，大于 0 时使用多进程编码池（全量重建索引时使用）
+            threads_per_process: 多进程模式下每个进程的 torch 线程数
         """
         # 使用配置中的模型路径
         model_path_str = MODEL_CONFIG.local_model_path
@@ -73,15 +87,26 @@ class TextDataProcessor:
 
         # 初始化文本编码器
         print("初始化文本编码器...")
-        self.text_embedder = BgeTextEmbedder()  # 由内部自动读取 config 中的 local_model_path
+        if embedding_processes > 0:
+            from core.embedding_pool import EmbeddingProcessPool
+            self.text_embedder = EmbeddingProcessPool(
+                num_workers=embedding_processes,
+                threads_per_worker=threads_per_process
+            )
+        else:
+            self.text_embedder = BgeTextEmbedder()  # 由内部自动读取 config 中的 local_model_path
 
-        # 初始化 Milvus 管理器
-        print("初始化 Milvus 管理器...")
-        self.milvus_manager = MilvusDataManager()
+        # 初始化向量存储（默认 Milvus，MILVUS_CONFIG.backend="local" 时使用进程内向量库）
+        print("初始化向量存储...")
+        self.milvus_manager = create_vector_store()
 
         # 设置数据根目录
         self.data_root = data_root if data_root is not None else DATA_CONFIG.data_root
         print(f"数据根目录: {self.data_root}")
+
+        # 入库清单：记录每个部件的内容哈希和模型标识
+        self.model_id = self._make_model_id()
+        self.manifest = IngestManifest(os.path.join(self.data_root, DATA_CONFIG.manifest_name))
         print("=" * 50)
 
     def _create_processed_marker(self, folder_path: str) -> bool:
@@ -209,6 +234,15 @@ class TextDataProcessor:
             traceback.print_exc()
             return False
 
+    def _make_model_id(self) -> str:
+        """
+        入库清单里的模型标识：模型名 + 推理后端 + 名称截断长度
+        任何一项变化（例如从 onnx-int8 切回 torch）都会让已入库的向量重新编码
+        """
+        backend = getattr(self.text_embedder, "backend", None) or MODEL_CONFIG.embedding_backend
+        max_length = getattr(self.text_embedder, "max_lengths", {}).get(USE_CASE_NAME, MODEL_CONFIG.max_length_name)
+        return f"{MODEL_CONFIG.embedding_model}|{backend}|{max_length}"
+
     def _get_current_time(self) -> str:
         """获取当前时间字符串"""
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -291,7 +325,7 @@ class TextDataProcessor:
         try:
             # 将部件名称编码为向量
             print(f"  编码部件名称: {component_name}")
-            vector = self.text_embedder.encode_text(component_name)
+            vector = self.text_embedder.encode_text(component_name, use_case=USE_CASE_NAME)
             print(f"  ✓ 向量编码完成，维度: {len(vector)}")
 
             # 插入到 Milvus
@@ -308,6 +342,8 @@ class TextDataProcessor:
                 marker_result = self._create_processed_marker(component_path)
                 if not marker_result:
                     print(f"  ⚠️  标记文件创建失败，但数据已处理")
+                # 同步更新入库清单，流水线模式据此判断是否需要重新处理
+                self.manifest.upsert_many([(component_name, content_hash(description), self.model_id)])
             else:
                 raise Exception("Milvus 插入失败")
 
@@ -503,6 +539,277 @@ class TextDataProcessor:
 
         return stats
 
+    def _load_component(self, component_path: str, component_name: str) -> Dict:
+        """
+        读取单个部件文件夹的描述文本（流水线读取阶段使用，不打印逐条日志）
+
+        Returns:
+            {"name", "path", "description", "content_hash", "error"}，读取失败时 error 非空
+        """
+        item = {"name": component_name, "path": component_path, "description": "",
+                "content_hash": "", "error": ""}
+        try:
+            txt_files = [f for f in os.listdir(component_path) if f.endswith('.txt')]
+            if not txt_files:
+                item["error"] = "未找到 .txt 文件"
+                return item
+
+            txt_file = os.path.join(component_path, txt_files[0])
+            for encoding in ['utf-8', 'gbk', 'gb2312']:
+                try:
+                    with open(txt_file, 'r', encoding=encoding) as f:
+                        item["description"] = f.read().strip()
+                    break
+                except Exception:
+                    continue
+
+            if not item["description"]:
+                item["error"] = "文本文件为空"
+            else:
+                item["content_hash"] = content_hash(item["description"])
+        except Exception as e:
+            item["error"] = str(e)
+        return item
+
+    def process_all_components_pipelined(self, force_reprocess: bool = False,
+                                         read_workers: int = 8,
+                                         encode_batch_size: int = 64,
+                                         write_batch_size: Optional[int] = None,
+                                         queue_size: int = 4) -> Dict:
+        """
+        流水线方式处理所有部件：读取、编码、写入三个阶段并行
+
+        读取阶段是一个线程池，编码阶段按批调用 encode_batch，写入阶段调用
+        upsert_components 且只在最后 flush 一次。阶段之间用有界队列连接，
+        总耗时取决于最慢的阶段而不是三者之和。
+
+        是否需要处理由入库清单决定：只有新增部件、描述内容变化或嵌入模型
+        变化的部件会被重新编码写入，文件夹已消失的部件会从 Milvus 中删除。
+
+        Args:
+            force_reprocess: 是否忽略入库清单重新处理所有部件
+            read_workers: 读取文件的线程数
+            encode_batch_size: 每批编码的部件数
+            write_batch_size: 每次 upsert 的行数，默认读取 MILVUS_CONFIG.upsert_batch_size
+            queue_size: 阶段间队列容量（以批为单位）
+
+        Returns:
+            统计信息字典
+        """
+        print("\n" + "=" * 50)
+        print("开始流水线处理所有部件（读取 / 编码 / 写入 并行）")
+        print(f"force_reprocess: {force_reprocess}, 读取线程: {read_workers}, 编码批大小: {encode_batch_size}")
+        print("=" * 50)
+
+        data_root = Path(self.data_root)
+        if not data_root.exists():
+            raise ValueError(f"data_root 不存在: {self.data_root}")
+
+        components = [item for item in data_root.iterdir() if item.is_dir()]
+        print(f"找到 {len(components)} 个部件文件夹")
+
+        stats = {
+            "total_components": len(components),
+            "processed_components": 0,
+            "skipped_components": 0,
+            "failed_components": [],
+            "skipped_details": [],
+            "components_details": [],
+            "deleted_components": [],
+            "stage_seconds": {"read": 0.0, "encode": 0.0, "write": 0.0},
+            "stage_errors": [],
+            "elapsed_seconds": 0.0
+        }
+        stats_lock = threading.Lock()
+
+        def _record_stage_error(stage: str, error: Exception):
+            logger.error(f"流水线{stage}阶段异常: {error}")
+            traceback.print_exc()
+            with stats_lock:
+                stats["stage_errors"].append({"stage": stage, "error": str(error)})
+
+        def _drain(source: queue.Queue, on_item=None):
+            """阶段出错后继续消费上游队列直到结束标记，避免上游阻塞在 put 上"""
+            while True:
+                entry = source.get()
+                if entry is _PIPELINE_END:
+                    return
+                if on_item is not None:
+                    on_item(entry)
+
+        def _record_failure(name: str, error: str):
+            with stats_lock:
+                stats["failed_components"].append({"name": name, "errors": [error]})
+                stats["components_details"].append({"name": name, "status": "failed", "errors": [error]})
+
+        # 读取入库清单，清理已消失的部件
+        manifest_entries = self.manifest.load_all()
+        existing_names = {item.name for item in components}
+        vanished = sorted(name for name in manifest_entries if name not in existing_names)
+        if vanished:
+            print(f"删除已消失的部件: {len(vanished)} 个")
+            try:
+                self.milvus_manager.delete_components(vanished)
+            except Exception as e:
+                # 删除失败时保留清单记录，下次运行还会重试
+                print(f"  ⚠️  删除失败，保留入库清单记录等待下次重试: {e}")
+                stats["stage_errors"].append({"stage": "删除", "error": str(e)})
+            else:
+                self.manifest.remove_many(vanished)
+                stats["deleted_components"] = vanished
+
+        if not components:
+            return stats
+
+        read_queue = queue.Queue(maxsize=queue_size * encode_batch_size)
+        write_queue = queue.Queue(maxsize=queue_size)
+        pipeline_start = time.perf_counter()
+
+        def _read_one(item: Path):
+            read_start = time.perf_counter()
+            loaded = self._load_component(str(item), item.name)
+            with stats_lock:
+                stats["stage_seconds"]["read"] += time.perf_counter() - read_start
+            read_queue.put(loaded)  # 队列满时阻塞，形成背压
+
+        def _read_stage():
+            try:
+                with ThreadPoolExecutor(max_workers=read_workers) as executor:
+                    for future in [executor.submit(_read_one, item) for item in components]:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f"读取部件失败: {e}")
+            except Exception as e:
+                _record_stage_error("读取", e)
+            finally:
+                read_queue.put(_PIPELINE_END)
+
+        def _encode_batch(batch: List[Dict]):
+            encode_start = time.perf_counter()
+            try:
+                vectors = self.text_embedder.encode_batch(
+                    [item["name"] for item in batch], batch_size=encode_batch_size, use_case=USE_CASE_NAME
+                )
+                write_queue.put((batch, vectors))
+            except Exception as e:
+                logger.error(f"批量编码失败: {e}")
+                for item in batch:
+                    _record_failure(item["name"], f"编码失败: {e}")
+            stats["stage_seconds"]["encode"] += time.perf_counter() - encode_start
+
+        def _encode_stage():
+            batch = []
+            try:
+                while True:
+                    item = read_queue.get()
+                    if item is _PIPELINE_END:
+                        break
+                    if item["error"]:
+                        _record_failure(item["name"], item["error"])
+                        continue
+                    # 内容和模型都没有变化则跳过
+                    if not force_reprocess and \
+                            manifest_entries.get(item["name"]) == (item["content_hash"], self.model_id):
+                        with stats_lock:
+                            stats["skipped_components"] += 1
+                            stats["skipped_details"].append({"name": item["name"], "reason": "内容未变化"})
+                            stats["components_details"].append({"name": item["name"], "status": "skipped",
+                                                                "reason": "内容未变化"})
+                        continue
+                    batch.append(item)
+                    if len(batch) >= encode_batch_size:
+                        _encode_batch(batch)
+                        batch = []
+                if batch:
+                    _encode_batch(batch)
+            except Exception as e:
+                _record_stage_error("编码", e)
+                for item in batch:
+                    _record_failure(item["name"], f"编码阶段异常: {e}")
+                _drain(read_queue, lambda item: _record_failure(item["name"], f"编码阶段异常: {e}"))
+            finally:
+                write_queue.put(_PIPELINE_END)
+
+        def _fail_batch(entry, error: Exception):
+            for item in entry[0]:
+                _record_failure(item["name"], f"写入阶段异常: {error}")
+
+        def _write_stage():
+            wrote_any = False
+            entry = None
+            try:
+                while True:
+                    entry = write_queue.get()
+                    if entry is _PIPELINE_END:
+                        break
+                    batch, vectors = entry
+                    write_start = time.perf_counter()
+                    result = self.milvus_manager.upsert_components(
+                        component_ids=[item["name"] for item in batch],
+                        vectors=vectors,
+                        descriptions=[item["description"] for item in batch],
+                        chunk_size=write_batch_size,
+                        flush=False
+                    )
+                    wrote_any = wrote_any or result["upserted_rows"] > 0
+                    failed_ids = set(result["failed_ids"])
+                    succeeded = []
+                    for item in batch:
+                        if item["name"] in failed_ids:
+                            _record_failure(item["name"], "Milvus 插入失败")
+                            continue
+                        succeeded.append((item["name"], item["content_hash"], self.model_id))
+                    self.manifest.upsert_many(succeeded)
+                    with stats_lock:
+                        for name, _, _ in succeeded:
+                            stats["processed_components"] += 1
+                            stats["components_details"].append({
+                                "name": name,
+                                "status": "success",
+                                "timestamp": self._get_current_time()
+                            })
+                    stats["stage_seconds"]["write"] += time.perf_counter() - write_start
+                    entry = None
+
+                if wrote_any:
+                    flush_start = time.perf_counter()
+                    self.milvus_manager.flush()
+                    stats["stage_seconds"]["write"] += time.perf_counter() - flush_start
+            except Exception as e:
+                _record_stage_error("写入", e)
+                if entry is not None and entry is not _PIPELINE_END:
+                    _fail_batch(entry, e)
+                    _drain(write_queue, lambda pending: _fail_batch(pending, e))
+
+        threads = [
+            threading.Thread(target=_read_stage, name="ingest-read", daemon=True),
+            threading.Thread(target=_encode_stage, name="ingest-encode", daemon=True),
+            threading.Thread(target=_write_stage, name="ingest-write", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats["elapsed_seconds"] = time.perf_counter() - pipeline_start
+
+        print("\n" + "=" * 50)
+        print("流水线处理完成!")
+        print(f"总部件数: {stats['total_components']}")
+        print(f"成功处理: {stats['processed_components']}")
+        print(f"跳过处理: {stats['skipped_components']}")
+        print(f"失败部件数: {len(stats['failed_components'])}")
+        print(f"删除部件数: {len(stats['deleted_components'])}")
+        for stage_error in stats["stage_errors"]:
+            print(f"❌ {stage_error['stage']}阶段异常: {stage_error['error']}")
+        print(f"总耗时: {stats['elapsed_seconds']:.2f}s, 各阶段累计耗时: "
+              f"读取 {stats['stage_seconds']['read']:.2f}s / "
+              f"编码 {stats['stage_seconds']['encode']:.2f}s / "
+              f"写入 {stats['stage_seconds']['write']:.2f}s")
+
+        return stats
+
     def force_process_all_components(self) -> Dict:
         """
         强制重新处理所有部件（忽略标记文件）
@@ -574,6 +881,16 @@ def main():
                         help="显示详细调试信息")
     parser.add_argument("--debug-markers", action="store_true",
                         help="调试标记文件状态")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="使用流水线模式（读取 / 编码 / 写入并行）")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="流水线模式下读取文件的线程数")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="流水线模式下每批编码的部件数")
+    parser.add_argument("--embed-processes", type=int, default=0,
+                        help="编码进程数，大于 0 时使用多进程编码池（建议同时调大 --batch-size）")
+    parser.add_argument("--threads-per-process", type=int, default=None,
+                        help="多进程编码时每个进程的 torch 线程数")
 
     args = parser.parse_args()
 
@@ -585,7 +902,11 @@ def main():
     )
 
     try:
-        processor = TextDataProcessor(data_root=args.data_root)
+        processor = TextDataProcessor(
+            data_root=args.data_root,
+            embedding_processes=args.embed_processes,
+            threads_per_process=args.threads_per_process
+        )
 
         if args.debug_markers:
             # 调试标记文件
@@ -606,12 +927,23 @@ def main():
         print(f"传递给 process_all_components 的 force_reprocess 参数: {force_param}")
 
         # 调用主处理方法
-        stats = processor.process_all_components(force_reprocess=force_param)
+        if args.pipeline:
+            stats = processor.process_all_components_pipelined(
+                force_reprocess=force_param,
+                read_workers=args.workers,
+                encode_batch_size=args.batch_size
+            )
+        else:
+            stats = processor.process_all_components(force_reprocess=force_param)
 
         print("\n" + "=" * 50)
         print("最终统计结果:")
         print(json.dumps(stats, indent=2, ensure_ascii=False))
 
+        if args.embed_processes > 0:
+            print(f"多进程编码统计: {processor.text_embedder.get_stats()}")
+            processor.text_embedder.close()
+
     except Exception as e:
         print(f"\n程序执行失败: {e}")
         traceback.print_exc()
@@ -10,11 +10,6 @@ from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
 logger = logging.getLogger("dialogue_manager")
 
 class SmartDialogueManager:
@@ -531,4 +526,9 @@ async def test_smart_dialogue():
 if __name__ == "__main__":
     import asyncio
 
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
     asyncio.run(test_smart_dialogue())
\ No newline at end of file
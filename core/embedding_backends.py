@@ -0,0 +1,156 @@
+"""
+BGE 编码器的 CPU 推理后端
+- torch: 原始 fp32 PyTorch 模型
+- torch-int8: PyTorch 动态 int8 量化（Linear 层）
+- onnx: 导出为 ONNX 后用 ONNX Runtime 推理
+- onnx-int8: 在 ONNX 模型基础上做动态 int8 量化
+
+ONNX 导出 / 量化结果从 local_model_path 生成，缓存在 MODEL_CONFIG.backend_cache_dir 下，
+模型文件更新后自动重新生成。torch-int8 每次加载时现场量化（只需几秒），不落盘。
+"""
+
+import os
+import glob
+import time
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger("embedding_backends")
+
+BACKEND_TORCH = "torch"
+BACKEND_TORCH_INT8 = "torch-int8"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+BACKENDS = (BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX, BACKEND_ONNX_INT8)
+ONNX_BACKENDS = (BACKEND_ONNX, BACKEND_ONNX_INT8)
+
+
+def _cache_path(cache_dir: str, model_path: str, suffix: str) -> str:
+    """缓存文件路径：<cache_dir>/<模型目录名>.<suffix>"""
+    os.makedirs(cache_dir, exist_ok=True)
+    name = os.path.basename(os.path.normpath(model_path))
+    return os.path.join(cache_dir, f"{name}.{suffix}")
+
+
+def _is_fresh(cache_file: str, model_path: str) -> bool:
+    """缓存文件存在且比模型目录里的所有文件都新"""
+    if not os.path.exists(cache_file):
+        return False
+    sources = glob.glob(os.path.join(model_path, "*"))
+    newest = max((os.path.getmtime(p) for p in sources), default=0)
+    return os.path.getmtime(cache_file) >= newest
+
+
+# ================== PyTorch 动态 int8 ==================
+
+def quantize_torch_model(model):
+    """
+    对 fp32 模型的 Linear 层做动态 int8 量化
+
+    动态量化直接从 fp32 权重计算 int8 权重，结果是确定的，而且对 BGE 这样的小模型只需几秒；
+    缓存 state_dict 仍然要先量化一遍才能加载，省不了时间，所以不做磁盘缓存
+
+    Args:
+        model: 已加载到 CPU 的 fp32 模型
+
+    Returns:
+        量化后的模型
+    """
+    import torch
+
+    start_time = time.perf_counter()
+    quantized = torch.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    logger.info(f"🔧 int8 动态量化完成，耗时 {time.perf_counter() - start_time:.1f}s")
+    return quantized
+
+
+# ================== ONNX Runtime ==================
+
+def export_onnx(model_path: str, onnx_path: str) -> None:
+    """把 local_model_path 下的模型导出为 ONNX（batch 和序列长度都是动态维度）"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model = AutoModel.from_pretrained(model_path).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    sample = tokenizer(["汽车部件示例文本"], return_tensors="pt")
+    input_names = list(sample.keys())
+
+    class _HiddenStateOnly(torch.nn.Module):
+        """按固定顺序接收输入，只输出 last_hidden_state"""
+
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *tensors):
+            return self.inner(**dict(zip(input_names, tensors))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStateOnly(model),
+            tuple(sample[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14
+        )
+    logger.info(f"💾 ONNX 模型已导出: {onnx_path}")
+
+
+class OnnxEncoder:
+    """ONNX Runtime 推理，输出归一化后的 [CLS] 向量"""
+
+    def __init__(self, model_path: str, cache_dir: str, quantize: bool = False,
+                 num_threads: int = 0):
+        """
+        Args:
+            model_path: 原始模型目录
+            cache_dir: ONNX 模型缓存目录
+            quantize: 是否使用动态 int8 量化后的 ONNX 模型
+            num_threads: ONNX Runtime 算子内线程数，0 表示由 ONNX Runtime 决定
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("ONNX 后端需要安装 onnxruntime: pip install onnxruntime") from e
+
+        onnx_path = _cache_path(cache_dir, model_path, "onnx")
+        if not _is_fresh(onnx_path, model_path):
+            export_onnx(model_path, onnx_path)
+
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            int8_path = _cache_path(cache_dir, model_path, "int8.onnx")
+            if not _is_fresh(int8_path, model_path) or os.path.getmtime(int8_path) < os.path.getmtime(onnx_path):
+                quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+                logger.info(f"💾 ONNX int8 模型已缓存: {int8_path}")
+            onnx_path = int8_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names: List[str] = [i.name for i in self.session.get_inputs()]
+        self.onnx_path = onnx_path
+
+    def encode(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Args:
+            inputs: 分词器输出（return_tensors="np"）
+
+        Returns:
+            (batch, hidden_size) 的 float32 矩阵，已做 L2 归一化
+        """
+        feed = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feed)[0][:, 0].astype(np.float32)  # [CLS]
+        norms = np.linalg.norm(hidden, axis=1, keepdims=True)
+        return hidden / np.maximum(norms, 1e-12)
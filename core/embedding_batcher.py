@@ -0,0 +1,227 @@
+"""
+文本向量的动态微批处理
+多个调用方同时需要查询向量时，先把请求收集起来（最多等 max_wait_ms 或凑满
+max_batch_size 条），再用一次批量前向计算统一编码，结果分发回各自的 future。
+"""
+
+import time
+import asyncio
+import logging
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from core.embedding_processor import USE_CASE_NAME
+
+logger = logging.getLogger("embedding_batcher")
+
+
+class BatcherClosed(RuntimeError):
+    """MicroBatchEmbedder 已关闭，请求没有被编码"""
+
+
+# 直方图分桶上界
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+WAIT_MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _histogram(samples, buckets) -> Dict[str, int]:
+    """按分桶上界统计样本数，最后一个桶收集超过所有上界的样本"""
+    counts = {f"<={bound}": 0 for bound in buckets}
+    counts[f">{buckets[-1]}"] = 0
+    for value in samples:
+        for bound in buckets:
+            if value <= bound:
+                counts[f"<={bound}"] += 1
+                break
+        else:
+            counts[f">{buckets[-1]}"] += 1
+    return counts
+
+
+def _percentile(samples, p: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class MicroBatchEmbedder:
+    """
+    异步微批编码前端
+    包装一个提供 encode_batch(texts, use_case=...) 的编码器（如 BgeTextEmbedder），
+    前向计算在单独的线程里串行执行，不阻塞事件循环。
+    use_case 决定截断长度和缓存键，只有 use_case 相同的请求才会合并到一次前向计算里
+    """
+
+    def __init__(self, embedder, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 history_size: int = 1024, use_case: str = USE_CASE_NAME):
+        """
+        Args:
+            embedder: 提供 encode_batch(texts, use_case=...) -> np.ndarray 的编码器
+            max_batch_size: 一批最多合并的请求数
+            max_wait_ms: 第一条请求进入队列后最多等待多久凑批（毫秒）
+            history_size: 用于统计的最近样本数
+            use_case: 请求未指定时使用的编码场景，默认与 search_text 的查询编码一致
+        """
+        self.embedder = embedder
+        self.use_case = use_case
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 模型前向计算只在这一个线程里执行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batch")
+
+        self._batch_sizes = deque(maxlen=history_size)
+        self._wait_ms = deque(maxlen=history_size)
+        self._forward_ms = deque(maxlen=history_size)
+        self.requests = 0
+        self.batches = 0
+        self._closed = False
+
+    async def encode(self, text: str, use_case: Optional[str] = None) -> np.ndarray:
+        """
+        编码单条文本，和同时到达的、use_case 相同的其他请求合并成一批
+
+        Args:
+            text: 待编码文本
+            use_case: 编码场景，None 表示使用构造时指定的 use_case
+
+        Raises:
+            BatcherClosed: 已经关闭，或者请求还没编码就被 close 了
+        """
+        if self._closed:
+            raise BatcherClosed("MicroBatchEmbedder 已关闭")
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self.requests += 1
+        await self._queue.put((text, use_case or self.use_case, time.perf_counter(), future))
+        return await future
+
+    async def encode_many(self, texts: Sequence[str], use_case: Optional[str] = None) -> np.ndarray:
+        """编码多条文本，返回 (len(texts), dim) 矩阵"""
+        vectors = await asyncio.gather(*(self.encode(text, use_case) for text in texts))
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    async def close(self) -> None:
+        """
+        停止后台凑批任务
+        还没编码完成的请求（包括已经收进当前批次、正在凑批或计算的请求）都会收到 BatcherClosed
+        """
+        self._closed = True
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _fail(self._queue.get_nowait()[-1])
+        self._executor.shutdown(wait=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """批大小和排队等待时间的直方图"""
+        sizes = list(self._batch_sizes)
+        waits = list(self._wait_ms)
+        forwards = list(self._forward_ms)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "avg_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+            "batch_size_histogram": _histogram(sizes, BATCH_SIZE_BUCKETS),
+            "wait_ms_p50": _percentile(waits, 0.50),
+            "wait_ms_p95": _percentile(waits, 0.95),
+            "wait_ms_histogram": _histogram(waits, WAIT_MS_BUCKETS),
+            "forward_ms_avg": sum(forwards) / len(forwards) if forwards else 0.0
+        }
+
+    # ================== 内部实现 ==================
+
+    def _ensure_worker(self) -> None:
+        """在当前事件循环里启动凑批任务（第一次调用时）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._worker is not None:
+                raise RuntimeError("MicroBatchEmbedder 只能在一个事件循环中使用")
+            self._loop = loop
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[tuple]:
+        """等待第一条请求，再在截止时间内尽量凑满一批"""
+        first = await self._queue.get()
+        batch = [first]
+        # 截止时间从第一条请求入队算起，上一批计算期间积压的请求不再额外等待
+        deadline = first[2] + self.max_wait
+        try:
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # 已经出队的请求不在队列里了，close 清理不到，这里直接结束它们
+            for item in batch:
+                _fail(item[-1])
+            raise
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            # 不同 use_case 的截断长度不同，按 use_case 分组分别前向计算
+            groups: Dict[str, List[tuple]] = {}
+            for item in batch:
+                if not item[-1].cancelled():
+                    groups.setdefault(item[1], []).append(item)
+
+            for index, (use_case, group) in enumerate(groups.items()):
+                try:
+                    await self._encode_group(use_case, group)
+                except asyncio.CancelledError:
+                    for _, rest in list(groups.items())[index:]:
+                        for item in rest:
+                            _fail(item[-1])
+                    raise
+
+    async def _encode_group(self, use_case: str, group: List[tuple]) -> None:
+        """对同一 use_case 的一组请求做一次批量编码，结果分发回各自的 future"""
+        start_time = time.perf_counter()
+        for _, _, enqueued_at, _ in group:
+            self._wait_ms.append((start_time - enqueued_at) * 1000)
+        self._batch_sizes.append(len(group))
+        self.batches += 1
+
+        texts = [text for text, _, _, _ in group]
+        encode = functools.partial(self.embedder.encode_batch, texts, use_case=use_case)
+        try:
+            vectors = await self._loop.run_in_executor(self._executor, encode)
+        except Exception as e:
+            logger.error(f"❌ 批量编码失败（{len(texts)} 条，{use_case}）: {e}")
+            for _, _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._forward_ms.append((time.perf_counter() - start_time) * 1000)
+        for (_, _, _, future), vector in zip(group, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+
+def _fail(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_exception(BatcherClosed("MicroBatchEmbedder 已关闭，请求没有被编码"))
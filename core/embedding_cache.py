@@ -0,0 +1,211 @@
+"""
+文本向量缓存模块
+检测标签、部件名称这类短文本会被反复编码，按（模型路径, max_length, 归一化文本）
+缓存 BGE 向量：内存 LRU 一级缓存 + 可选的 memmap 磁盘二级缓存（float32 行存储）
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("embedding_cache")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC 归一化并合并空白，全角/半角和多余空格不影响命中"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def make_embedding_key(text: str, model_path: str, max_length: int) -> str:
+    """计算向量缓存键"""
+    raw = f"{model_path}|{max_length}|{normalize_text(text)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    文本向量缓存
+    内存层是 LRU；磁盘层是一个 (disk_capacity, dim) 的 float32 memmap 文件，
+    加上记录 键 -> 行号 的 JSON-lines 索引，写满后不再写入新行
+    """
+
+    def __init__(self, dim: int, max_entries: int = 10000,
+                 disk_dir: Optional[str] = None, disk_capacity: int = 200000):
+        """
+        初始化向量缓存
+
+        Args:
+            dim: 向量维度
+            max_entries: 内存层最多缓存的向量数
+            disk_dir: 磁盘层目录，为 None 时只缓存在内存
+            disk_capacity: 磁盘层最多保存的向量数
+        """
+        self.dim = dim
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_capacity = disk_capacity
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 磁盘层
+        self._vectors: Optional[np.memmap] = None
+        self._rows: Dict[str, int] = {}
+        self._index_path = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            self._open_disk()
+
+    # ================== 查询与写入 ==================
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        批量查找向量
+
+        Returns:
+            与 keys 等长的列表，未命中的位置为 None
+        """
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                elif key in self._rows:
+                    # 从磁盘读出后提升到内存层
+                    vector = np.array(self._vectors[self._rows[key]], dtype=np.float32)
+                    self._insert_memory(key, vector)
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                results.append(vector)
+        return results
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """查找单个向量"""
+        return self.get_many([key])[0]
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        批量写入向量
+
+        Args:
+            keys: 缓存键
+            vectors: 形状为 (len(keys), dim) 的矩阵
+        """
+        new_rows = []
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                vector = np.array(vector, dtype=np.float32)
+                self._insert_memory(key, vector)
+
+                if self._vectors is not None and key not in self._rows:
+                    row = len(self._rows)
+                    if row >= self.disk_capacity:
+                        continue
+                    self._vectors[row] = vector
+                    self._rows[key] = row
+                    new_rows.append((key, row))
+
+            if new_rows:
+                self._append_index(new_rows)
+
+    def clear(self) -> None:
+        """清空内存层（不删除磁盘文件）"""
+        with self._lock:
+            self._memory.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._rows),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": hits / total if total else 0.0
+        }
+
+    def close(self) -> None:
+        """把磁盘层刷到文件并关闭"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+                self._vectors = None
+                self._rows = {}
+
+    # ================== 磁盘层 ==================
+
+    def _insert_memory(self, key: str, vector: np.ndarray) -> None:
+        """写入内存层并执行 LRU 淘汰（调用方需持有锁）"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _open_disk(self) -> None:
+        """打开（或新建）memmap 文件和索引，维度或容量不一致时重建"""
+        os.makedirs(self.disk_dir, exist_ok=True)
+        meta_path = os.path.join(self.disk_dir, "meta.json")
+        vectors_path = os.path.join(self.disk_dir, "vectors.f32")
+        self._index_path = os.path.join(self.disk_dir, "index.jsonl")
+        meta = {"dim": self.dim, "capacity": self.disk_capacity}
+
+        try:
+            reuse = False
+            if os.path.exists(meta_path) and os.path.exists(vectors_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    reuse = json.load(f) == meta
+
+            if reuse:
+                self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+",
+                                          shape=(self.disk_capacity, self.dim))
+                self._load_index()
+            else:
+                self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="w+",
+                                          shape=(self.disk_capacity, self.dim))
+                open(self._index_path, "w", encoding="utf-8").close()
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f)
+            logger.info(f"📂 向量磁盘缓存: {self.disk_dir}，已有 {len(self._rows)} 条")
+        except Exception as e:
+            logger.warning(f"⚠️ 打开向量磁盘缓存失败，只使用内存缓存: {e}")
+            self._vectors = None
+            self._rows = {}
+
+    def _load_index(self) -> None:
+        """加载 键 -> 行号 索引"""
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 0 <= record["row"] < self.disk_capacity:
+                    self._rows[record["key"]] = record["row"]
+
+    def _append_index(self, new_rows) -> None:
+        """先把向量刷到磁盘再写索引，保证索引里的行都是完整的（调用方需持有锁）"""
+        try:
+            self._vectors.flush()
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                for key, row in new_rows:
+                    f.write(json.dumps({"key": key, "row": row}) + "\n")
+        except Exception as e:
+            logger.warning(f"⚠️ 写入向量磁盘缓存失败: {e}")
@@ -0,0 +1,185 @@
+"""
+多进程文本编码池
+全量重建索引时，单个 BgeTextEmbedder 受 PyTorch 算子内线程数的限制用不满多核 CPU。
+这里启动多个工作进程，每个进程只加载一次模型并固定推理线程数（torch 或 ONNX Runtime）；编码结果由工作
+进程直接写进父进程分配的共享内存矩阵，不再经过 pickle 传回向量列表。
+"""
+
+import os
+import sys
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# ========== 路径设置 ==========
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.embedding_processor import USE_CASE_PASSAGE
+
+logger = logging.getLogger("embedding_pool")
+
+# 工作进程内的编码器（每个进程一个）
+_worker_embedder = None
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    工作进程附加到父进程的共享内存
+
+    spawn 出来的工作进程和父进程共用同一个 resource_tracker，共享内存的生命周期由
+    父进程负责（用完 unlink），工作进程只 close
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(model_path: Optional[str], backend: Optional[str], num_threads: int) -> None:
+    """工作进程初始化：固定线程数后加载一次模型"""
+    global _worker_embedder
+    # 必须在导入 torch 之前设置，否则 OpenMP / MKL 线程池已经按核数建好了
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(num_threads)
+
+    from config.config import MODEL_CONFIG
+    from core.embedding_backends import ONNX_BACKENDS
+    from core.embedding_processor import BgeTextEmbedder
+
+    backend = backend or MODEL_CONFIG.embedding_backend
+    if backend not in ONNX_BACKENDS:
+        # ONNX 后端的线程数交给 ONNX Runtime，不需要（也不一定装了）torch
+        import torch
+        torch.set_num_threads(num_threads)
+        torch.set_num_interop_threads(1)
+
+    _worker_embedder = BgeTextEmbedder(model_path=model_path, backend=backend, use_cache=False,
+                                       num_threads=num_threads)
+
+
+def _worker_hidden_size() -> int:
+    return _worker_embedder.hidden_size
+
+
+def _worker_encode(shm_name: str, shape: Tuple[int, int], start: int, texts: List[str],
+                   batch_size: int, use_case: str) -> Tuple[int, int, float]:
+    """编码一段文本，结果写到共享矩阵的 [start, start + len(texts)) 行"""
+    begin = time.perf_counter()
+    vectors = _worker_embedder.encode_batch(texts, batch_size=batch_size, use_case=use_case)
+    shm = _attach_shared_memory(shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(texts)] = vectors
+        del out
+    finally:
+        shm.close()
+    return start, len(texts), time.perf_counter() - begin
+
+
+class EmbeddingProcessPool:
+    """
+    多进程编码池，接口与 BgeTextEmbedder 的 encode_batch / encode_text 一致，
+    可以直接替换 TextDataProcessor.text_embedder
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                 model_path: Optional[str] = None, backend: Optional[str] = None,
+                 min_chunk_size: int = 16):
+        """
+        Args:
+            num_workers: 工作进程数，默认 CPU 核数 // threads_per_worker
+            threads_per_worker: 每个进程的推理线程数，默认 4
+            model_path: 模型目录，默认读取配置
+            backend: 推理后端，默认读取配置
+            min_chunk_size: 分给单个进程的最少文本数
+        """
+        cpu_count = os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or min(4, cpu_count)
+        self.num_workers = num_workers or max(1, cpu_count // self.threads_per_worker)
+        self.min_chunk_size = min_chunk_size
+
+        # torch 不能安全地 fork，使用 spawn 启动工作进程
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, backend, self.threads_per_worker)
+        )
+        self.hidden_size = self._executor.submit(_worker_hidden_size).result()
+        print(f"✅ 多进程编码池已启动: {self.num_workers} 个进程 × {self.threads_per_worker} 线程，"
+              f"向量维度 {self.hidden_size}")
+
+        self.texts_encoded = 0
+        self.worker_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def encode_batch(self, texts: List[str], batch_size: int = 32,
+                     use_case: str = USE_CASE_PASSAGE) -> np.ndarray:
+        """
+        把文本平均分给各个进程编码
+
+        Returns:
+            形状为 (len(texts), 向量维度) 的 float32 矩阵
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        num_texts = len(texts)
+        if num_texts == 0:
+            return np.empty((0, self.hidden_size), dtype=np.float32)
+
+        begin = time.perf_counter()
+        shape = (num_texts, self.hidden_size)
+        shm = shared_memory.SharedMemory(create=True, size=num_texts * self.hidden_size * 4)
+        try:
+            chunk_size = max(self.min_chunk_size, -(-num_texts // self.num_workers))
+            futures = [
+                self._executor.submit(_worker_encode, shm.name, shape, start,
+                                      list(texts[start:start + chunk_size]), batch_size, use_case)
+                for start in range(0, num_texts, chunk_size)
+            ]
+            wait(futures)
+            for future in futures:
+                _, _, seconds = future.result()  # 有进程失败时在这里抛出
+                self.worker_seconds += seconds
+
+            # 共享内存马上要释放，拷贝一份（一次连续内存拷贝）
+            embeddings = np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+        self.texts_encoded += num_texts
+        self.wall_seconds += time.perf_counter() - begin
+        return embeddings
+
+    def encode_text(self, text: str, use_case: str = USE_CASE_PASSAGE) -> np.ndarray:
+        """编码单条文本（兼容 BgeTextEmbedder.encode_text）"""
+        return self.encode_batch([text], use_case=use_case)[0]
+
+    def get_stats(self):
+        """吞吐统计；worker_seconds / wall_seconds 接近进程数说明并行充分"""
+        return {
+            "num_workers": self.num_workers,
+            "threads_per_worker": self.threads_per_worker,
+            "texts_encoded": self.texts_encoded,
+            "texts_per_sec": self.texts_encoded / self.wall_seconds if self.wall_seconds else 0.0,
+            "parallelism": self.worker_seconds / self.wall_seconds if self.wall_seconds else 0.0
+        }
+
+    def close(self) -> None:
+        """关闭工作进程"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
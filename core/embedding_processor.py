@@ -45,10 +45,8 @@
 # core/embedding_processor.py
 import os
 import sys
-import torch
 import numpy as np
-from transformers import AutoTokenizer, AutoModel
-from typing import List
+from typing import Dict, List, Optional
 import logging
 
 # ========== 路径设置 ==========
@@ -58,19 +56,81 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from config.config import MODEL_CONFIG
+from core.embedding_cache import EmbeddingCache, make_embedding_key
+from core.embedding_backends import (
+    BACKENDS, BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX_INT8, ONNX_BACKENDS,
+    OnnxEncoder, quantize_torch_model
+)
 
 logger = logging.getLogger(__name__)
 
+# 使用场景：部件名称 / 检测标签这类短文本，和较长的部件描述，各自使用不同的截断长度
+USE_CASE_NAME = "name"
+USE_CASE_PASSAGE = "passage"
+
+# 长度分桶上界（token 数），同一批内的文本不跨桶，padding 只补到本桶内的最大长度
+LENGTH_BUCKETS = (16, 32, 64, 128, 256, 512)
+
+
 class BgeTextEmbedder:
-    def __init__(self, model_path=None, verbose=False):
+    def __init__(self, model_path=None, verbose=False, cache: Optional[EmbeddingCache] = None,
+                 use_cache: bool = True, backend: Optional[str] = None, num_threads: int = 0):
+        """
+        Args:
+            model_path: 模型目录，默认读取 MODEL_CONFIG.local_model_path
+            verbose: 是否打印加载信息
+            cache: 向量缓存，为 None 时按 MODEL_CONFIG 创建
+            use_cache: 是否启用向量缓存
+            backend: 推理后端 torch / torch-int8 / onnx / onnx-int8，默认读取 MODEL_CONFIG.embedding_backend
+            num_threads: ONNX Runtime 算子内线程数，0 表示由 ONNX Runtime 决定（torch 后端不使用）
+        """
         self.verbose = verbose
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model_path = model_path or MODEL_CONFIG.local_model_path  # 自动读取配置
+        self.max_length = MODEL_CONFIG.max_length
+        self.max_lengths = {
+            USE_CASE_NAME: MODEL_CONFIG.max_length_name,
+            USE_CASE_PASSAGE: MODEL_CONFIG.max_length
+        }
+        # 分词与 padding 统计
+        self.length_stats = {"batches": 0, "texts": 0, "real_tokens": 0, "padded_tokens": 0}
+        self.backend = backend or MODEL_CONFIG.embedding_backend
+        if self.backend not in BACKENDS:
+            raise ValueError(f"未知的推理后端: {self.backend}，可选: {BACKENDS}")
+        # int8 和 ONNX 后端只在 CPU 上运行
+        self.device = MODEL_CONFIG.device if self.backend == BACKEND_TORCH else "cpu"
 
         if self.verbose:
             print(f"加载 BGE 模型: {self.model_path}")
-            print(f"使用设备: {self.device}")
+            print(f"使用设备: {self.device}，推理后端: {self.backend}")
 
+        self.onnx_encoder = None
+        if self.backend in ONNX_BACKENDS:
+            from transformers import AutoConfig, AutoTokenizer
+
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            self.onnx_encoder = OnnxEncoder(self.model_path, MODEL_CONFIG.backend_cache_dir,
+                                            quantize=self.backend == BACKEND_ONNX_INT8,
+                                            num_threads=num_threads)
+            self.model = None
+            self.hidden_size = AutoConfig.from_pretrained(self.model_path).hidden_size
+            print(f"✓ ONNX 模型加载成功: {self.onnx_encoder.onnx_path}")
+        else:
+            self._load_torch_model()
+            if self.backend == BACKEND_TORCH_INT8:
+                self.model = quantize_torch_model(self.model)
+            self.hidden_size = self.model.config.hidden_size
+
+        self.cache = None
+        if use_cache:
+            self.cache = cache or self._default_cache()
+
+    def _load_torch_model(self):
+        """加载 PyTorch 模型和分词器"""
+        # torch / transformers 导入很慢，放到真正加载模型时再导入
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+
+        self.device = torch.device(self.device)
         try:
             # 先加载tokenizer
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
@@ -123,24 +183,176 @@ class BgeTextEmbedder:
                 print(f"CPU加载也失败: {e2}")
                 raise
 
-    def encode_text(self, text: str) -> list:
-        """编码文本为向量"""
-        try:
-            inputs = self.tokenizer(
-                text,
-                padding=True,
-                truncation=True,
-                return_tensors="pt",
-                max_length=512
-            ).to(self.device)
-
-            with torch.no_grad():
+    def _default_cache(self) -> Optional[EmbeddingCache]:
+        """按配置创建向量缓存"""
+        if MODEL_CONFIG.embedding_cache_size <= 0:
+            return None
+        return EmbeddingCache(
+            dim=self.hidden_size,
+            max_entries=MODEL_CONFIG.embedding_cache_size,
+            disk_dir=MODEL_CONFIG.embedding_cache_dir
+        )
+
+    def encode_batch(self, texts: List[str], batch_size: int = 32,
+                     use_case: str = USE_CASE_PASSAGE) -> np.ndarray:
+        """
+        批量编码文本为向量，命中缓存的文本不再经过模型
+
+        Args:
+            texts: 待编码的文本列表
+            batch_size: 每批送入模型的文本数量
+            use_case: 使用场景，决定截断长度（name: 短文本，passage: 长描述）
+
+        Returns:
+            形状为 (len(texts), 向量维度) 的 float32 矩阵
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if use_case not in self.max_lengths:
+            raise ValueError(f"未知的使用场景: {use_case}，可选: {list(self.max_lengths)}")
+        max_length = self.max_lengths[use_case]
+        if self.cache is None:
+            return self._encode_uncached(texts, batch_size, max_length)
+
+        # 不同后端的向量有细微差别，缓存键里带上后端名
+        model_id = self.model_path if self.backend == BACKEND_TORCH else f"{self.model_path}@{self.backend}"
+        keys = [make_embedding_key(text, model_id, max_length) for text in texts]
+        cached = self.cache.get_many(keys)
+        embeddings = np.empty((len(texts), self.hidden_size), dtype=np.float32)
+
+        # 未命中的文本去重后再编码
+        miss_positions: Dict[str, List[int]] = {}
+        for i, (key, vector) in enumerate(zip(keys, cached)):
+            if vector is None:
+                miss_positions.setdefault(key, []).append(i)
+            else:
+                embeddings[i] = vector
+
+        if miss_positions:
+            miss_keys = list(miss_positions)
+            miss_texts = [texts[miss_positions[key][0]] for key in miss_keys]
+            miss_embeddings = self._encode_uncached(miss_texts, batch_size, max_length)
+            for key, vector in zip(miss_keys, miss_embeddings):
+                embeddings[miss_positions[key]] = vector
+            self.cache.put_many(miss_keys, miss_embeddings)
+
+        return embeddings
+
+    def _plan_batches(self, lengths: List[int], batch_size: int) -> List[List[int]]:
+        """
+        按 token 数分桶组批
+
+        先按长度排序，再顺序切批：批满或者跨到下一个长度桶时开新批，
+        这样短文本不会因为和长文本同批而被 padding 到很长
+        """
+        def bucket(length: int) -> int:
+            for bound in LENGTH_BUCKETS:
+                if length <= bound:
+                    return bound
+            return LENGTH_BUCKETS[-1]
+
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches: List[List[int]] = []
+        for i in order:
+            if (not batches or len(batches[-1]) >= batch_size
+                    or bucket(lengths[i]) != bucket(lengths[batches[-1][0]])):
+                batches.append([])
+            batches[-1].append(i)
+        return batches
+
+    def _pad_batch(self, encoded, batch_indices: List[int]) -> Dict[str, np.ndarray]:
+        """把已经分好词的若干条文本补齐到本批最大长度，不重新分词"""
+        width = max(len(encoded["input_ids"][i]) for i in batch_indices)
+        pad_id = self.tokenizer.pad_token_id or 0
+        inputs = {}
+        for name in encoded.keys():
+            fill = pad_id if name == "input_ids" else 0
+            array = np.full((len(batch_indices), width), fill, dtype=np.int64)
+            for row, i in enumerate(batch_indices):
+                ids = encoded[name][i]
+                array[row, :len(ids)] = ids
+            inputs[name] = array
+
+        real_tokens = sum(len(encoded["input_ids"][i]) for i in batch_indices)
+        self.length_stats["batches"] += 1
+        self.length_stats["texts"] += len(batch_indices)
+        self.length_stats["real_tokens"] += real_tokens
+        self.length_stats["padded_tokens"] += width * len(batch_indices)
+        return inputs
+
+    def _encode_uncached(self, texts: List[str], batch_size: int = 32,
+                         max_length: Optional[int] = None) -> np.ndarray:
+        """
+        直接用模型批量编码文本
+
+        整批文本只分词一次（不 padding），再按 token 数分桶组批，每批只补齐到
+        本批的最大长度，注意力计算量随实际文本长度变化；结果按输入顺序写回
+        一个连续的 float32 矩阵。
+
+        Args:
+            texts: 待编码的文本列表
+            batch_size: 每批送入模型的文本数量
+            max_length: 截断长度，默认使用 passage 场景的长度
+
+        Returns:
+            形状为 (len(texts), 向量维度) 的 float32 矩阵
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+
+        num_texts = len(texts)
+        embeddings = np.empty((num_texts, self.hidden_size), dtype=np.float32)
+        if num_texts == 0:
+            return embeddings
+
+        encoded = self.tokenizer(
+            list(texts),
+            padding=False,
+            truncation=True,
+            max_length=max_length or self.max_length
+        )
+        batches = self._plan_batches([len(ids) for ids in encoded["input_ids"]], batch_size)
+
+        if self.onnx_encoder is not None:
+            for batch_indices in batches:
+                inputs = self._pad_batch(encoded, batch_indices)
+                embeddings[batch_indices] = self.onnx_encoder.encode(inputs)
+            return embeddings
+
+        import torch
+
+        with torch.no_grad():
+            for batch_indices in batches:
+                inputs = {
+                    name: torch.from_numpy(array).to(self.device)
+                    for name, array in self._pad_batch(encoded, batch_indices).items()
+                }
+
                 outputs = self.model(**inputs)
-                embeddings = outputs.last_hidden_state[:, 0]  # [CLS]
-                embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=-1)
+                batch_embeddings = outputs.last_hidden_state[:, 0]  # [CLS]
+                batch_embeddings = torch.nn.functional.normalize(batch_embeddings, p=2, dim=-1)
 
-            return embeddings.cpu().numpy().flatten().tolist()
+                embeddings[batch_indices] = batch_embeddings.float().cpu().numpy()
+
+        return embeddings
+
+    def get_length_stats(self) -> Dict[str, float]:
+        """每批 token 数和 padding 比例"""
+        stats = dict(self.length_stats)
+        batches = stats["batches"]
+        padded = stats["padded_tokens"]
+        stats.update({
+            "tokens_per_batch": padded / batches if batches else 0.0,
+            "real_tokens_per_batch": stats["real_tokens"] / batches if batches else 0.0,
+            "padding_ratio": 1 - stats["real_tokens"] / padded if padded else 0.0
+        })
+        return stats
+
+    def encode_text(self, text: str, use_case: str = USE_CASE_PASSAGE) -> np.ndarray:
+        """编码文本为向量（float32 一维数组，可直接交给 MilvusDataManager）"""
+        try:
+            return self.encode_batch([text], use_case=use_case)[0]
 
         except Exception as e:
             print(f"文本编码失败: {e}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,104 @@
+"""
+向量索引配置
+把索引类型、建索引参数和检索参数放在一起描述，支持 FLAT / IVF_FLAT / IVF_SQ8 / IVF_PQ /
+HNSW / DISKANN。未填写的参数使用下面的默认值，参数名写错时直接报错，而不是被 Milvus 静默忽略。
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+# 每种索引的默认建索引参数和检索参数；允许的参数名就是这里出现的键
+DEFAULT_BUILD_PARAMS: Dict[str, Dict[str, Any]] = {
+    "FLAT": {},
+    "IVF_FLAT": {"nlist": 1024},
+    "IVF_SQ8": {"nlist": 1024},
+    "IVF_PQ": {"nlist": 1024, "m": 16, "nbits": 8},   # m 必须整除向量维度
+    "HNSW": {"M": 16, "efConstruction": 200},
+    "DISKANN": {},                                     # 需要 Milvus 开启磁盘索引
+}
+DEFAULT_SEARCH_PARAMS: Dict[str, Dict[str, Any]] = {
+    "FLAT": {},
+    "IVF_FLAT": {"nprobe": 10},
+    "IVF_SQ8": {"nprobe": 10},
+    "IVF_PQ": {"nprobe": 10},
+    "HNSW": {"ef": 64},                                # ef 不能小于 top_k，检索时会自动抬高
+    "DISKANN": {"search_list": 100},
+}
+INDEX_TYPES = tuple(DEFAULT_BUILD_PARAMS)
+
+
+def _default_metric_type() -> str:
+    """默认度量沿用 MILVUS_CONFIG.metric_type，和入库时的向量归一化方式保持一致"""
+    from config.config import MILVUS_CONFIG
+    return MILVUS_CONFIG.metric_type
+
+
+def has_search_param(index_type: str, name: str) -> bool:
+    """索引类型是否支持某个检索参数，例如只有 IVF 类索引有 nprobe"""
+    return name in DEFAULT_SEARCH_PARAMS.get(index_type.upper(), {})
+
+
+def _check_keys(index_type: str, params: Dict[str, Any], allowed: Dict[str, Any], kind: str) -> None:
+    unknown = set(params) - set(allowed)
+    if unknown:
+        raise ValueError(f"{index_type} 不支持{kind} {sorted(unknown)}，可用参数: {sorted(allowed) or '无'}")
+
+
+@dataclass
+class IndexSpec:
+    """一个向量索引的完整描述"""
+    index_type: str
+    metric_type: str = field(default_factory=_default_metric_type)
+    build_params: Dict[str, Any] = field(default_factory=dict)
+    search_params: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.index_type = self.index_type.upper()
+        self.metric_type = self.metric_type.upper()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"不支持的索引类型: {self.index_type}，可选 {', '.join(INDEX_TYPES)}")
+        _check_keys(self.index_type, self.build_params, DEFAULT_BUILD_PARAMS[self.index_type], "建索引参数")
+        _check_keys(self.index_type, self.search_params, DEFAULT_SEARCH_PARAMS[self.index_type], "检索参数")
+        self.build_params = {**DEFAULT_BUILD_PARAMS[self.index_type], **self.build_params}
+        self.search_params = {**DEFAULT_SEARCH_PARAMS[self.index_type], **self.search_params}
+
+    @classmethod
+    def from_config(cls, config) -> "IndexSpec":
+        """
+        从 MilvusConfig 生成：IVF 类索引沿用 nlist / nprobe 字段，
+        再用 index_build_params / index_search_params 覆盖
+        """
+        index_type = config.index_type.upper()
+        build_params, search_params = {}, {}
+        if "nlist" in DEFAULT_BUILD_PARAMS.get(index_type, {}):
+            build_params["nlist"] = config.nlist
+        if has_search_param(index_type, "nprobe"):
+            search_params["nprobe"] = config.nprobe
+        build_params.update(config.index_build_params)
+        search_params.update(config.index_search_params)
+        return cls(index_type=index_type, metric_type=config.metric_type,
+                   build_params=build_params, search_params=search_params)
+
+    def index_params(self) -> Dict[str, Any]:
+        """Collection.create_index 的 index_params"""
+        return {
+            "index_type": self.index_type,
+            "metric_type": self.metric_type,
+            "params": dict(self.build_params)
+        }
+
+    def search_param(self, overrides: Optional[Dict[str, Any]] = None,
+                     top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Collection.search 的 param
+
+        Args:
+            overrides: 本次调用覆盖的检索参数，例如 {"ef": 128} 或 {"nprobe": 32}
+            top_k: 本次检索的 top_k，HNSW 的 ef 会被抬高到不小于 top_k
+        """
+        overrides = overrides or {}
+        _check_keys(self.index_type, overrides, DEFAULT_SEARCH_PARAMS[self.index_type], "检索参数")
+        params = {**self.search_params, **overrides}
+        if top_k is not None and "ef" in params:
+            params["ef"] = max(params["ef"], top_k)
+        return {"metric_type": self.metric_type, "params": params}
@@ -0,0 +1,102 @@
+# core/ingest_manifest.py
+"""
+入库清单（manifest）
+
+用一个 SQLite 文件记录每个部件的描述内容哈希和嵌入模型标识，
+代替每个部件文件夹里的 .processed 标记文件：
+- 内容或模型变化的部件会被重新编码、写入
+- 文件夹已经消失的部件可以从 Milvus 中删除
+"""
+import os
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def content_hash(text: str) -> str:
+    """计算描述文本的内容哈希"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """部件入库清单：部件名称 -> (内容哈希, 模型标识)"""
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        manifest_dir = os.path.dirname(manifest_path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 流水线写入阶段在独立线程中更新清单
+        self._conn = sqlite3.connect(manifest_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS components (
+                component_name TEXT PRIMARY KEY,
+                content_hash   TEXT NOT NULL,
+                model_id       TEXT NOT NULL,
+                updated_at     TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def load_all(self) -> Dict[str, Tuple[str, str]]:
+        """读取全部记录，返回 {部件名称: (内容哈希, 模型标识)}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT component_name, content_hash, model_id FROM components"
+            ).fetchall()
+        return {name: (digest, model_id) for name, digest, model_id in rows}
+
+    def get(self, component_name: str) -> Optional[Tuple[str, str]]:
+        """读取单个部件的记录，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, model_id FROM components WHERE component_name = ?",
+                (component_name,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def upsert_many(self, entries: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        批量写入记录
+
+        Args:
+            entries: (部件名称, 内容哈希, 模型标识) 列表
+
+        Returns:
+            写入条数
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(name, digest, model_id, now) for name, digest, model_id in entries]
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO components (component_name, content_hash, model_id, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def remove_many(self, component_names: List[str]) -> int:
+        """批量删除记录，返回删除条数"""
+        if not component_names:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM components WHERE component_name = ?",
+                [(name,) for name in component_names]
+            )
+            self._conn.commit()
+        return len(component_names)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
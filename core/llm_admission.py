@@ -0,0 +1,185 @@
+"""
+LLM 请求准入控制
+限制同时发往 vLLM 服务的请求数，排队请求按优先级放行（直播解说优先于后台预生成），
+排队超过时间预算的请求快速失败，由调用方走备用解说。
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+# 优先级：数值越小越先放行
+PRIORITY_LIVE = 0           # 直播实时解说
+PRIORITY_BACKGROUND = 10    # 后台预生成
+
+
+class AdmissionTimeout(Exception):
+    """排队等待超过时间预算"""
+
+
+class _Waiter:
+    """一个排队中的请求"""
+    __slots__ = ("future", "granted", "abandoned")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.granted = False     # 已经分配到执行名额
+        self.abandoned = False   # 已超时或被取消，出队时跳过
+
+
+class AdmissionController:
+    """并发上限 + 优先级队列 + 排队时间预算"""
+
+    def __init__(self, max_concurrency: int = 4, queue_timeout: float = 3.0,
+                 history_size: int = 1024):
+        """
+        Args:
+            max_concurrency: 同时在执行的请求数上限
+            queue_timeout: 默认排队时间预算（秒）
+            history_size: 用于统计等待时间的最近样本数
+        """
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()  # 同一个控制器可能被多个事件循环使用
+        self._in_flight = 0
+        self._queued = 0
+        self._waiters = []  # 堆: (priority, seq, _Waiter)
+        self._seq = itertools.count()
+        self._wait_times = deque(maxlen=history_size)
+
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self, priority: int = PRIORITY_LIVE, queue_timeout: Optional[float] = None) -> float:
+        """
+        获取执行名额
+
+        Args:
+            priority: 优先级，数值越小越先放行
+            queue_timeout: 排队时间预算（秒），None 使用默认值
+
+        Returns:
+            排队等待的时间（秒）
+
+        Raises:
+            AdmissionTimeout: 超过排队时间预算仍未放行
+        """
+        start_time = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.max_concurrency and self._queued == 0:
+                self._in_flight += 1
+                self._record_admit(0.0)
+                return 0.0
+
+            waiter = _Waiter(asyncio.get_running_loop().create_future())
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            self._queued += 1
+
+        timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if not waiter.granted:
+                    waiter.abandoned = True
+                    self._queued -= 1
+                    self.rejected += 1
+                    raise AdmissionTimeout(
+                        f"LLM请求排队超过 {timeout:.1f}s（在执行 {self._in_flight}，排队 {self._queued}）"
+                    )
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter.granted:
+                    self._release_locked()
+                else:
+                    waiter.abandoned = True
+                    self._queued -= 1
+            raise
+
+        wait_time = time.perf_counter() - start_time
+        with self._lock:
+            self._record_admit(wait_time)
+        return wait_time
+
+    def try_acquire(self) -> bool:
+        """
+        不排队地获取执行名额（用于对冲等可有可无的请求）
+
+        Returns:
+            有空闲名额且没有请求在排队时返回 True，需要调用 release 归还
+        """
+        with self._lock:
+            if self._in_flight < self.max_concurrency and self._queued == 0:
+                self._in_flight += 1
+                self._record_admit(0.0)
+                return True
+            return False
+
+    def release(self) -> None:
+        """归还执行名额"""
+        with self._lock:
+            self._release_locked()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_LIVE, queue_timeout: Optional[float] = None):
+        """async with 形式获取和归还执行名额"""
+        await self.acquire(priority=priority, queue_timeout=queue_timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """队列深度和等待时间统计"""
+        with self._lock:
+            waits = sorted(self._wait_times)
+            stats = {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+        def _percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))] * 1000
+
+        stats.update({
+            "wait_ms_avg": sum(waits) / len(waits) * 1000 if waits else 0.0,
+            "wait_ms_p50": _percentile(0.50),
+            "wait_ms_p95": _percentile(0.95),
+            "wait_ms_max": waits[-1] * 1000 if waits else 0.0,
+        })
+        return stats
+
+    # ================== 内部实现 ==================
+
+    def _record_admit(self, wait_time: float) -> None:
+        self.admitted += 1
+        self._wait_times.append(wait_time)
+
+    def _release_locked(self) -> None:
+        """把名额转交给优先级最高的排队请求，没有排队请求时归还（调用方需持有锁）"""
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.abandoned:
+                continue
+            waiter.granted = True
+            self._queued -= 1
+            loop = waiter.future.get_loop()
+            loop.call_soon_threadsafe(_set_granted, waiter.future)
+            return
+        self._in_flight -= 1
+
+
+def _set_granted(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
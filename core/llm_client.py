@@ -1,13 +1,27 @@
+import os
+import sys
 import asyncio
 import time
-from openai import AsyncOpenAI
+import threading
+from typing import AsyncIterator, Dict, List, Optional
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+# ========== 路径设置 ==========
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.llm_admission import AdmissionController, AdmissionTimeout, PRIORITY_LIVE
+from core.llm_endpoints import EndpointPool, STRATEGY_LEAST_OUTSTANDING
+from core.llm_hedging import HedgePolicy, DeadlineExceeded
+from core.prefix_diagnostics import PrefixCacheMonitor
+
+# 回复长度上限（字符）与违禁词
+MAX_REPLY_CHARS = 50
+FORBIDDEN_WORDS = ["最", "第一", "顶级", "唯一", "绝对", "国家级", "首选", "无敌", "碾压", "遥遥领先"]
+SAFE_REPLY = "该部件性能可靠，详情请参考官方说明。"
+
 
 def post_process(reply: str) -> str:
     reply = reply.strip()
@@ -19,26 +33,147 @@ def post_process(reply: str) -> str:
     if "\n" in reply:
         reply = reply.split("\n")[0].strip()
     # 截断
-    if len(reply) > 50:
-        reply = reply[:50]
+    if len(reply) > MAX_REPLY_CHARS:
+        reply = reply[:MAX_REPLY_CHARS]
         if not reply.endswith(("。", "！", "？", "…", ".")):
             reply += "…"
     # 违禁词过滤
-    forbidden_words = ["最", "第一", "顶级", "唯一", "绝对", "国家级", "首选", "无敌", "碾压", "遥遥领先"]
-    if any(word in reply for word in forbidden_words):
-        return "该部件性能可靠，详情请参考官方说明。"
+    if any(word in reply for word in FORBIDDEN_WORDS):
+        return SAFE_REPLY
     return reply
 
 
+class StreamPostProcessor:
+    """
+    流式版本的 post_process：对逐段到达的文本增量应用长度和违禁词规则
+
+    为了能识别跨段的违禁词，会暂存末尾几个字符，直到确认安全再输出。
+
+    与 post_process 的差异：post_process 拿到的是整段文本，命中违禁词时整段替换为
+    SAFE_REPLY；流式场景下违禁词之前的文本可能已经播出，无法再整段替换，所以这里
+    在违禁词之前截断并结束输出，同时置位 forbidden_hit，调用方可以据此补救。
+    同理，post_process 去掉冒号前引导语的规则需要看到整段文本，流式下不做处理。
+    """
+
+    def __init__(self, max_chars: int = MAX_REPLY_CHARS, forbidden_words=None):
+        self.max_chars = max_chars
+        self.forbidden_words = forbidden_words if forbidden_words is not None else FORBIDDEN_WORDS
+        self.holdback = max((len(word) for word in self.forbidden_words), default=1) - 1
+        self.pending = ""       # 暂存未输出的文本
+        self.emitted = 0        # 已输出的字符数
+        self.last_char = ""     # 最后输出的字符
+        self.finished = False   # 是否已经结束输出
+        self.forbidden_hit = False
+        self.truncated = False
+
+    def _take(self, text: str) -> str:
+        """记录即将输出的文本"""
+        if text:
+            self.emitted += len(text)
+            self.last_char = text[-1]
+        return text
+
+    def _cut(self, text: str) -> str:
+        """截断并结束输出，未以句末标点结尾时补省略号"""
+        self.finished = True
+        self.pending = ""
+        text = self._take(text)
+        if self.emitted and self.last_char not in ("。", "！", "？", "…", "."):
+            text += "…"
+        return text
+
+    def feed(self, delta: str) -> str:
+        """
+        输入一段新到达的文本，返回可以安全输出的部分
+
+        Args:
+            delta: 模型新生成的文本片段
+
+        Returns:
+            可以立即输出的文本（可能为空字符串）
+        """
+        if self.finished or not delta:
+            return ""
+
+        if self.emitted == 0 and not self.pending:
+            delta = delta.lstrip()
+        self.pending += delta
+
+        # 只保留第一行
+        if "\n" in self.pending:
+            first_line = self.pending.split("\n")[0].rstrip()
+            if first_line or self.emitted:
+                self.pending = first_line
+                return self.flush()
+            self.pending = self.pending.lstrip()
+
+        # 违禁词：在违禁词之前截断
+        positions = [self.pending.find(word) for word in self.forbidden_words if word in self.pending]
+        if positions:
+            self.forbidden_hit = True
+            return self._cut(self.pending[:min(positions)])
+
+        # 长度：超过上限截断
+        if self.emitted + len(self.pending) > self.max_chars:
+            self.truncated = True
+            return self._cut(self.pending[:self.max_chars - self.emitted])
+
+        # 暂存末尾可能构成违禁词前缀的字符
+        safe_length = len(self.pending) - self.holdback
+        if safe_length <= 0:
+            return ""
+        out = self.pending[:safe_length]
+        self.pending = self.pending[safe_length:]
+        return self._take(out)
+
+    def flush(self) -> str:
+        """流结束时输出剩余暂存文本"""
+        if self.finished:
+            return ""
+        self.finished = True
+        out, self.pending = self.pending.rstrip(), ""
+        return self._take(out)
+
+
 class QwenLLMClient:
     # def __init__(self, base_url="http://192.168.255.6:8091/v1", api_key="EMPTY"):
-    def __init__(self, base_url="http://192.168.110.217:8091/v1", api_key="EMPTY"):
-        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+    def __init__(self, base_url="http://192.168.110.217:8091/v1", api_key="EMPTY",
+                 max_concurrency: int = 4, queue_timeout: float = 3.0,
+                 endpoints: Optional[List[str]] = None,
+                 routing_strategy: str = STRATEGY_LEAST_OUTSTANDING,
+                 hedge_policy: Optional[HedgePolicy] = None,
+                 prefix_monitor: Optional[PrefixCacheMonitor] = None):
+        """
+        Args:
+            base_url: 单个 vLLM 服务地址（未指定 endpoints 时使用）
+            api_key: API Key
+            max_concurrency: 每个 vLLM 副本同时在执行的请求数上限
+            queue_timeout: 默认排队时间预算（秒）
+            endpoints: 多个 vLLM 副本地址，也可以用环境变量 LLM_ENDPOINTS（逗号分隔）指定
+            routing_strategy: 多副本路由策略，least_outstanding 或 ewma
+            hedge_policy: 对冲策略，默认不对冲；传入 HedgePolicy(enabled=True) 启用基于 p95 首字延迟的对冲
+            prefix_monitor: 提示词公共前缀诊断，可传入带真实分词器的实例
+        """
+        if endpoints is None and os.getenv("LLM_ENDPOINTS"):
+            endpoints = [url.strip() for url in os.getenv("LLM_ENDPOINTS").split(",") if url.strip()]
+        self.endpoints = EndpointPool(endpoints or [base_url], api_key=api_key, strategy=routing_strategy)
+        self.client = self.endpoints.endpoints[0].client  # 兼容直接使用 self.client 的旧代码
         # self.model_name = "/home/junh/models/Qwen3-VL-4B-Instruct-AWQ-4bit"
         self.model_name = "/data/ai/model/models/cpatonn-mirror/Qwen3-VL-4B-Instruct-AWQ-4bit"
 
         # 🟢 关键修复：初始化语言提示词
         self.language_prompts = self._init_language_prompts()
+        # 固定的系统提示词，按语言预先生成，保证每次请求的前缀逐字一致
+        self.system_prompts = self._init_system_prompts()
+        self.prefix_monitor = prefix_monitor or PrefixCacheMonitor()
+        self.last_stream_metrics = None  # 最近一次流式调用的首字延迟 / 生成速度
+
+        # 准入控制：限制发往 vLLM 的并发请求数，直播请求优先
+        self.admission = AdmissionController(
+            max_concurrency=max_concurrency * len(self.endpoints),
+            queue_timeout=queue_timeout
+        )
+        self.hedge_policy = hedge_policy or HedgePolicy()
         print(f"✅ LLM客户端初始化完成，支持语言: {list(self.language_prompts.keys())}")
 
     def _init_language_prompts(self):
@@ -442,63 +577,436 @@ class QwenLLMClient:
             "الآن، تخيل أنك في استوديو البث المباشر، ضوء الكاميرا مشتعلاً - ابدأ أداءك! تذكر: 150-200 حرف فقط!"
         )
 
-    async def generate_summary(self, context: str, target_language: str = "en-US", question: str = None):
-        """根据目标语言选择对应的提示词"""
-        # 获取对应语言的提示词
-        if target_language in self.language_prompts:
-            prompt_template = self.language_prompts[target_language]
-        else:
-            # 如果语言不支持，使用英文作为默认
-            logging.warning(f"语言 '{target_language}' 不支持，使用英文提示词")
-            prompt_template = self.language_prompts["en-US"]
+    def _init_system_prompts(self):
+        """
+        把各语言提示词模板拆成固定的系统消息
 
-        # 根据语言添加长度警告前缀
+        商品信息（{context}）是每次都会变化的部分，不再拼进模板中间，而是单独作为
+        用户消息放在最后；长度提醒也移到系统消息里。这样同一语言的请求共享整个
+        系统消息前缀，vLLM 的前缀缓存可以直接复用
+        """
+        # 原来 {context} 所在的位置改成指向用户消息
+        context_refs = {
+            "zh-CN": "（见下一条消息）",
+            "en-US": "(see the next message)",
+            "ja-JP": "（次のメッセージを参照）",
+            "ru-RU": "(см. следующее сообщение)",
+            "fr-FR": "(voir le message suivant)",
+            "ar-SA": "(انظر الرسالة التالية)"
+        }
         length_warnings = {
-            "zh-CN": "【重要提醒：输出必须严格控制在150-200字符之间！我会精确计数！】\n\n",
-            "en-US": "【IMPORTANT REMINDER: Output must be strictly 100-150 words! I will count carefully!】\n\n",
-            "ja-JP": "【重要提醒：出力は厳密に150-200文字以内でなければなりません！正確に数えます！】\n\n",
-            "ru-RU": "【ВАЖНОЕ НАПОМИНАНИЕ: Вывод должен быть строго 120-180 слов! Я буду тщательно подсчитывать!】\n\n",
-            "fr-FR": "【RAPPEL IMPORTANT: La sortie doit être strictement de 120-180 mots! Je compterai soigneusement!】\n\n",
-            "ar-SA": "【تذكير مهم: يجب أن يكون الإخراج بدقة 150-200 حرف! سأعد بعناية!】\n\n"
+            "zh-CN": "【重要提醒：输出必须严格控制在150-200字符之间！我会精确计数！】",
+            "en-US": "【IMPORTANT REMINDER: Output must be strictly 100-150 words! I will count carefully!】",
+            "ja-JP": "【重要提醒：出力は厳密に150-200文字以内でなければなりません！正確に数えます！】",
+            "ru-RU": "【ВАЖНОЕ НАПОМИНАНИЕ: Вывод должен быть строго 120-180 слов! Я буду тщательно подсчитывать!】",
+            "fr-FR": "【RAPPEL IMPORTANT: La sortie doit être strictement de 120-180 mots! Je compterai soigneusement!】",
+            "ar-SA": "【تذكير مهم: يجب أن يكون الإخراج بدقة 150-200 حرف! سأعد بعناية!】"
+        }
+        return {
+            lang: template.format(context=context_refs[lang]) + "\n\n" + length_warnings[lang]
+            for lang, template in self.language_prompts.items()
         }
 
-        warning = length_warnings.get(target_language, "")
-        enhanced_context = warning + context
+    def _build_messages(self, context: str, target_language: str):
+        """根据目标语言构建对话消息：固定的系统消息在前，商品信息在后"""
+        if target_language not in self.system_prompts:
+            # 如果语言不支持，使用英文作为默认
+            logging.warning(f"语言 '{target_language}' 不支持，使用英文提示词")
+            target_language = "en-US"
 
-        # 格式化提示词
-        prompt = prompt_template.format(context=enhanced_context)
-        messages = [{"role": "user", "content": prompt}]
+        messages = [
+            {"role": "system", "content": self.system_prompts[target_language]},
+            {"role": "user", "content": context}
+        ]
+        self.prefix_monitor.observe(messages, key=target_language)
+        return messages
 
+    def _max_tokens(self, target_language: str) -> int:
+        """根据语言设置不同的max_tokens，控制生成长度"""
+        max_tokens_config = {
+            "zh-CN": 250,  # 中文：约250 tokens (150-200字)
+            "en-US": 200,  # 英文：约200 tokens (100-150词) - 减少！
+            "ja-JP": 250,  # 日语：约250 tokens (150-200字)
+            "ru-RU": 220,  # 俄语：约220 tokens (120-180词)
+            "fr-FR": 220,  # 法语：约220 tokens (120-180词)
+            "ar-SA": 250  # 阿拉伯语：约250 tokens (150-200字)
+        }
+        return max_tokens_config.get(target_language, 200)
+
+    async def generate_summary(self, context: str, target_language: str = "en-US", question: str = None,
+                               priority: int = PRIORITY_LIVE, queue_timeout: Optional[float] = None,
+                               deadline: Optional[float] = None):
+        """
+        根据目标语言选择对应的提示词
+
+        排队超过 queue_timeout 时抛出 AdmissionTimeout，超过 deadline（秒，包括排队时间）
+        时抛出 DeadlineExceeded，调用方应走备用解说；其他调用错误返回原文本
+        """
         try:
-            # 根据语言设置不同的max_tokens，控制生成长度
-            max_tokens_config = {
-                "zh-CN": 250,  # 中文：约250 tokens (150-200字)
-                "en-US": 200,  # 英文：约200 tokens (100-150词) - 减少！
-                "ja-JP": 250,  # 日语：约250 tokens (150-200字)
-                "ru-RU": 220,  # 俄语：约220 tokens (120-180词)
-                "fr-FR": 220,  # 法语：约220 tokens (120-180词)
-                "ar-SA": 250  # 阿拉伯语：约250 tokens (150-200字)
-            }
-
-            max_tokens = max_tokens_config.get(target_language, 200)
+            return await self._generate_summary(context, target_language, priority=priority,
+                                                queue_timeout=queue_timeout, deadline=deadline)
+        except (AdmissionTimeout, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logging.error(f"LLM调用失败: {e}")
+            return context  # 出错时返回原文本
+
+    async def _generate_summary(self, context: str, target_language: str, priority: int,
+                                queue_timeout: Optional[float], deadline: Optional[float]) -> str:
+        """generate_summary 的实现，调用错误直接抛出"""
+        messages = self._build_messages(context, target_language)
+        start_time = time.perf_counter()
+        if deadline is not None:
+            budget = self.admission.queue_timeout if queue_timeout is None else queue_timeout
+            queue_timeout = min(budget, deadline)
 
+        async with self.admission.slot(priority=priority, queue_timeout=queue_timeout):
+            self.endpoints.ensure_health_checks()
+            max_tokens = self._max_tokens(target_language)
             logging.info(f"🌐 生成摘要 - 语言: {target_language}, max_tokens: {max_tokens}")
 
-            response = await self.client.chat.completions.create(
+            if self.hedge_policy.enabled and self.endpoints.available_count() >= 2:
+                completion = self._hedged_completion(messages, max_tokens)
+            else:
+                completion = self._retry_completion(messages, max_tokens)
+
+            remaining = None if deadline is None else max(0.0, deadline - (time.perf_counter() - start_time))
+            try:
+                result = await asyncio.wait_for(completion, timeout=remaining)
+            except asyncio.TimeoutError:
+                self.hedge_policy.deadline_exceeded += 1
+                raise DeadlineExceeded(f"LLM请求超过截止时间 {deadline:.1f}s")
+
+            logging.info(f"✅ 生成完成 - 长度: {len(result)} 字符/词")
+            return result
+
+    async def generate_summary_multi(self, context: str, languages: Optional[List[str]] = None,
+                                     priority: int = PRIORITY_LIVE, queue_timeout: Optional[float] = None,
+                                     deadline: Optional[float] = None) -> AsyncIterator[Dict[str, object]]:
+        """
+        同一份商品信息并发生成多种语言的解说，哪个语言先完成就先 yield
+
+        所有语言共用同一份 context（检索只做一次），每个语言的请求各自经过准入控制，
+        所以并发数不会超过客户端的并发预算
+
+        Args:
+            context: 商品信息 / 解说提示词
+            languages: 目标语言列表，默认是全部支持的语言
+            priority: 准入优先级
+            queue_timeout: 每个语言的排队时间预算（秒）
+            deadline: 每个语言的截止时间（秒，包括排队时间）
+
+        Yields:
+            {"language", "text", "latency_ms", "error"}，失败（排队超时、超过截止时间或调用出错）
+            时 text 为 None、error 为错误描述，不会像 generate_summary 那样返回原文本
+        """
+        languages = list(languages or self.language_prompts.keys())
+        start_time = time.perf_counter()
+
+        async def run_one(language: str) -> Dict[str, object]:
+            result = {"language": language, "text": None, "latency_ms": None, "error": None}
+            try:
+                result["text"] = await self._generate_summary(
+                    context, language, priority=priority,
+                    queue_timeout=queue_timeout, deadline=deadline
+                )
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["latency_ms"] = (time.perf_counter() - start_time) * 1000
+            return result
+
+        tasks = [asyncio.ensure_future(run_one(language)) for language in languages]
+        failed = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                if result["error"] is None:
+                    logging.info(f"✅ 多语言生成 - {result['language']}: {result['latency_ms']:.0f}ms")
+                else:
+                    failed += 1
+                    logging.warning(f"⚠️ 多语言生成失败 - {result['language']}: {result['error']}")
+                yield result
+        finally:
+            # 调用方提前退出时取消还没完成的语言
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logging.info(f"🌐 多语言生成完成 - {len(languages)} 种语言, 失败 {failed} 种, "
+                     f"总耗时: {(time.perf_counter() - start_time) * 1000:.0f}ms")
+
+    async def _retry_completion(self, messages, max_tokens: int) -> str:
+        """普通请求，失败时换一个副本重试一次"""
+        failed_endpoints = []
+        last_error = None
+        for _ in range(min(2, len(self.endpoints))):
+            endpoint = self.endpoints.pick(exclude=failed_endpoints)
+            try:
+                async with self.endpoints.track(endpoint):
+                    response = await endpoint.client.chat.completions.create(
+                        model=self.model_name,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=0.8  # 稍微降低temperature，减少随机性
+                    )
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                logging.error(f"LLM调用失败 ({endpoint.base_url}): {e}")
+                failed_endpoints.append(endpoint)
+                last_error = e
+        raise last_error
+
+    async def _stream_attempt(self, endpoint, messages, max_tokens: int, first_token: asyncio.Event) -> str:
+        """以流式方式完成一次请求并拼接全文，收到首个 token 时设置 first_token"""
+        start_time = time.perf_counter()
+        first_token_time = None
+        parts = []
+        async with self.endpoints.track(endpoint):
+            stream = await endpoint.client.chat.completions.create(
                 model=self.model_name,
                 messages=messages,
                 max_tokens=max_tokens,
-                temperature=0.8  # 稍微降低temperature，减少随机性
+                temperature=0.8,
+                stream=True
             )
+            try:
+                async for chunk in stream:
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+                        first_token.set()
+                        self.hedge_policy.observe_ttft(first_token_time - start_time)
+                    parts.append(chunk.choices[0].delta.content)
+            finally:
+                await stream.close()
+        if first_token_time is not None:
+            self.hedge_policy.observe_generation(time.perf_counter() - first_token_time)
+        return "".join(parts).strip()
 
-            result = response.choices[0].message.content.strip()
-            logging.info(f"✅ 生成完成 - 长度: {len(result)} 字符/词")
+    async def _hedged_completion(self, messages, max_tokens: int) -> str:
+        """
+        对冲请求：主请求在对冲延迟内没有返回首个 token（或已经失败）时，
+        向另一个可用副本发重复请求。哪个先成功完成就用哪个，其余的取消。
+
+        对冲请求不会发往主请求所在的副本，并且要占用一个准入名额；
+        没有其他可用副本或没有空闲名额时不对冲，继续等主请求
+        """
+        start_time = time.perf_counter()
+        primary_endpoint = self.endpoints.pick()
+        primary_first_token = asyncio.Event()
+        primary = asyncio.create_task(
+            self._stream_attempt(primary_endpoint, messages, max_tokens, primary_first_token)
+        )
+        first_token_waiter = asyncio.create_task(primary_first_token.wait())
+        tasks = {primary}
+        hedge = None
+        last_error = None
+
+        try:
+            await asyncio.wait({primary, first_token_waiter}, timeout=self.hedge_policy.delay(),
+                               return_when=asyncio.FIRST_COMPLETED)
+            primary_failed = primary.done() and (primary.cancelled() or primary.exception() is not None)
+            if not primary_first_token.is_set() or primary_failed:
+                hedge_endpoint = self.endpoints.pick(exclude=[primary_endpoint], fallback=False)
+                if hedge_endpoint is None or not self.admission.try_acquire():
+                    self.hedge_policy.hedges_skipped += 1
+                    logging.debug("没有其他可用副本或空闲准入名额，不发对冲请求")
+                else:
+                    logging.info(f"🪁 首字延迟超过 {self.hedge_policy.delay() * 1000:.0f}ms，发出对冲请求: "
+                                 f"{hedge_endpoint.base_url}")
+                    hedge = asyncio.create_task(self._admitted_attempt(hedge_endpoint, messages, max_tokens))
+                    tasks.add(hedge)
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logging.error(f"LLM调用失败: {last_error}")
+                        continue
+                    latency = time.perf_counter() - start_time
+                    self.hedge_policy.record(latency, hedged=hedge is not None, hedge_won=task is hedge,
+                                             primary_streaming=primary_first_token.is_set())
+                    return task.result()
+            raise last_error
+        finally:
+            first_token_waiter.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(first_token_waiter, *tasks, return_exceptions=True)
+
+    async def _admitted_attempt(self, endpoint, messages, max_tokens: int) -> str:
+        """已经拿到准入名额的对冲请求，结束或取消时归还名额"""
+        try:
+            return await self._stream_attempt(endpoint, messages, max_tokens, asyncio.Event())
+        finally:
+            self.admission.release()
+
+    async def generate_summary_stream(self, context: str, target_language: str = "en-US",
+                                      question: str = None, apply_post_process: bool = False,
+                                      max_chars: int = MAX_REPLY_CHARS,
+                                      priority: int = PRIORITY_LIVE, queue_timeout: Optional[float] = None):
+        """
+        流式生成摘要，文本片段一到达就 yield 出去
+
+        Args:
+            context: 商品信息 / 解说提示词
+            target_language: 目标语言代码
+            question: 兼容 generate_summary 的参数，未使用
+            apply_post_process: 是否增量应用 post_process 的长度和违禁词规则；
+                默认关闭，与 generate_summary 一样返回完整文本
+            max_chars: 增量长度上限（字符）
+            priority: 准入优先级
+            queue_timeout: 排队时间预算（秒），超时抛出 AdmissionTimeout
+
+        Yields:
+            文本片段；调用结束后 self.last_stream_metrics 记录首字延迟和生成速度
+
+        准入名额和副本的在途计数在生成器结束时才释放。调用方如果可能提前退出
+        async for，需要用 contextlib.aclosing 包住生成器，否则名额要等到
+        垃圾回收执行异步生成器的终结器时才归还::
+
+            async with contextlib.aclosing(client.generate_summary_stream(...)) as stream:
+                async for piece in stream:
+                    ...
+        """
+        messages = self._build_messages(context, target_language)
+        max_tokens = self._max_tokens(target_language)
+        processor = StreamPostProcessor(max_chars=max_chars) if apply_post_process else None
+
+        metrics = {
+            "language": target_language,
+            "ttft_ms": None,           # 首字延迟
+            "total_ms": None,
+            "completion_tokens": 0,
+            "tokens_per_sec": None,
+            "emitted_chars": 0,
+            "forbidden_hit": False,
+            "truncated": False
+        }
+        self.last_stream_metrics = metrics
+
+        # 排队等待执行名额，超过时间预算直接抛出 AdmissionTimeout
+        await self.admission.acquire(priority=priority, queue_timeout=queue_timeout)
+        endpoint = None
+        stream = None
+        stream_failed = False
+        start_time = time.perf_counter()
+        first_token_time = None
+        usage_tokens = None
+
+        # 拿到名额之后的所有步骤都在 try 里，任何异常都会经过 finally 归还名额
+        try:
+            self.endpoints.ensure_health_checks()
+            endpoint = self.endpoints.pick()
+            endpoint.outstanding += 1
+            endpoint.total_requests += 1
+            logging.info(f"🌐 流式生成摘要 - 语言: {target_language}, max_tokens: {max_tokens}")
+
+            stream = await endpoint.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.8,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage_tokens = chunk.usage.completion_tokens
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+
+                metrics["completion_tokens"] += 1  # vLLM 每个片段约对应一个 token
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                    metrics["ttft_ms"] = (first_token_time - start_time) * 1000
+
+                text = processor.feed(delta) if processor else delta
+                if text:
+                    metrics["emitted_chars"] += len(text)
+                    yield text
+                if processor and processor.finished:
+                    break
+
+            if processor:
+                tail = processor.flush()
+                if tail:
+                    metrics["emitted_chars"] += len(tail)
+                    yield tail
 
-            return result
         except Exception as e:
-            logging.error(f"LLM调用失败: {e}")
-            return context  # 出错时返回原文本
+            stream_failed = True
+            base_url = endpoint.base_url if endpoint is not None else "无可用副本"
+            logging.error(f"LLM流式调用失败 ({base_url}): {e}")
+            if metrics["emitted_chars"] == 0:
+                yield context  # 与 generate_summary 一致，出错时返回原文本
+        finally:
+            end_time = time.perf_counter()
+            self.admission.release()
+            if endpoint is not None:
+                endpoint.outstanding -= 1
+                if stream_failed:
+                    self.endpoints.record_failure(endpoint)
+                elif first_token_time is not None:
+                    # 流式请求以首字延迟作为副本的延迟样本
+                    self.endpoints.record_success(endpoint, first_token_time - start_time)
+            metrics["total_ms"] = (end_time - start_time) * 1000
+            if usage_tokens is not None:
+                metrics["completion_tokens"] = usage_tokens
+            if first_token_time is not None and end_time > first_token_time:
+                metrics["tokens_per_sec"] = metrics["completion_tokens"] / (end_time - first_token_time)
+            if processor:
+                metrics["forbidden_hit"] = processor.forbidden_hit
+                metrics["truncated"] = processor.truncated
+
+            ttft = f"{metrics['ttft_ms']:.0f}ms" if metrics["ttft_ms"] is not None else "无"
+            speed = f"{metrics['tokens_per_sec']:.1f}" if metrics["tokens_per_sec"] is not None else "无"
+            logging.info(f"✅ 流式生成完成 - 首字延迟: {ttft}, 速度: {speed} tokens/s, "
+                         f"输出: {metrics['emitted_chars']} 字符")
+            # 最后关闭底层 HTTP 流，关闭出错也不影响上面的计数归还
+            if stream is not None:
+                await stream.close()
+
+    def get_admission_stats(self):
+        """准入控制统计：并发数、队列深度、等待时间"""
+        return self.admission.get_stats()
+
+    def get_hedge_stats(self):
+        """对冲触发率、对冲胜出次数和节省的 p99 延迟"""
+        return self.hedge_policy.get_stats()
+
+    def get_endpoint_stats(self):
+        """各 vLLM 副本的在途请求数、延迟 EWMA 和健康状态"""
+        return self.endpoints.get_stats()
+
+    def get_prefix_stats(self):
+        """相邻请求的提示词公共前缀长度（token），用于确认前缀缓存能否命中"""
+        return self.prefix_monitor.get_stats()
+
+
+# 全局客户端在第一次使用时才创建，import 本模块不会连接服务或打印日志
+_llm_client: Optional[QwenLLMClient] = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client() -> QwenLLMClient:
+    """获取全局 LLM 客户端（懒加载）"""
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = QwenLLMClient()
+    return _llm_client
 
 
-# 使用示例
-llm_client = QwenLLMClient()
+def __getattr__(name):
+    # 兼容旧代码的 from core.llm_client import llm_client
+    if name == "llm_client":
+        return get_llm_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,211 @@
+"""
+多 vLLM 副本的负载均衡
+按最少在途请求数或延迟 EWMA 选择副本。连续失败的副本会被摘除一段时间，
+到期后自动重新加入（再失败会再次摘除）；后台健康检查另外把探测失败的副本
+标记为不健康，探测成功后立即恢复。
+"""
+
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+# 路由策略
+STRATEGY_LEAST_OUTSTANDING = "least_outstanding"
+STRATEGY_EWMA = "ewma"
+
+
+class Endpoint:
+    """一个 vLLM 副本"""
+
+    def __init__(self, base_url: str, api_key: str = "EMPTY", timeout: Optional[float] = None):
+        from openai import AsyncOpenAI  # 延迟导入，只有真正创建副本时才加载 openai
+
+        self.base_url = base_url
+        # timeout=None 会关闭 SDK 的默认超时，未指定时不传，沿用 SDK 默认值
+        client_kwargs = {"timeout": timeout} if timeout is not None else {}
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key, **client_kwargs)
+        self.outstanding = 0            # 在途请求数
+        self.ewma_latency = None        # 延迟的指数移动平均（秒）
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0        # 被摘除到什么时候（time.monotonic）
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "healthy": self.healthy,
+            "ejected": time.monotonic() < self.ejected_until,
+            "outstanding": self.outstanding,
+            "ewma_latency_ms": self.ewma_latency * 1000 if self.ewma_latency is not None else None,
+            "total_requests": self.total_requests,
+            "total_failures": self.total_failures
+        }
+
+
+class EndpointPool:
+    """vLLM 副本池：路由、被动摘除和主动健康检查"""
+
+    def __init__(self, base_urls: Iterable[str], api_key: str = "EMPTY",
+                 strategy: str = STRATEGY_LEAST_OUTSTANDING, ewma_alpha: float = 0.3,
+                 failure_threshold: int = 3, eject_seconds: float = 30.0,
+                 health_interval: float = 10.0, probe_timeout: float = 2.0):
+        """
+        Args:
+            base_urls: 各副本的 base_url，例如 http://host:8091/v1
+            api_key: API Key
+            strategy: 路由策略，least_outstanding 或 ewma
+            ewma_alpha: 延迟 EWMA 的平滑系数
+            failure_threshold: 连续失败多少次后摘除
+            eject_seconds: 摘除时长（秒），到期后自动恢复，不要求健康检查探测成功；
+                健康检查只在 health_interval > 0 且副本数不少于 2 时运行
+            health_interval: 健康检查间隔（秒）
+            probe_timeout: 健康检查请求超时（秒）
+        """
+        if strategy not in (STRATEGY_LEAST_OUTSTANDING, STRATEGY_EWMA):
+            raise ValueError(f"未知的路由策略: {strategy}")
+
+        self.endpoints: List[Endpoint] = [Endpoint(url, api_key) for url in base_urls]
+        if not self.endpoints:
+            raise ValueError("至少需要一个 vLLM 服务地址")
+
+        self.strategy = strategy
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.probe_timeout = probe_timeout
+        self._health_task: Optional[asyncio.Task] = None
+        self._rr = 0  # 得分相同时轮询
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    # ================== 路由 ==================
+
+    def available_count(self) -> int:
+        """当前健康且未被摘除的副本数"""
+        now = time.monotonic()
+        return sum(1 for e in self.endpoints if e.available(now))
+
+    def pick(self, exclude: Iterable[Endpoint] = (), fallback: bool = True) -> Optional[Endpoint]:
+        """
+        选择一个副本
+
+        Args:
+            exclude: 不参与选择的副本（例如刚失败的副本）
+            fallback: 没有可用副本时是否退化为选择被摘除或被排除的副本
+
+        Returns:
+            选中的副本；fallback=True 时全部不可用也不直接失败，
+            fallback=False 时没有可用副本返回 None
+        """
+        excluded = set(id(e) for e in exclude)
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if id(e) not in excluded and e.available(now)]
+        if not candidates:
+            if not fallback:
+                return None
+            candidates = [e for e in self.endpoints if id(e) not in excluded] or self.endpoints
+
+        self._rr += 1
+        offset = self._rr % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+
+        if self.strategy == STRATEGY_EWMA:
+            # 没有延迟样本的副本按已知副本的平均延迟估计；在途请求会排队，按比例放大预期延迟
+            known = [e.ewma_latency for e in self.endpoints if e.ewma_latency is not None]
+            default_latency = sum(known) / len(known) if known else 1.0
+            return min(rotated, key=lambda e: (e.ewma_latency if e.ewma_latency is not None
+                                               else default_latency) * (e.outstanding + 1))
+        return min(rotated, key=lambda e: e.outstanding)
+
+    @asynccontextmanager
+    async def track(self, endpoint: Endpoint):
+        """记录一次请求的在途数、延迟和成败"""
+        endpoint.outstanding += 1
+        endpoint.total_requests += 1
+        start_time = time.perf_counter()
+        try:
+            yield endpoint
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.record_failure(endpoint)
+            raise
+        else:
+            self.record_success(endpoint, time.perf_counter() - start_time)
+        finally:
+            endpoint.outstanding -= 1
+
+    def record_success(self, endpoint: Endpoint, latency: float) -> None:
+        endpoint.consecutive_failures = 0
+        if endpoint.ewma_latency is None:
+            endpoint.ewma_latency = latency
+        else:
+            endpoint.ewma_latency = self.ewma_alpha * latency + (1 - self.ewma_alpha) * endpoint.ewma_latency
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        endpoint.consecutive_failures += 1
+        endpoint.total_failures += 1
+        if endpoint.consecutive_failures >= self.failure_threshold and time.monotonic() >= endpoint.ejected_until:
+            # 被动摘除按时间恢复：到期后副本重新参与路由，若仍然失败会很快再次被摘除
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+            logging.warning(f"🚫 vLLM副本连续失败 {endpoint.consecutive_failures} 次，摘除 "
+                            f"{self.eject_seconds:.0f}s: {endpoint.base_url}")
+
+    # ================== 健康检查 ==================
+
+    async def probe(self, endpoint: Endpoint) -> bool:
+        """请求 /models 检查副本是否可用，并更新其状态"""
+        try:
+            await asyncio.wait_for(endpoint.client.models.list(), timeout=self.probe_timeout)
+            ok = True
+        except Exception as e:
+            logging.debug(f"健康检查失败 {endpoint.base_url}: {e}")
+            ok = False
+
+        was_available = endpoint.available(time.monotonic())
+        endpoint.healthy = ok
+        if ok:
+            if not was_available:
+                logging.info(f"✅ vLLM副本恢复，重新加入: {endpoint.base_url}")
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = 0.0
+        elif was_available:
+            logging.warning(f"🚫 vLLM副本健康检查失败，摘除: {endpoint.base_url}")
+        return ok
+
+    async def probe_all(self) -> Dict[str, bool]:
+        """并发检查所有副本"""
+        results = await asyncio.gather(*(self.probe(e) for e in self.endpoints))
+        return {e.base_url: ok for e, ok in zip(self.endpoints, results)}
+
+    def ensure_health_checks(self) -> None:
+        """在当前事件循环中启动后台健康检查（已在运行则跳过）"""
+        if self.health_interval <= 0 or len(self.endpoints) < 2:
+            return
+        loop = asyncio.get_running_loop()
+        task = self._health_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        self._health_task = loop.create_task(self._health_loop())
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.probe_all()
+
+    def stop_health_checks(self) -> None:
+        if self._health_task is not None and not self._health_task.done():
+            self._health_task.get_loop().call_soon_threadsafe(self._health_task.cancel)
+        self._health_task = None
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        return [e.to_dict() for e in self.endpoints]
@@ -0,0 +1,111 @@
+"""
+LLM 请求的对冲（hedging）与截止时间
+主请求在 p95 首字延迟内还没有返回首个 token 时，再向另一个健康副本发一个重复请求，
+哪个先完成用哪个，其余的取消。对冲会多占一份 GPU 算力，需要显式开启，
+且只在至少有两个可用副本、并且有空闲准入名额时才会发出。
+"""
+
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class DeadlineExceeded(Exception):
+    """LLM请求超过截止时间"""
+
+
+def _percentile(samples, p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class HedgePolicy:
+    """对冲策略：根据最近的首字延迟分布决定何时发出对冲请求"""
+
+    def __init__(self, enabled: bool = False, percentile: float = 0.95,
+                 initial_delay: float = 1.5, min_delay: float = 0.2, max_delay: float = 5.0,
+                 min_samples: int = 20, history_size: int = 512):
+        """
+        Args:
+            enabled: 是否启用对冲（默认关闭）
+            percentile: 对冲延迟取首字延迟的哪个分位数
+            initial_delay: 样本不足时使用的对冲延迟（秒）
+            min_delay: 对冲延迟下限（秒）
+            max_delay: 对冲延迟上限（秒）
+            min_samples: 使用分位数前需要的最少样本数
+            history_size: 保留的最近样本数
+        """
+        self.enabled = enabled
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+
+        self._ttft = deque(maxlen=history_size)          # 首字延迟样本
+        self._generation = deque(maxlen=history_size)    # 首字之后的生成耗时样本
+        self._latency = deque(maxlen=history_size)       # 实际端到端延迟
+        self._unhedged = deque(maxlen=history_size)      # 不对冲时的延迟（对冲胜出时为估计值）
+
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0      # 该对冲但没有其他可用副本或准入名额
+        self.deadline_exceeded = 0
+
+    def observe_ttft(self, seconds: float) -> None:
+        self._ttft.append(seconds)
+
+    def observe_generation(self, seconds: float) -> None:
+        self._generation.append(seconds)
+
+    def delay(self) -> float:
+        """当前的对冲延迟（秒）"""
+        if len(self._ttft) < self.min_samples:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, _percentile(self._ttft, self.percentile)))
+
+    def record(self, latency: float, hedged: bool, hedge_won: bool,
+               primary_streaming: bool = False) -> None:
+        """
+        记录一次请求的结果
+
+        对冲胜出时主请求已被取消，它本来的延迟未知：若主请求当时还没有首字，
+        按"已耗时 + 首字后生成耗时中位数"估计，否则取已耗时作为下界。
+
+        Args:
+            latency: 实际端到端延迟（秒）
+            hedged: 是否发出了对冲请求
+            hedge_won: 是否由对冲请求胜出
+            primary_streaming: 对冲胜出时主请求是否已经收到首字
+        """
+        self.requests += 1
+        self._latency.append(latency)
+        if hedged:
+            self.hedges_fired += 1
+        if hedge_won:
+            self.hedge_wins += 1
+            remaining = 0.0 if primary_streaming else (_percentile(self._generation, 0.5) or 0.0)
+            self._unhedged.append(latency + remaining)
+        else:
+            self._unhedged.append(latency)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """对冲触发率和节省的 p99 延迟（不对冲时的 p99 是估计值）"""
+        p99_actual = _percentile(self._latency, 0.99)
+        p99_unhedged = _percentile(self._unhedged, 0.99)
+        return {
+            "enabled": self.enabled,
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedge_rate": self.hedges_fired / self.requests if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "hedges_skipped": self.hedges_skipped,
+            "deadline_exceeded": self.deadline_exceeded,
+            "hedge_delay_ms": self.delay() * 1000,
+            "p99_ms": p99_actual * 1000 if p99_actual is not None else None,
+            "p99_unhedged_ms_estimated": p99_unhedged * 1000 if p99_unhedged is not None else None,
+            "p99_saved_ms": (p99_unhedged - p99_actual) * 1000
+            if p99_actual is not None and p99_unhedged is not None else None
+        }
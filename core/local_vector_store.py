@@ -0,0 +1,505 @@
+"""
+进程内向量库
+部件库只有几万条 512 维向量，全部放进内存也就几十 MB。LocalVectorStore 用一个
+float32 矩阵保存向量（memmap 到磁盘文件），提供和 MilvusDataManager 相同的接口：
+暴力检索或可选的 IVF 倒排检索，检索不经过网络，开发机 / CI / 离线演示不需要 Milvus 服务。
+
+磁盘格式（<local_store_dir>/<collection_name>/）：
+- vectors.f32: (capacity, dim) 的 float32 memmap，前 count 行有效
+- rows.json: 维度、行数、容量以及每一行的 component_id / description，flush 时原子替换
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ========== 路径设置 ==========
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from config.config import MILVUS_CONFIG, MODEL_CONFIG
+from core.vector_store import VectorStoreBase, SearchHit, as_float32_matrix
+
+logger = logging.getLogger(__name__)
+
+INDEX_FLAT = "FLAT"
+INDEX_IVF = "IVF"
+
+IVF_MIN_ROWS = 4096          # 行数少于这个值时 IVF 也直接暴力检索（更快且召回率 100%）
+INITIAL_CAPACITY = 1024      # 新建向量文件的初始行数，写满后按两倍扩容
+
+
+def _similarity(matrix: np.ndarray, queries: np.ndarray, metric_type: str) -> np.ndarray:
+    """
+    计算 (len(queries), len(matrix)) 的得分矩阵，统一为“越大越相似”
+
+    IP / COSINE 返回内积（COSINE 先归一化），L2 返回负的平方欧氏距离
+    """
+    if metric_type == "COSINE":
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    scores = queries @ matrix.T
+    if metric_type == "L2":
+        scores = 2 * scores - np.einsum("ij,ij->i", matrix, matrix)[None, :] \
+                 - np.einsum("ij,ij->i", queries, queries)[:, None]
+    return scores
+
+
+def _to_distance(scores: np.ndarray, metric_type: str) -> np.ndarray:
+    """把内部得分换回 Milvus 返回的 distance（L2 为平方距离）"""
+    return -scores if metric_type == "L2" else scores
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """一维得分中最大的 k 个下标，按得分从高到低排序"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class _IvfIndex:
+    """
+    简单的 IVF 倒排索引：k-means 聚类中心 + 每行所属的簇
+    写入时只给新行分配簇；行数相对训练时变化超过一倍才重新训练
+    """
+
+    def __init__(self, nlist: int, metric_type: str, auto_nlist: bool = True,
+                 max_iter: int = 10, seed: int = 0):
+        self.max_nlist = nlist
+        self.auto_nlist = auto_nlist  # 簇数不超过 4 * sqrt(N)，避免小库里大部分簇几乎为空
+        self.metric_type = metric_type
+        self.max_iter = max_iter
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.assign = np.empty(0, dtype=np.int32)   # 行号 -> 簇号
+        self.trained_rows = 0
+        self._order = None                          # 按簇排序后的行号（懒构建）
+        self._bounds = None
+
+    def needs_training(self, num_rows: int) -> bool:
+        if self.centroids is None:
+            return True
+        return num_rows > 2 * self.trained_rows or num_rows < self.trained_rows // 2
+
+    def train(self, matrix: np.ndarray) -> None:
+        """在当前全部向量上训练聚类中心"""
+        num_rows = len(matrix)
+        nlist = min(self.max_nlist, num_rows)
+        if self.auto_nlist:
+            nlist = min(nlist, int(4 * np.sqrt(num_rows)))
+        nlist = max(1, nlist)
+        rng = np.random.default_rng(self.seed)
+        # 每个簇最多取 64 个样本训练，几万行的库全量训练也只需要几百毫秒
+        sample = matrix[rng.choice(num_rows, size=min(num_rows, 64 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(self.max_iter):
+            labels = np.argmax(_similarity(centroids, sample, self.metric_type), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+            if self.metric_type in ("IP", "COSINE"):
+                centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        self.centroids = centroids
+        self.assign = np.empty(0, dtype=np.int32)
+        self.assign_rows(np.arange(num_rows), matrix)
+        self.trained_rows = num_rows
+        logger.info(f"IVF 训练完成: {num_rows} 行, {nlist} 个簇")
+
+    def assign_rows(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """给新写入 / 更新的行分配簇"""
+        if self.centroids is None or len(rows) == 0:
+            return
+        needed = int(rows.max()) + 1
+        if needed > len(self.assign):
+            self.assign = np.resize(self.assign, max(needed, 2 * len(self.assign)))
+        self.assign[rows] = np.argmax(_similarity(self.centroids, vectors, self.metric_type), axis=1)
+        self._order = None
+
+    def move_row(self, src: int, dst: int) -> None:
+        """删除时最后一行挪到空位"""
+        if self.centroids is not None:
+            self.assign[dst] = self.assign[src]
+            self._order = None
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, top_k: int,
+               nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """只在最近的 nprobe 个簇里暴力检索，返回 (行号, 得分)"""
+        num_rows = len(matrix)
+        if self._order is None:
+            assign = self.assign[:num_rows]
+            self._order = np.argsort(assign, kind="stable")
+            self._bounds = np.searchsorted(assign[self._order], np.arange(len(self.centroids) + 1))
+
+        centroid_scores = _similarity(self.centroids, query[None, :], self.metric_type)[0]
+        probes = _top_k(centroid_scores, nprobe)
+        candidates = np.concatenate([self._order[self._bounds[c]:self._bounds[c + 1]] for c in probes])
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        scores = _similarity(matrix[candidates], query[None, :], self.metric_type)[0]
+        best = _top_k(scores, top_k)
+        return candidates[best], scores[best]
+
+
+class LocalVectorStore(VectorStoreBase):
+    """进程内 NumPy 向量库，接口与 MilvusDataManager 一致"""
+
+    def __init__(self, text_embedder=None, use_directory: bool = True,
+                 store_dir: Optional[str] = None, index_type: Optional[str] = None,
+                 nlist: Optional[int] = None, ivf_min_rows: int = IVF_MIN_ROWS):
+        """
+        Args:
+            text_embedder: search_text 使用的编码器
+            use_directory: 是否启用部件名称目录快速路径
+            store_dir: 数据目录，默认读取 MILVUS_CONFIG.local_store_dir
+            index_type: "FLAT" 或 "IVF"，默认读取 MILVUS_CONFIG.local_index_type
+            nlist: IVF 簇数；默认读取 MILVUS_CONFIG.nlist，并限制在 4 * sqrt(N) 以内
+            ivf_min_rows: 行数少于这个值时 IVF 也走暴力检索
+        """
+        super().__init__(text_embedder=text_embedder, use_directory=use_directory)
+        self.collection_name = MILVUS_CONFIG.collection_name
+        self.metric_type = MILVUS_CONFIG.metric_type
+        self._auto_nlist = nlist is None
+        self.nlist = nlist or MILVUS_CONFIG.nlist
+        self.nprobe = MILVUS_CONFIG.nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.dim = MODEL_CONFIG.embedding_dim
+        self.index_type = (index_type or MILVUS_CONFIG.local_index_type).upper()
+        if self.index_type not in (INDEX_FLAT, INDEX_IVF):
+            raise ValueError(f"local 后端不支持索引类型 {self.index_type}，可选 {INDEX_FLAT} / {INDEX_IVF}")
+
+        self.store_dir = os.path.join(store_dir or MILVUS_CONFIG.local_store_dir, self.collection_name)
+        self._vectors_path = os.path.join(self.store_dir, "vectors.f32")
+        self._rows_path = os.path.join(self.store_dir, "rows.json")
+
+        self._lock = threading.RLock()  # 扩容会重新映射文件，检索和写入都要持有
+        self._vectors: Optional[np.memmap] = None
+        self._capacity = 0
+        self._count = 0
+        self._ids: List[str] = []
+        self._descriptions: List[str] = []
+        self._rows: Dict[str, int] = {}  # component_id -> 行号
+        self._ivf = _IvfIndex(self.nlist, self.metric_type, auto_nlist=self._auto_nlist) if self.index_type == INDEX_IVF else None
+
+        logger.info(f"初始化 LocalVectorStore:")
+        logger.info(f"  目录: {self.store_dir}")
+        logger.info(f"  索引: {self.index_type}, 度量: {self.metric_type}")
+
+        if os.path.exists(self._rows_path):
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    # ================== 文件读写 ==================
+
+    def _map(self, mode: str) -> None:
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode=mode,
+                                  shape=(self._capacity, self.dim))
+
+    def _load(self) -> None:
+        """打开已有的向量文件和行信息"""
+        with open(self._rows_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dim"] != self.dim:
+            raise ValueError(f"本地向量库维度 {meta['dim']} 与配置的 embedding_dim {self.dim} 不一致: {self.store_dir}")
+
+        self._capacity = meta["capacity"]
+        self._ids = meta["ids"]
+        self._descriptions = meta["descriptions"]
+        self._count = len(self._ids)
+        self._rows = {component_id: row for row, component_id in enumerate(self._ids)}
+        self._map("r+")
+        if self._ivf is not None:
+            self._ivf = _IvfIndex(self.nlist, self.metric_type, auto_nlist=self._auto_nlist)  # 聚类中心不落盘，首次检索时重新训练
+        logger.info(f"本地向量库已加载: {self._count} 条")
+
+    def _grow(self, min_capacity: int) -> None:
+        """扩大向量文件（先解除映射再改文件大小，Windows 上映射中的文件不能截断）"""
+        new_capacity = max(min_capacity, 2 * self._capacity, INITIAL_CAPACITY)
+        self._vectors.flush()
+        self._vectors = None
+        with open(self._vectors_path, "r+b") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self._capacity = new_capacity
+        self._map("r+")
+
+    def create_collection(self):
+        """打开已有的向量文件，不存在时创建数据目录和向量文件"""
+        with self._lock:
+            if self._vectors is not None:
+                logger.info(f"集合 {self.collection_name} 已存在，跳过创建")
+                return True
+            if os.path.exists(self._rows_path):
+                self._load()
+                return True
+            os.makedirs(self.store_dir, exist_ok=True)
+            self._capacity = INITIAL_CAPACITY
+            self._map("w+")
+            self.flush()
+            logger.info(f"本地集合 {self.collection_name} 创建成功")
+            return True
+
+    def flush(self):
+        """把向量刷到磁盘，再原子替换行信息文件"""
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._vectors.flush()
+            meta = {
+                "dim": self.dim,
+                "capacity": self._capacity,
+                "ids": self._ids,
+                "descriptions": self._descriptions
+            }
+            tmp_path = self._rows_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_path, self._rows_path)
+
+    # ================== 写入与删除 ==================
+
+    def insert_component(self, component_id: str, vector, description: str):
+        """插入一个部件的数据（见 MilvusDataManager.insert_component）"""
+        try:
+            result = self.upsert_components([component_id], as_float32_matrix(vector), [description])
+            logger.info(f"插入部件: {component_id}, 描述长度: {len(description)}")
+            return result
+        except Exception as e:
+            logger.error(f"插入部件失败 (component_id={component_id}): {e}")
+            return None
+
+    def upsert_components(self, component_ids: List[str], vectors, descriptions: List[str],
+                          chunk_size: Optional[int] = None, flush: bool = True) -> Dict:
+        """
+        批量写入部件数据，返回格式与 MilvusDataManager.upsert_components 相同
+
+        Args:
+            chunk_size: 兼容参数，本地写入不分块
+            flush: 写完后是否把行信息落盘
+        """
+        total = len(component_ids)
+        if len(vectors) != total or len(descriptions) != total:
+            raise ValueError(
+                f"列长度不一致: ids={total}, vectors={len(vectors)}, descriptions={len(descriptions)}"
+            )
+        stats = {
+            "total_rows": total,
+            "upserted_rows": 0,
+            "failed_ids": [],
+            "chunks": [],
+            "flush_seconds": 0.0,
+            "total_seconds": 0.0
+        }
+        if total == 0:
+            return stats
+
+        vectors = as_float32_matrix(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"向量维度 {vectors.shape[1]} 与 embedding_dim {self.dim} 不一致")
+
+        start_time = time.perf_counter()
+        with self._lock:
+            if self._vectors is None:
+                self.create_collection()
+
+            # 同一批里重复的 component_id 以最后一次为准
+            latest = {component_id: i for i, component_id in enumerate(component_ids)}
+            sources = np.fromiter(latest.values(), dtype=np.int64, count=len(latest))
+            rows = np.empty(len(latest), dtype=np.int64)
+            for j, (component_id, i) in enumerate(latest.items()):
+                row = self._rows.get(component_id)
+                if row is None:
+                    row = self._count
+                    self._rows[component_id] = row
+                    self._ids.append(component_id)
+                    self._descriptions.append(descriptions[i])
+                    self._count += 1
+                else:
+                    self._descriptions[row] = descriptions[i]
+                rows[j] = row
+
+            if self._count > self._capacity:
+                self._grow(self._count)
+            self._vectors[rows] = vectors[sources]
+            if self._ivf is not None:
+                self._ivf.assign_rows(rows, vectors[sources])
+
+            if self.directory is not None:
+                self.directory.upsert(component_ids, descriptions)
+            stats["upserted_rows"] = total
+            stats["chunks"].append({"index": 0, "rows": total, "status": "success",
+                                    "seconds": time.perf_counter() - start_time})
+
+            if flush:
+                flush_start = time.perf_counter()
+                self.flush()
+                stats["flush_seconds"] = time.perf_counter() - flush_start
+
+        stats["total_seconds"] = time.perf_counter() - start_time
+        logger.info(f"本地批量写入完成: {total} 行, 耗时 {stats['total_seconds'] * 1000:.1f}ms")
+        return stats
+
+    def delete_components(self, component_ids: List[str]) -> int:
+        """
+        按部件标识批量删除（最后一行挪到被删除的位置，矩阵保持连续），删除后立即落盘
+
+        Returns:
+            删除条数
+        """
+        if not component_ids:
+            return 0
+        deleted = 0
+        with self._lock:
+            for component_id in component_ids:
+                row = self._rows.pop(component_id, None)
+                if row is None:
+                    continue
+                last = self._count - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._vectors[row] = self._vectors[last]
+                    self._ids[row] = moved_id
+                    self._descriptions[row] = self._descriptions[last]
+                    self._rows[moved_id] = row
+                    if self._ivf is not None:
+                        self._ivf.move_row(last, row)
+                self._ids.pop()
+                self._descriptions.pop()
+                self._count -= 1
+                deleted += 1
+
+            if deleted:
+                self.flush()
+            if self.directory is not None:
+                self.directory.remove(component_ids)
+        logger.info(f"删除部件: {deleted} 个")
+        return deleted
+
+    # ================== 检索 ==================
+
+    def search(self, vectors, top_k: int = 5, nprobe: Optional[int] = None,
+               output_fields: Sequence[str] = ("description",),
+               search_params: Optional[Dict] = None) -> List[List[SearchHit]]:
+        """
+        向量检索，参数和返回值与 MilvusDataManager.search 相同
+
+        FLAT（或行数少于 ivf_min_rows）时一次矩阵乘法完成整批查询；
+        IVF 时每个查询只扫描最近的 nprobe 个簇（search_params 里只有 nprobe 生效）
+        """
+        nprobe = nprobe or (search_params or {}).get("nprobe") or self.nprobe
+        if len(vectors) == 0:
+            return []
+        queries = as_float32_matrix(vectors)
+        with_description = "description" in output_fields
+
+        search_start = time.perf_counter()
+        with self._lock:
+            if self._count == 0:
+                return [[] for _ in range(len(queries))]
+            matrix = self._vectors[:self._count]
+
+            if self._ivf is not None and self._count >= self.ivf_min_rows:
+                if self._ivf.needs_training(self._count):
+                    self._ivf.train(np.asarray(matrix))
+                results = [self._ivf.search(matrix, query, top_k, nprobe) for query in queries]
+            else:
+                scores = _similarity(matrix, queries, self.metric_type)
+                results = []
+                for row_scores in scores:
+                    best = _top_k(row_scores, top_k)
+                    results.append((best, row_scores[best]))
+
+            all_hits = []
+            for rows, scores in results:
+                distances = _to_distance(scores, self.metric_type)
+                all_hits.append([
+                    SearchHit(
+                        component_id=self._ids[row],
+                        score=float(distance),
+                        description=self._descriptions[row] if with_description else ""
+                    )
+                    for row, distance in zip(rows, distances)
+                ])
+        logger.debug(f"本地检索 {len(queries)} 个向量, top_k={top_k}, 耗时 {(time.perf_counter() - search_start) * 1000:.1f}ms")
+        return all_hits
+
+    def rebuild_index(self, index_spec=None, batch_size: int = 1000, drop_old: bool = True) -> Dict:
+        """
+        重建索引：在快照上训练新的 IVF 聚类中心，训练期间检索继续使用旧索引，
+        训练完成后在锁内给当前全部行分配簇并切换
+
+        Args:
+            index_spec: core.index_spec.IndexSpec；FLAT 切换为暴力检索，IVF_* 使用其中的 nlist / nprobe，
+                默认保持当前索引类型：IVF 按当前 nlist 重新训练，FLAT 无需重建直接返回
+            batch_size / drop_old: 兼容 MilvusDataManager.rebuild_index 的参数，这里不使用
+        """
+        start_time = time.perf_counter()
+        if index_spec is not None:
+            if index_spec.metric_type != self.metric_type:
+                raise ValueError(f"index_spec 的度量 {index_spec.metric_type} 与向量库的度量 {self.metric_type} 不一致")
+            if index_spec.index_type == INDEX_FLAT:
+                with self._lock:
+                    self.index_type, self._ivf = INDEX_FLAT, None
+                logger.info("本地向量库已切换为 FLAT 暴力检索")
+                return {"index_type": INDEX_FLAT, "rows": self._count, "total_seconds": 0.0}
+            if not index_spec.index_type.startswith("IVF"):
+                raise ValueError(f"local 后端只支持 FLAT 和 IVF 类索引，不支持 {index_spec.index_type}")
+            self.nlist = index_spec.build_params["nlist"]
+            self.nprobe = index_spec.search_params["nprobe"]
+            self._auto_nlist = False
+        elif self.index_type == INDEX_FLAT:
+            logger.info("本地向量库使用 FLAT 暴力检索，无需重建索引")
+            return {"index_type": INDEX_FLAT, "rows": self._count, "total_seconds": 0.0}
+
+        with self._lock:
+            snapshot = np.array(self._vectors[:self._count]) if self._count else None
+        ivf = _IvfIndex(self.nlist, self.metric_type, auto_nlist=self._auto_nlist)
+        if snapshot is not None:
+            ivf.train(snapshot)
+
+        with self._lock:
+            if ivf.centroids is not None:
+                # 训练期间可能有写入，按当前数据重新分配一次簇
+                ivf.assign_rows(np.arange(self._count), np.asarray(self._vectors[:self._count]))
+                ivf.trained_rows = self._count
+            self.index_type, self._ivf = INDEX_IVF, ivf
+        total_seconds = time.perf_counter() - start_time
+        logger.info(f"本地 IVF 索引已重建: {self._count} 行, 耗时 {total_seconds:.2f}s")
+        return {"index_type": INDEX_IVF, "rows": self._count, "total_seconds": total_seconds}
+
+    def _directory_rows(self, batch_size: int) -> Iterable[Tuple[str, str]]:
+        with self._lock:
+            return list(zip(self._ids, self._descriptions))
+
+    def export_vectors(self, batch_size: int = 1000) -> Tuple[List[str], np.ndarray]:
+        """导出全部向量（拷贝一份，不受之后写入影响）"""
+        with self._lock:
+            if self._count == 0:
+                return [], np.empty((0, self.dim), dtype=np.float32)
+            return list(self._ids), np.array(self._vectors[:self._count])
+
+    def close(self):
+        """落盘并释放内存映射"""
+        self.stop_directory_refresh()
+        with self._lock:
+            self.flush()
+            self._vectors = None
+            logger.info("本地向量库已关闭")
@@ -1,11 +1,16 @@
 import os
 import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+import numpy as np
 from pymilvus import (
     connections, Collection, FieldSchema, CollectionSchema, DataType,
     utility
 )
 import logging
-from typing import List
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 # ========== 添加路径设置 ==========
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -21,26 +26,57 @@ except ImportError as e:
     print(f"导入配置失败: {e}")
     raise
 
+# SearchHit / as_float32_matrix 定义在 core.vector_store，这里保留导入以兼容旧的引用方式
+from core.vector_store import VectorStoreBase, SearchHit, as_float32_matrix
+from core.index_spec import IndexSpec, has_search_param
+from core.search_cache import SearchResultCache
+
 logger = logging.getLogger(__name__)
 
-class MilvusDataManager:
+
+class MilvusDataManager(VectorStoreBase):
     """Milvus 数据管理器 - 存储部件名称向量和描述"""
 
-    def __init__(self):
+    def __init__(self, text_embedder=None, use_directory: bool = True, use_result_cache: bool = True):
+        super().__init__(text_embedder=text_embedder, use_directory=use_directory)
         self.host = MILVUS_CONFIG.host
         self.port = MILVUS_CONFIG.port
         self.collection_name = MILVUS_CONFIG.collection_name
-        self.index_type = MILVUS_CONFIG.index_type
         self.metric_type = MILVUS_CONFIG.metric_type
-        self.nlist = MILVUS_CONFIG.nlist
-        self.nprobe = MILVUS_CONFIG.nprobe
+        self.index_spec = IndexSpec.from_config(MILVUS_CONFIG)  # 建索引参数 + 默认检索参数
+        self.upsert_batch_size = MILVUS_CONFIG.upsert_batch_size
+
+        self._collection = None  # 缓存的集合句柄
+        self._collection_loaded = False  # 集合是否已 load 到内存
+        self._load_lock = threading.Lock()
+        # 重建索引期间挡住本进程的写入，避免复制数据之后的写入在切换别名时丢失
+        self._write_lock = threading.RLock()
+        # 检索结果缓存：每次写入后失效
+        self.result_cache = None
+        if use_result_cache and MILVUS_CONFIG.result_cache_size > 0:
+            self.result_cache = SearchResultCache(
+                max_entries=MILVUS_CONFIG.result_cache_size,
+                ttl_seconds=MILVUS_CONFIG.result_cache_ttl,
+                settle_seconds=MILVUS_CONFIG.result_cache_settle_seconds
+            )
 
         logger.info(f"初始化 MilvusDataManager:")
         logger.info(f"  主机: {self.host}:{self.port}")
         logger.info(f"  集合: {self.collection_name}")
+        logger.info(f"  索引: {self.index_spec.index_type} {self.index_spec.build_params}")
 
         self._connect()
 
+    @contextmanager
+    def _writing(self):
+        """持有写锁执行写入，结束后（无论成功与否）让检索结果缓存失效"""
+        with self._write_lock:
+            try:
+                yield
+            finally:
+                if self.result_cache is not None:
+                    self.result_cache.bump()
+
     def _connect(self):
         """连接 Milvus"""
         try:
@@ -50,58 +86,62 @@ class MilvusDataManager:
             logger.error(f"连接 Milvus 失败: {e}")
             raise
 
+    def _build_schema(self) -> CollectionSchema:
+        fields = [
+            FieldSchema(
+                name="component_id",  # 部件唯一标识/名称
+                dtype=DataType.VARCHAR,
+                max_length=128,
+                is_primary=True
+            ),
+            FieldSchema(
+                name="vector",
+                dtype=DataType.FLOAT_VECTOR,
+                dim=MODEL_CONFIG.embedding_dim
+            ),
+            FieldSchema(
+                name="description",
+                dtype=DataType.VARCHAR,
+                max_length=65535
+            )
+            # 移除了 component_name 字段
+        ]
+        return CollectionSchema(fields=fields, description="部件名称向量 + 文本描述")
+
+    def _create_physical_collection(self, name: str, index_spec: IndexSpec) -> Collection:
+        """创建实际的集合并按 index_spec 建向量索引"""
+        collection = Collection(name=name, schema=self._build_schema())
+        collection.create_index(field_name="vector", index_params=index_spec.index_params())
+        return collection
+
     def create_collection(self):
-        """创建用于部件检索的集合"""
+        """
+        创建用于部件检索的集合
+
+        实际集合命名为 <collection_name>_v1，collection_name 作为指向它的别名，
+        之后 rebuild_index 可以建好新集合再切换别名
+        """
         if utility.has_collection(self.collection_name):
             logger.info(f"集合 {self.collection_name} 已存在，跳过创建")
             return True
 
         try:
-            fields = [
-                FieldSchema(
-                    name="component_id",  # 部件唯一标识/名称
-                    dtype=DataType.VARCHAR,
-                    max_length=128,
-                    is_primary=True
-                ),
-                FieldSchema(
-                    name="vector",
-                    dtype=DataType.FLOAT_VECTOR,
-                    dim=MODEL_CONFIG.embedding_dim
-                ),
-                FieldSchema(
-                    name="description",
-                    dtype=DataType.VARCHAR,
-                    max_length=65535
-                )
-                # 移除了 component_name 字段
-            ]
-
-            schema = CollectionSchema(fields=fields, description="部件名称向量 + 文本描述")
-            collection = Collection(name=self.collection_name, schema=schema)
-
-            # 创建向量索引
-            collection.create_index(
-                field_name="vector",
-                index_params={
-                    "index_type": self.index_type,
-                    "metric_type": self.metric_type,
-                    "params": {"nlist": self.nlist}
-                }
-            )
-            logger.info(f"集合 {self.collection_name} 创建成功")
+            physical_name = f"{self.collection_name}_v1"
+            self._create_physical_collection(physical_name, self.index_spec)
+            utility.create_alias(physical_name, self.collection_name)
+            logger.info(f"集合 {physical_name} 创建成功（别名 {self.collection_name}）")
             return True
 
         except Exception as e:
             logger.error(f"创建集合失败: {e}")
             return False
 
-    def insert_component(self, component_id: str, vector: List[float], description: str):
+    def insert_component(self, component_id: str, vector, description: str):
         """
         插入一个部件的数据
         Args:
             component_id (str): 部件唯一标识/名称，如 "比亚迪汉中控屏"
-            vector (List[float]): 512 维归一化向量
+            vector (np.ndarray | List[float]): 512 维归一化向量
             description (str): 对应的中文文本描述
         """
         try:
@@ -111,13 +151,16 @@ class MilvusDataManager:
             collection = Collection(self.collection_name)
             data = [
                 [component_id],      # component_id
-                [vector],           # vector
+                as_float32_matrix(vector),  # vector，float32 矩阵直接交给 pymilvus
                 [description]       # description
                 # 移除了 component_name 数据
             ]
 
-            mr = collection.upsert(data)
-            collection.flush()
+            with self._writing():
+                mr = collection.upsert(data)
+                collection.flush()
+            if self.directory is not None:
+                self.directory.upsert([component_id], [description])
             logger.info(f"插入部件: {component_id}, 描述长度: {len(description)}")
             return mr
 
@@ -125,10 +168,355 @@ class MilvusDataManager:
             logger.error(f"插入部件失败 (component_id={component_id}): {e}")
             return None
 
+    def _get_collection(self) -> Collection:
+        """获取集合句柄（不存在时先创建），只在首次调用时构造 Collection 对象"""
+        if self._collection is None:
+            if not utility.has_collection(self.collection_name):
+                self.create_collection()
+            self._collection = Collection(self.collection_name)
+        return self._collection
+
+    def upsert_components(self, component_ids: List[str], vectors, descriptions: List[str],
+                          chunk_size: Optional[int] = None, flush: bool = True) -> Dict:
+        """
+        批量写入部件数据（列式），按块 upsert，全部写完后只 flush 一次
+
+        逐行 flush 会让 Milvus 每次都封存一个很小的 segment，
+        批量导入时应使用本方法代替 insert_component。
+
+        Args:
+            component_ids: 部件唯一标识列表
+            vectors: 向量矩阵，形状为 (N, embedding_dim)，float32 numpy 数组不会被拷贝
+            descriptions: 与 component_ids 一一对应的文本描述
+            chunk_size: 每次 upsert 的行数，默认读取 MILVUS_CONFIG.upsert_batch_size
+            flush: 写完后是否 flush，连续多次调用时可以只在最后一次 flush
+
+        Returns:
+            写入统计字典，包含每个块的行数和耗时
+        """
+        total = len(component_ids)
+        if len(vectors) != total or len(descriptions) != total:
+            raise ValueError(
+                f"列长度不一致: ids={total}, vectors={len(vectors)}, descriptions={len(descriptions)}"
+            )
+
+        vectors = as_float32_matrix(vectors) if total else vectors
+        chunk_size = chunk_size or self.upsert_batch_size
+        stats = {
+            "total_rows": total,
+            "upserted_rows": 0,
+            "failed_ids": [],
+            "chunks": [],
+            "flush_seconds": 0.0,
+            "total_seconds": 0.0
+        }
+        if total == 0:
+            return stats
+
+        start_time = time.perf_counter()
+        collection = self._get_collection()
+
+        for chunk_index, start in enumerate(range(0, total, chunk_size)):
+            end = min(start + chunk_size, total)
+            chunk_vectors = vectors[start:end]  # 行切片是视图，不产生拷贝
+
+            chunk_start = time.perf_counter()
+            try:
+                with self._writing():
+                    collection.upsert([
+                        list(component_ids[start:end]),
+                        chunk_vectors,
+                        list(descriptions[start:end])
+                    ])
+                stats["upserted_rows"] += end - start
+                if self.directory is not None:
+                    self.directory.upsert(component_ids[start:end], descriptions[start:end])
+                status = "success"
+            except Exception as e:
+                logger.error(f"批量写入第 {chunk_index} 块失败 (行 {start}-{end}): {e}")
+                stats["failed_ids"].extend(component_ids[start:end])
+                status = "failed"
+
+            chunk_seconds = time.perf_counter() - chunk_start
+            stats["chunks"].append({
+                "index": chunk_index,
+                "rows": end - start,
+                "status": status,
+                "seconds": chunk_seconds
+            })
+            logger.info(f"批量写入第 {chunk_index} 块: {end - start} 行, 耗时 {chunk_seconds * 1000:.1f}ms")
+
+        if flush and stats["upserted_rows"]:
+            flush_start = time.perf_counter()
+            collection.flush()
+            stats["flush_seconds"] = time.perf_counter() - flush_start
+
+        stats["total_seconds"] = time.perf_counter() - start_time
+        logger.info(
+            f"批量写入完成: {stats['upserted_rows']}/{total} 行, "
+            f"{len(stats['chunks'])} 块, 总耗时 {stats['total_seconds']:.2f}s"
+        )
+        return stats
+
+    def delete_components(self, component_ids: List[str]) -> int:
+        """
+        按部件标识批量删除
+
+        Args:
+            component_ids: 需要删除的部件标识列表
+
+        Returns:
+            删除条数
+
+        Raises:
+            删除失败时抛出 Milvus 的异常；调用方据此决定是否保留入库清单记录以便重试
+        """
+        if not component_ids:
+            return 0
+        try:
+            collection = self._get_collection()
+            id_list = ", ".join(json.dumps(component_id, ensure_ascii=False) for component_id in component_ids)
+            with self._writing():
+                mr = collection.delete(expr=f"component_id in [{id_list}]")
+        except Exception as e:
+            logger.error(f"删除部件失败: {e}")
+            raise
+        if self.directory is not None:
+            self.directory.remove(component_ids)
+        logger.info(f"删除部件: {len(component_ids)} 个")
+        return mr.delete_count
+
+    def flush(self):
+        """将已写入的数据封存为 segment（配合 upsert_components(flush=False) 使用）"""
+        self._get_collection().flush()
+
+    def _get_loaded_collection(self) -> Collection:
+        """获取已 load 的集合句柄，整个生命周期只 load 一次"""
+        if not self._collection_loaded:
+            with self._load_lock:
+                if not self._collection_loaded:
+                    collection = self._get_collection()
+                    load_start = time.perf_counter()
+                    collection.load()
+                    self._collection_loaded = True
+                    logger.info(f"集合 {self.collection_name} 已加载, 耗时 {time.perf_counter() - load_start:.2f}s")
+        return self._collection
+
+    def search(self, vectors, top_k: int = 5, nprobe: Optional[int] = None,
+               output_fields: Sequence[str] = ("description",),
+               search_params: Optional[Dict] = None) -> List[List[SearchHit]]:
+        """
+        向量检索，一次 RPC 完成一批查询向量
+
+        Args:
+            vectors: 查询向量，单个向量或形状为 (N, embedding_dim) 的矩阵
+            top_k: 每个查询返回的结果数
+            nprobe: 查询时扫描的簇数量，只对 IVF 类索引生效，等价于 search_params={"nprobe": nprobe}；
+                其他索引类型忽略
+            output_fields: 需要一并返回的标量字段
+            search_params: 本次检索覆盖的索引参数，例如 HNSW 的 {"ef": 128}
+
+        Returns:
+            与查询向量一一对应的命中列表
+        """
+        if len(vectors) == 0:
+            return []
+        vectors = as_float32_matrix(vectors)  # 单个向量会变成一行
+
+        collection = self._get_loaded_collection()
+        output_fields = list(output_fields)
+
+        overrides = dict(search_params or {})
+        if nprobe:
+            if has_search_param(self.index_spec.index_type, "nprobe"):
+                overrides["nprobe"] = nprobe
+            else:
+                logger.debug(f"{self.index_spec.index_type} 索引没有 nprobe 参数，忽略 nprobe={nprobe}")
+        param = self.index_spec.search_param(overrides, top_k=top_k)
+
+        # 先查结果缓存，只把未命中的向量发给 Milvus
+        all_hits: List[Optional[List[SearchHit]]] = [None] * len(vectors)
+        pending = list(range(len(vectors)))
+        if self.result_cache is not None:
+            cache_version = self.result_cache.version
+            cache_start = time.monotonic()
+            keys = [SearchResultCache.make_key(vector, top_k, param, output_fields) for vector in vectors]
+            all_hits = self.result_cache.get_many(keys)
+            pending = [i for i, hits in enumerate(all_hits) if hits is None]
+            if not pending:
+                return all_hits
+
+        search_start = time.perf_counter()
+        results = collection.search(
+            data=vectors[pending] if len(pending) < len(vectors) else vectors,
+            anns_field="vector",
+            param=param,
+            limit=top_k,
+            output_fields=output_fields
+        )
+        logger.debug(f"检索 {len(pending)} 个向量, top_k={top_k}, 耗时 {(time.perf_counter() - search_start) * 1000:.1f}ms")
+
+        for i, hits in zip(pending, results):
+            all_hits[i] = [
+                SearchHit(
+                    component_id=hit.id,
+                    score=float(hit.distance),
+                    description=hit.entity.get("description") if "description" in output_fields else ""
+                )
+                for hit in hits
+            ]
+        if self.result_cache is not None:
+            self.result_cache.put_many([keys[i] for i in pending], [all_hits[i] for i in pending],
+                                       cache_version, cache_start)
+        return all_hits
+
+    def get_result_cache_stats(self) -> Dict:
+        """检索结果缓存的命中率"""
+        return self.result_cache.get_stats() if self.result_cache is not None else {}
+
+    @staticmethod
+    def _iter_batches(collection: Collection, output_fields: List[str], batch_size: int):
+        """用 query_iterator 分批读出集合里的全部行"""
+        iterator = collection.query_iterator(
+            batch_size=batch_size,
+            expr='component_id != ""',
+            output_fields=output_fields
+        )
+        try:
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    break
+                yield batch
+        finally:
+            iterator.close()
+
+    def _directory_rows(self, batch_size: int) -> Iterable[Tuple[str, str]]:
+        """分批读出全部 (component_id, description)，供部件名称目录加载"""
+        rows = []
+        for batch in self._iter_batches(self._get_loaded_collection(), ["component_id", "description"], batch_size):
+            rows.extend((row["component_id"], row.get("description", "")) for row in batch)
+        return rows
+
+    def export_vectors(self, batch_size: int = 1000) -> Tuple[List[str], np.ndarray]:
+        """分批导出全部向量"""
+        ids, vectors = [], []
+        for batch in self._iter_batches(self._get_loaded_collection(), ["component_id", "vector"], batch_size):
+            ids.extend(row["component_id"] for row in batch)
+            vectors.extend(row["vector"] for row in batch)
+        matrix = as_float32_matrix(vectors) if vectors else np.empty((0, MODEL_CONFIG.embedding_dim), dtype=np.float32)
+        return ids, matrix
+
+    # ================== 重建索引 ==================
+
+    def _resolve_physical_name(self) -> Optional[str]:
+        """collection_name 实际指向的集合；collection_name 本身就是集合（旧部署）时返回它自己"""
+        collections = utility.list_collections()
+        if self.collection_name in collections:
+            return self.collection_name
+        for name in collections:
+            if self.collection_name in utility.list_aliases(name):
+                return name
+        return None
+
+    def _next_physical_name(self, current: str) -> str:
+        """<collection_name>_v<N> 的下一个版本号"""
+        prefix = f"{self.collection_name}_v"
+        version = int(current[len(prefix):]) if current.startswith(prefix) and current[len(prefix):].isdigit() else 1
+        return f"{prefix}{version + 1}"
+
+    def rebuild_index(self, index_spec: Optional[IndexSpec] = None, batch_size: int = 1000,
+                      drop_old: bool = True) -> Dict:
+        """
+        不停服重建索引：把数据复制到新集合，按 index_spec 建好索引并 load 之后，
+        再把 collection_name 别名切换过去；切换之前检索一直由旧集合提供
+
+        重建期间本进程的写入会等待；其他进程的入库任务应暂停，否则复制之后写入旧集合的数据会丢失。
+        collection_name 还是实际集合名（没有别名的旧部署）时，先改名为 <collection_name>_v1
+        再建同名别名，这一步改名和建别名之间有极短的不可用窗口，只发生一次。
+
+        Args:
+            index_spec: 新的索引配置，默认使用当前配置（只重建，不改参数）
+            batch_size: 复制数据时每批行数
+            drop_old: 切换后是否删除旧集合
+
+        Returns:
+            重建统计：新旧集合名、行数、各阶段耗时
+
+        Raises:
+            ValueError: index_spec 的度量与集合的 metric_type 不一致（入库向量是按该度量归一化的）
+        """
+        index_spec = index_spec or self.index_spec
+        if index_spec.metric_type != self.metric_type:
+            raise ValueError(f"index_spec 的度量 {index_spec.metric_type} 与集合的度量 {self.metric_type} 不一致")
+        start_time = time.perf_counter()
+
+        with self._writing():
+            old_name = self._resolve_physical_name()
+            if old_name is None:
+                raise RuntimeError(f"集合 {self.collection_name} 不存在，无法重建索引")
+
+            if old_name == self.collection_name:
+                migrated_name = f"{self.collection_name}_v1"
+                logger.warning(f"⚠️ {self.collection_name} 是实际集合，改名为 {migrated_name} 并创建同名别名")
+                utility.rename_collection(old_name, migrated_name)
+                utility.create_alias(migrated_name, self.collection_name)
+                old_name = migrated_name
+
+            new_name = self._next_physical_name(old_name)
+            if utility.has_collection(new_name):
+                utility.drop_collection(new_name)  # 上次重建失败留下的集合
+            new_collection = self._create_physical_collection(new_name, index_spec)
+
+            # 复制数据
+            copy_start = time.perf_counter()
+            old_collection = Collection(old_name)
+            old_collection.load()
+            rows = 0
+            for batch in self._iter_batches(old_collection, ["component_id", "vector", "description"], batch_size):
+                new_collection.insert([
+                    [row["component_id"] for row in batch],
+                    as_float32_matrix([row["vector"] for row in batch]),
+                    [row["description"] for row in batch]
+                ])
+                rows += len(batch)
+            new_collection.flush()
+            copy_seconds = time.perf_counter() - copy_start
+
+            # 等索引建完并 load，再切换别名
+            index_start = time.perf_counter()
+            utility.wait_for_index_building_complete(new_name)
+            new_collection.load()
+            index_seconds = time.perf_counter() - index_start
+
+            utility.alter_alias(new_name, self.collection_name)
+            with self._load_lock:
+                self._collection = None
+                self._collection_loaded = False
+            self.index_spec = index_spec
+            logger.info(f"✅ 别名 {self.collection_name} 已切换到 {new_name}（{index_spec.index_type} {index_spec.build_params}）")
+
+        if drop_old:
+            old_collection.release()
+            utility.drop_collection(old_name)
+            logger.info(f"已删除旧集合 {old_name}")
+
+        return {
+            "old_collection": old_name,
+            "new_collection": new_name,
+            "rows": rows,
+            "copy_seconds": copy_seconds,
+            "index_seconds": index_seconds,
+            "total_seconds": time.perf_counter() - start_time
+        }
+
     def close(self):
         """关闭连接"""
+        self.stop_directory_refresh()
         try:
             connections.disconnect(alias="default")
+            self._collection = None
+            self._collection_loaded = False
             logger.info("已断开 Milvus 连接")
         except Exception as e:
             logger.warning(f"断开连接时出错: {e}")
\ No newline at end of file
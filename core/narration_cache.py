@@ -0,0 +1,256 @@
+"""
+解说结果缓存模块
+同一部件、同一语言、同一介绍阶段的解说可以复用，避免每次都等待一次完整的LLM调用
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("narration_cache")
+
+# 复用策略
+REUSE_ALWAYS = "always"          # 有缓存就复用（多个变体轮流使用）
+REUSE_UNSEEN = "unseen"          # 只复用本次会话还没播过的变体，用完再调用LLM
+REUSE_NEVER = "never"            # 总是调用LLM，缓存只用于积累变体
+REUSE_POLICIES = (REUSE_ALWAYS, REUSE_UNSEEN, REUSE_NEVER)
+
+
+def introduction_bucket(introduction_count: int) -> str:
+    """把介绍次数归并为几个阶段：首次 / 第二次 / 多次"""
+    if introduction_count <= 1:
+        return "first"
+    if introduction_count == 2:
+        return "second"
+    return "repeat"
+
+
+def make_narration_key(component: str, language: str, template_type: str,
+                       introduction_count: int, rag_text: str) -> str:
+    """
+    计算解说缓存键（归一化后的提示词指纹）
+
+    Args:
+        component: 部件名称
+        language: 目标语言代码
+        template_type: 模板类型（first_introduction / repeat_introduction）
+        introduction_count: 介绍次数，会按阶段归并
+        rag_text: RAG检索到的部件描述
+
+    Returns:
+        缓存键字符串
+    """
+    normalized_rag = " ".join((rag_text or "").split())
+    rag_hash = hashlib.sha1(normalized_rag.encode("utf-8")).hexdigest()[:16]
+    return "|".join([
+        component.strip().lower(),
+        language,
+        template_type,
+        introduction_bucket(introduction_count),
+        rag_hash
+    ])
+
+
+class NarrationCache:
+    """
+    解说结果缓存
+    LRU + TTL 淘汰，每个键保存若干个变体，可选 JSON-lines 文件持久化
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 6 * 3600,
+                 max_variants: int = 3, reuse_policy: str = REUSE_UNSEEN,
+                 disk_path: Optional[str] = None):
+        """
+        初始化解说缓存
+
+        Args:
+            max_entries: 最多缓存的键数量
+            ttl_seconds: 变体的有效期（秒）
+            max_variants: 每个键最多保存的变体数量
+            reuse_policy: 复用策略，见 REUSE_POLICIES
+            disk_path: 持久化文件路径，为 None 时只缓存在内存
+        """
+        if reuse_policy not in REUSE_POLICIES:
+            raise ValueError(f"未知的复用策略: {reuse_policy}，可选: {REUSE_POLICIES}")
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_variants = max_variants
+        self.reuse_policy = reuse_policy
+        self.disk_path = disk_path
+
+        # key -> [{"text": ..., "created_at": ...}, ...]
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        # key -> 本次会话已经播过的变体文本
+        self._served: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.disk_path:
+            self._load_from_disk()
+
+    # ================== 查询与写入 ==================
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        按复用策略查找可用的解说
+
+        Returns:
+            缓存的解说文本，没有可用变体时返回 None
+        """
+        with self._lock:
+            variants = self._live_variants(key)
+            text = None
+
+            if variants and self.reuse_policy != REUSE_NEVER:
+                served = self._served.setdefault(key, set())
+                unseen = [v for v in variants if v["text"] not in served]
+                if unseen:
+                    text = unseen[0]["text"]
+                elif self.reuse_policy == REUSE_ALWAYS:
+                    # 所有变体都播过了，从头轮换
+                    served.clear()
+                    text = variants[0]["text"]
+
+                if text is not None:
+                    served.add(text)
+                    self._entries.move_to_end(key)
+
+            if text is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return text
+
+    def put(self, key: str, text: str, served: bool = True) -> None:
+        """
+        写入一个解说变体
+
+        Args:
+            key: 缓存键
+            text: 解说文本
+            served: 这个变体是否已经播出（预生成的变体为 False）
+        """
+        if not text:
+            return
+
+        entry = {"text": text, "created_at": time.time()}
+        with self._lock:
+            self._insert(key, entry)
+            if served:
+                self._served.setdefault(key, set()).add(text)
+
+        if self.disk_path:
+            self._append_to_disk(key, entry)
+
+    def variant_count(self, key: str) -> int:
+        """当前有效变体数量"""
+        with self._lock:
+            return len(self._live_variants(key))
+
+    def clear(self) -> None:
+        """清空内存缓存和播放记录（不删除持久化文件）"""
+        with self._lock:
+            self._entries.clear()
+            self._served.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "reuse_policy": self.reuse_policy
+        }
+
+    # ================== 内部实现 ==================
+
+    def _live_variants(self, key: str) -> List[Dict[str, Any]]:
+        """返回未过期的变体，顺带清理过期项（调用方需持有锁）"""
+        variants = self._entries.get(key)
+        if not variants:
+            return []
+
+        now = time.time()
+        live = [v for v in variants if now - v["created_at"] < self.ttl_seconds]
+        if live:
+            self._entries[key] = live
+        else:
+            del self._entries[key]
+            self._served.pop(key, None)
+        return live
+
+    def _insert(self, key: str, entry: Dict[str, Any]) -> None:
+        """插入变体并执行 LRU 淘汰（调用方需持有锁）"""
+        variants = self._entries.setdefault(key, [])
+        if any(v["text"] == entry["text"] for v in variants):
+            return
+        variants.append(entry)
+        if len(variants) > self.max_variants:
+            del variants[0]
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self._served.pop(evicted_key, None)
+
+    def _load_from_disk(self) -> None:
+        """启动时从 JSON-lines 文件加载未过期的变体"""
+        if not os.path.exists(self.disk_path):
+            return
+
+        loaded = 0
+        total_lines = 0
+        now = time.time()
+        try:
+            with open(self.disk_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    total_lines += 1
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if now - record.get("created_at", 0) >= self.ttl_seconds:
+                        continue
+                    self._insert(record["key"], {"text": record["text"], "created_at": record["created_at"]})
+                    loaded += 1
+            logger.info(f"📂 已从 {self.disk_path} 加载 {loaded} 条解说缓存")
+        except Exception as e:
+            logger.warning(f"⚠️ 加载解说缓存文件失败: {e}")
+            return
+
+        # 过期和被淘汰的记录过多时重写文件
+        if total_lines > 2 * max(loaded, 1):
+            self._rewrite_disk()
+
+    def _rewrite_disk(self) -> None:
+        """只保留内存中的有效变体重写持久化文件"""
+        try:
+            tmp_path = self.disk_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, variants in self._entries.items():
+                    for v in variants:
+                        record = {"key": key, "text": v["text"], "created_at": v["created_at"]}
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.disk_path)
+        except Exception as e:
+            logger.warning(f"⚠️ 重写解说缓存文件失败: {e}")
+
+    def _append_to_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        """追加写入一条变体"""
+        try:
+            record = {"key": key, "text": entry["text"], "created_at": entry["created_at"]}
+            with self._lock:
+                with open(self.disk_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning(f"⚠️ 写入解说缓存文件失败: {e}")
@@ -0,0 +1,103 @@
+"""
+提示词前缀缓存诊断
+vLLM 的前缀缓存（automatic prefix caching）只有在连续请求的 token 前缀完全一致时
+才能复用 KV cache。这里把发出去的消息按 Qwen 的 ChatML 格式拼成文本，统计相邻两次
+请求的公共前缀长度，用来确认提示词的固定部分确实排在前面。
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+def render_chat(messages: List[Dict[str, str]]) -> str:
+    """按 ChatML 格式拼接消息，近似 vLLM 实际送入模型的文本"""
+    return "".join(
+        f"<|im_start|>{message['role']}\n{message['content']}<|im_end|>\n"
+        for message in messages
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """没有分词器时的粗略估计：非 ASCII 字符按 1 token，ASCII 按 4 字符 1 token"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+class PrefixCacheMonitor:
+    """记录相邻请求之间的公共前缀长度"""
+
+    def __init__(self, count_tokens: Optional[Callable[[str], int]] = None,
+                 history_size: int = 256, log_every: int = 0):
+        """
+        Args:
+            count_tokens: 计算 token 数的函数，例如 lambda s: len(tokenizer.encode(s))；
+                          默认使用 estimate_tokens 估计
+            history_size: 保留的最近样本数
+            log_every: 每隔多少次请求打印一次日志，0 表示只在 debug 级别输出
+        """
+        self.count_tokens = count_tokens or estimate_tokens
+        self.log_every = log_every
+        self._lock = threading.Lock()
+        self._previous = {}              # 语言 -> 上一次请求的渲染文本
+        self._samples = deque(maxlen=history_size)
+        self.requests = 0
+        self.last_shared_prefix_tokens = None
+        self.last_prompt_tokens = None
+
+    def observe(self, messages: List[Dict[str, str]], key: str = "") -> Optional[int]:
+        """
+        记录一次请求，返回与同一 key（一般是语言）上一次请求的公共前缀 token 数
+
+        不同语言的系统提示词本来就不同，所以按 key 分开比较
+        """
+        text = render_chat(messages)
+        with self._lock:
+            previous = self._previous.get(key)
+            self._previous[key] = text
+            self.requests += 1
+            requests = self.requests
+
+        prompt_tokens = self.count_tokens(text)
+        if previous is None:
+            self.last_prompt_tokens = prompt_tokens
+            return None
+
+        shared_tokens = self.count_tokens(os.path.commonprefix([previous, text]))
+        with self._lock:
+            self._samples.append((shared_tokens, prompt_tokens))
+            self.last_shared_prefix_tokens = shared_tokens
+            self.last_prompt_tokens = prompt_tokens
+
+        message = (f"🧩 提示词公共前缀 [{key}]: {shared_tokens}/{prompt_tokens} tokens "
+                   f"({shared_tokens / max(prompt_tokens, 1):.0%})")
+        if self.log_every and requests % self.log_every == 0:
+            logging.info(message)
+        else:
+            logging.debug(message)
+        return shared_tokens
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {
+                "requests": self.requests,
+                "compared": 0,
+                "last_shared_prefix_tokens": self.last_shared_prefix_tokens,
+                "avg_shared_prefix_tokens": None,
+                "avg_shared_ratio": None
+            }
+        shared = [s for s, _ in samples]
+        ratios = [s / max(total, 1) for s, total in samples]
+        return {
+            "requests": self.requests,
+            "compared": len(samples),
+            "last_shared_prefix_tokens": self.last_shared_prefix_tokens,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "avg_shared_prefix_tokens": sum(shared) / len(shared),
+            "min_shared_prefix_tokens": min(shared),
+            "avg_shared_ratio": sum(ratios) / len(ratios)
+        }
@@ -0,0 +1,127 @@
+"""
+检索结果缓存
+直播过程中同一个检测标签每分钟会触发很多次相同的向量检索。按
+（查询向量哈希, top_k, 检索参数, 输出字段）缓存命中列表，LRU + TTL 淘汰。
+
+集合每次 upsert / delete / 重建索引都会 bump 版本号并清空缓存；检索开始时记下版本号，
+写回时版本号已经变化的结果直接丢弃，因此不会返回写入之前的旧结果。
+Milvus 默认是 Bounded 一致性，写入后的几秒内检索可能还看不到新数据，
+这段时间（settle_seconds）内开始的检索结果也不写入缓存。
+其他进程的写入无法通知到这里，由 TTL 限制最长的过期时间。
+"""
+
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class SearchResultCache:
+    """检索结果缓存（LRU + TTL + 集合版本号）"""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 60.0, settle_seconds: float = 5.0):
+        """
+        Args:
+            max_entries: 最多缓存的查询数
+            ttl_seconds: 每条结果的有效期（秒）
+            settle_seconds: 写入之后多久内开始的检索不写缓存
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.settle_seconds = settle_seconds
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # 键 -> (过期时间, 命中列表)
+        self._lock = threading.Lock()
+        self._version = 0
+        self._settle_until = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.rejected_puts = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @staticmethod
+    def make_key(vector: np.ndarray, top_k: int, search_param: Dict[str, Any],
+                 output_fields: Sequence[str]) -> str:
+        """缓存键：向量字节的哈希 + top_k + 检索参数 + 输出字段"""
+        digest = hashlib.blake2b(np.ascontiguousarray(vector, dtype=np.float32).tobytes(), digest_size=16)
+        digest.update(json.dumps([top_k, search_param, sorted(output_fields)], sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[list]]:
+        """
+        批量查找
+
+        Returns:
+            与 keys 等长的列表，未命中或已过期的位置为 None；命中时返回新的列表，
+            其中的 SearchHit 是不可变的，可以在调用方之间共享
+        """
+        now = time.monotonic()
+        results: List[Optional[list]] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(list(entry[1]))
+        return results
+
+    def put_many(self, keys: Sequence[str], results: Sequence[list], version: int, started_at: float) -> bool:
+        """
+        写入检索结果
+
+        Args:
+            version: 检索开始时的版本号
+            started_at: 检索开始时间（time.monotonic）
+
+        Returns:
+            是否写入；检索期间集合有写入或仍在写入后的等待期内时不写入
+        """
+        with self._lock:
+            if version != self._version or started_at < self._settle_until:
+                self.rejected_puts += 1
+                return False
+            expires_at = time.monotonic() + self.ttl_seconds
+            for key, hits in zip(keys, results):
+                self._entries[key] = (expires_at, list(hits))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def bump(self) -> int:
+        """集合有写入：版本号加一并清空缓存，返回新版本号"""
+        with self._lock:
+            self._version += 1
+            self._settle_until = time.monotonic() + self.settle_seconds
+            self._entries.clear()
+            return self._version
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率等统计"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "rejected_puts": self.rejected_puts,
+            "hit_ratio": self.hits / total if total else 0.0
+        }
@@ -3,7 +3,10 @@
 优化：基于部件介绍次数的差异化解说 + 全局历史记录 + 自然衔接
 """
 
+import os
+import sys
 import asyncio
+import contextlib
 import time
 import logging
 import re
@@ -11,11 +14,18 @@ import random
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+# ========== 路径设置 ==========
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from core.narration_cache import NarrationCache, make_narration_key
+from core.background_loop import BackgroundLoop
+from core.llm_admission import AdmissionTimeout, PRIORITY_BACKGROUND
+from core.llm_hedging import DeadlineExceeded
+
+# 日志格式由入口脚本配置，导入本模块不修改全局 logging
 logger = logging.getLogger("smart_dialogue")
 
 
@@ -25,14 +35,25 @@ class SmartDialogueClient:
     支持基于部件介绍次数的差异化解说
     """
 
-    def __init__(self, llm_client):
+    def __init__(self, llm_client, narration_cache: Optional[NarrationCache] = None,
+                 max_in_flight: int = 4, sync_timeout: float = 20.0, llm_deadline: Optional[float] = 15.0):
         """
         初始化专业解说客户端
 
         Args:
             llm_client: 已有的LLM客户端实例
+            narration_cache: 可选的解说缓存，命中时跳过LLM调用
+            max_in_flight: 同步接口同时在执行的请求数上限
+            sync_timeout: 同步接口的超时时间（秒）
+            llm_deadline: 单次LLM调用的截止时间（秒），超时走备用解说，None 表示不限制
         """
         self.llm_client = llm_client
+        self.narration_cache = narration_cache
+        self.sync_timeout = sync_timeout
+        self.llm_deadline = llm_deadline
+
+        # 同步接口共用的常驻事件循环，保持 HTTP 连接复用；进程退出时由 BackgroundLoop 统一关闭
+        self._background_loop = BackgroundLoop(max_in_flight=max_in_flight, name="smart-dialogue-loop")
         self.conversation_history: List[Dict[str, Any]] = []  # 全局对话历史记录
         self.max_history_length = 15
         self.total_parts_introduced = 0
@@ -52,6 +73,9 @@ class SmartDialogueClient:
         初始化专业直播解说模板
         🆕 修改：为不同介绍次数准备不同的模板
 
+        模板中固定的规则和任务说明放在前面，历史记录、部件信息等每次都会变化的
+        内容放在最后，这样连续请求的提示词前缀保持一致，vLLM 的前缀缓存才能命中
+
         Returns:
             语言代码到对话模板的映射字典
         """
@@ -69,13 +93,6 @@ class SmartDialogueClient:
 4. 绝对不要使用"这就是本次解说的内容，感谢您的关注！"这样的结束语
 5. 直播还在持续进行中，不要使用任何类似结束直播的语句
 
-【直播历史回顾（按介绍顺序）】
-{history_context}
-
-【当前要解说的部件 - 首次介绍】
-部件名称：{current_part_name}
-部件基本信息：{current_rag_result}
-
 【本次解说任务】
 基于整个直播历史，用专业直播的风格首次介绍当前部件。
 
@@ -100,6 +117,13 @@ class SmartDialogueClient:
    - 建立与历史部件的联系
    - 不预测未来的部件
 
+【直播历史回顾（按介绍顺序）】
+{history_context}
+
+【当前要解说的部件 - 首次介绍】
+部件名称：{current_part_name}
+部件基本信息：{current_rag_result}
+
 现在，请基于直播历史，开始你的专业解说！""",
 
                 "repeat_introduction": """【专业汽车直播解说员 - 再次介绍】
@@ -113,19 +137,8 @@ class SmartDialogueClient:
 4. 绝对不要使用"这就是本次解说的内容，感谢您的关注！"这样的结束语
 5. 直播还在持续进行中，不要使用任何类似结束直播的语句
 
-【直播历史回顾（按介绍顺序）】
-{history_context}
-
-【当前要解说的部件 - 再次介绍】
-部件名称：{current_part_name}
-部件基本信息：{current_rag_result}
-介绍状态：这是第{introduction_count}次介绍该部件
-
-【历史介绍回顾】
-{previous_introductions}
-
 【本次解说任务】
-基于整个直播历史，用专业直播的风格再次介绍当前部件。这是第{introduction_count}次介绍该部件，需要从不同角度或补充信息进行解说。
+基于整个直播历史，用专业直播的风格再次介绍当前部件，需要从不同角度或补充信息进行解说。
 
 【解说规则 - 必须遵守】
 
@@ -155,6 +168,17 @@ class SmartDialogueClient:
 第二次介绍整车："让我们再次聚焦整车，基于之前我们了解的设计理念，现在从性能角度进一步了解..."
 第三次介绍整车："回到整车这个话题，这次我们换个视角，看看它在日常使用中的实际表现..."
 
+【直播历史回顾（按介绍顺序）】
+{history_context}
+
+【当前要解说的部件 - 再次介绍】
+部件名称：{current_part_name}
+部件基本信息：{current_rag_result}
+介绍状态：这是第{introduction_count}次介绍该部件
+
+【历史介绍回顾】
+{previous_introductions}
+
 现在，请基于直播历史和之前的介绍，开始你的专业解说！"""
             },
 
@@ -163,13 +187,6 @@ class SmartDialogueClient:
 
 You are an experienced car livestream commentator.
 
-【Livestream History Review】
-{history_context}
-
-【Current Part to Commentate - First Introduction】
-Part Name: {current_part_name}
-Basic Info: {current_rag_result}
-
 【Commentary Task】
 Based on the livestream history, introduce the current part for the first time.
 
@@ -180,25 +197,21 @@ Based on the livestream history, introduce the current part for the first time.
 - No predictions about future parts
 - No ending phrases
 
-Begin your commentary now!""",
-
-                "repeat_introduction": """【Professional Car Livestream Commentator - Repeat Introduction】
-
-You are an experienced car livestream commentator.
-
 【Livestream History Review】
 {history_context}
 
-【Current Part to Commentate - Repeat Introduction】
+【Current Part to Commentate - First Introduction】
 Part Name: {current_part_name}
 Basic Info: {current_rag_result}
-Introduction Status: This is the {introduction_count} time introducing this part
 
-【Previous Introductions Review】
-{previous_introductions}
+Begin your commentary now!""",
+
+                "repeat_introduction": """【Professional Car Livestream Commentator - Repeat Introduction】
+
+You are an experienced car livestream commentator.
 
 【Commentary Task】
-Based on the livestream history, introduce the current part again. This is the {introduction_count} time introducing this part, so provide new perspectives or additional information.
+Based on the livestream history, introduce the current part again, providing new perspectives or additional information.
 
 【Commentary Rules】
 - Do NOT use "First, let's begin with..." openings
@@ -209,6 +222,17 @@ Based on the livestream history, introduce the current part again. This is the {
 - No predictions about future parts
 - No ending phrases
 
+【Livestream History Review】
+{history_context}
+
+【Current Part to Commentate - Repeat Introduction】
+Part Name: {current_part_name}
+Basic Info: {current_rag_result}
+Introduction Status: This is the {introduction_count} time introducing this part
+
+【Previous Introductions Review】
+{previous_introductions}
+
 Begin your commentary now!"""
             }
         }
@@ -462,43 +486,16 @@ Begin your commentary now!"""
         # 如果所有历史都是当前部件，返回空
         return {"found": False}
 
-    async def generate_connected_description(self,
-                                             current_part_name: str,
-                                             current_rag_result: str,
-                                             target_language: str = "zh-CN") -> str:
+    def _build_prompt(self, current_part_name: str, current_rag_result: str, target_language: str,
+                      current_part_number: int, introduction_count: int):
         """
-        生成关联的描述（基于全局历史记录）
-        🆕 修改：根据介绍次数选择不同模板
-
-        Args:
-            current_part_name: 当前部件名称
-            current_rag_result: 当前部件的RAG结果
-            target_language: 目标语言代码
+        构建解说提示词
 
         Returns:
-            经过对话衔接处理后的最终描述
+            (提示词, 模板类型)
         """
-        # 计算当前是第几个部件
-        current_part_number = self.total_parts_introduced + 1
-
-        # 🆕 获取当前部件的介绍次数（当前还未添加，所以次数是已介绍过的次数）
-        introduction_count = self.part_introduction_counts.get(current_part_name, 0) + 1
         is_first_introduction = introduction_count == 1
 
-        has_history = len(self.conversation_history) > 0
-
-        logger.info(f"🎤 开始专业解说: {current_part_name}")
-        logger.info(f"🔢 部件序号: 第{current_part_number}个部件")
-        logger.info(f"📊 介绍次数: 第{introduction_count}次介绍该部件")
-        logger.info(f"📚 历史状态: {'有' if has_history else '无'}历史记录")
-
-        # 查找历史引用
-        historical_ref = None
-        if has_history:
-            historical_ref = self._find_historical_reference(current_part_name)
-            if historical_ref['found']:
-                logger.info(f"📎 找到历史引用: {historical_ref['part_name']} (第{historical_ref['part_number']}个部件)")
-
         # 构建历史上下文（传入介绍次数）
         history_context = self._build_history_context(
             current_part_name, current_part_number, introduction_count
@@ -541,15 +538,75 @@ Begin your commentary now!"""
 
         logger.debug(f"📝 解说提示词（前300字符）:\n{prompt[:300]}...")
 
+        return prompt, template_type
+
+    async def generate_connected_description(self,
+                                             current_part_name: str,
+                                             current_rag_result: str,
+                                             target_language: str = "zh-CN") -> str:
+        """
+        生成关联的描述（基于全局历史记录）
+        🆕 修改：根据介绍次数选择不同模板
+
+        Args:
+            current_part_name: 当前部件名称
+            current_rag_result: 当前部件的RAG结果
+            target_language: 目标语言代码
+
+        Returns:
+            经过对话衔接处理后的最终描述
+        """
+        # 计算当前是第几个部件
+        current_part_number = self.total_parts_introduced + 1
+
+        # 🆕 获取当前部件的介绍次数（当前还未添加，所以次数是已介绍过的次数）
+        introduction_count = self.part_introduction_counts.get(current_part_name, 0) + 1
+
+        has_history = len(self.conversation_history) > 0
+
+        logger.info(f"🎤 开始专业解说: {current_part_name}")
+        logger.info(f"🔢 部件序号: 第{current_part_number}个部件")
+        logger.info(f"📊 介绍次数: 第{introduction_count}次介绍该部件")
+        logger.info(f"📚 历史状态: {'有' if has_history else '无'}历史记录")
+
+        # 查找历史引用
+        historical_ref = None
+        if has_history:
+            historical_ref = self._find_historical_reference(current_part_name)
+            if historical_ref['found']:
+                logger.info(f"📎 找到历史引用: {historical_ref['part_name']} (第{historical_ref['part_number']}个部件)")
+
+        prompt, template_type = self._build_prompt(
+            current_part_name, current_rag_result, target_language,
+            current_part_number, introduction_count
+        )
+
+        # 先查解说缓存
+        cache_key = None
+        cached_result = None
+        if self.narration_cache is not None:
+            cache_key = make_narration_key(
+                current_part_name, target_language, template_type, introduction_count, current_rag_result
+            )
+            cached_result = self.narration_cache.get(cache_key)
+
         # 调用LLM生成专业解说
-        logger.info(f"🔄 调用LLM生成专业解说")
         dialogue_start_time = time.time()
 
         try:
-            conversation_result = await self.llm_client.generate_summary(
-                context=prompt,
-                target_language=target_language
-            )
+            if cached_result is not None:
+                logger.info(f"♻️ 命中解说缓存，跳过LLM调用")
+                conversation_result = cached_result
+            else:
+                logger.info(f"🔄 调用LLM生成专业解说")
+                conversation_result = await self.llm_client.generate_summary(
+                    context=prompt,
+                    target_language=target_language,
+                    deadline=self.llm_deadline
+                )
+                # generate_summary 出错时会原样返回提示词，这种结果不缓存
+                if cache_key is not None and conversation_result != prompt:
+                    self.narration_cache.put(cache_key, conversation_result)
 
             dialogue_end_time = time.time()
             dialogue_time = (dialogue_end_time - dialogue_start_time) * 1000
@@ -566,6 +623,13 @@ Begin your commentary now!"""
                 historical_ref
             )
 
+        except (AdmissionTimeout, DeadlineExceeded) as e:
+            logger.warning(f"⏳ LLM排队或生成超时，使用备用解说: {e}")
+            conversation_result = self._create_professional_dialogue(
+                current_part_name, current_rag_result, current_part_number,
+                introduction_count, has_history, historical_ref
+            )
+
         except Exception as e:
             logger.error(f"❌ 专业解说生成失败: {e}")
             # 失败时返回基于历史的对话
@@ -583,6 +647,115 @@ Begin your commentary now!"""
 
         return conversation_result
 
+    async def generate_connected_description_stream(self,
+                                                    current_part_name: str,
+                                                    current_rag_result: str,
+                                                    target_language: str = "zh-CN"):
+        """
+        流式生成关联的描述，解说片段一到达就 yield 出去，便于边生成边播报
+
+        不经过解说缓存和整段后处理；调用方提前停止时，已经输出的部分照样记入历史记录。
+
+        Args:
+            current_part_name: 当前部件名称
+            current_rag_result: 当前部件的RAG结果
+            target_language: 目标语言代码
+
+        Yields:
+            解说文本片段
+        """
+        current_part_number = self.total_parts_introduced + 1
+        introduction_count = self.part_introduction_counts.get(current_part_name, 0) + 1
+        has_history = len(self.conversation_history) > 0
+        historical_ref = self._find_historical_reference(current_part_name) if has_history else None
+
+        prompt, _ = self._build_prompt(
+            current_part_name, current_rag_result, target_language,
+            current_part_number, introduction_count
+        )
+
+        logger.info(f"🎤 开始流式专业解说: {current_part_name}")
+        pieces = []
+        try:
+            # aclosing 保证调用方提前退出时立即关闭底层流并归还 LLM 准入名额
+            async with contextlib.aclosing(self.llm_client.generate_summary_stream(
+                    context=prompt, target_language=target_language)) as stream:
+                async for piece in stream:
+                    if not pieces and piece == prompt:
+                        # generate_summary_stream 出错时会原样返回提示词
+                        raise RuntimeError("LLM流式调用失败")
+                    pieces.append(piece)
+                    yield piece
+
+        except Exception as e:
+            if pieces:
+                raise
+            logger.warning(f"⚠️ 流式解说生成失败，使用备用解说: {e}")
+            fallback = self._create_professional_dialogue(
+                current_part_name, current_rag_result, current_part_number,
+                introduction_count, has_history, historical_ref
+            )
+            pieces.append(fallback)
+            yield fallback
+
+        finally:
+            if pieces:
+                self.add_to_history(
+                    part_name=current_part_name,
+                    part_description=current_rag_result,
+                    conversation_result="".join(pieces)
+                )
+
+    async def pregenerate_variants(self, part_name: str, rag_result: str,
+                                   target_language: str = "zh-CN",
+                                   introduction_count: Optional[int] = None,
+                                   count: int = 2) -> int:
+        """
+        预生成解说变体写入缓存（不更新历史记录）
+        直播空闲时调用，之后的重复介绍可以直接使用缓存，不必等待模型
+
+        Args:
+            part_name: 部件名称
+            rag_result: 部件的RAG结果
+            target_language: 目标语言代码
+            introduction_count: 为第几次介绍预生成，默认是下一次介绍
+            count: 生成的变体数量
+
+        Returns:
+            成功写入缓存的变体数量
+        """
+        if self.narration_cache is None:
+            return 0
+
+        if introduction_count is None:
+            introduction_count = self.part_introduction_counts.get(part_name, 0) + 1
+        current_part_number = self.total_parts_introduced + 1
+
+        prompt, template_type = self._build_prompt(
+            part_name, rag_result, target_language, current_part_number, introduction_count
+        )
+        cache_key = make_narration_key(part_name, target_language, template_type, introduction_count, rag_result)
+
+        generated = 0
+        for _ in range(max(0, count - self.narration_cache.variant_count(cache_key))):
+            try:
+                # 后台优先级排队，不挤占直播解说的名额
+                text = await self.llm_client.generate_summary(
+                    context=prompt,
+                    target_language=target_language,
+                    priority=PRIORITY_BACKGROUND,
+                    queue_timeout=60.0
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ 预生成解说失败: {e}")
+                break
+            if text and text != prompt:
+                self.narration_cache.put(cache_key, text, served=False)
+                generated += 1
+
+        logger.info(f"🗂️ 预生成 {part_name}（{target_language}，第{introduction_count}次介绍）变体: {generated} 个")
+        return generated
+
     def _post_process_for_professional_livestream(self, text: str, current_part_name: str,
                                                   current_part_number: int, introduction_count: int,
                                                   has_history: bool, historical_ref: Optional[Dict] = None) -> str:
@@ -807,41 +980,30 @@ Begin your commentary now!"""
         Returns:
             智能对话处理后的最终描述
         """
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
+        coro = self.generate_connected_description(
+            current_part_name=current_part_name,
+            current_rag_result=current_rag_result,
+            target_language=target_language
+        )
 
-        def _run_in_thread():
-            """在独立线程中运行异步代码"""
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                async def _async_task():
-                    return await self.generate_connected_description(
-                        current_part_name=current_part_name,
-                        current_rag_result=current_rag_result,
-                        target_language=target_language
-                    )
-
-                return loop.run_until_complete(_async_task())
-            finally:
-                loop.close()
-
-        # 在线程池中执行
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(_run_in_thread)
-            try:
-                return future.result(timeout=45)
-            except Exception as e:
-                logger.error(f"⚠️ 同步智能对话执行失败: {e}")
-                # 返回基于历史的专业对话
-                current_part_number = self.total_parts_introduced + 1
-                has_history = len(self.conversation_history) > 0
-                introduction_count = self.part_introduction_counts.get(current_part_name, 0) + 1
-                historical_ref = self._find_historical_reference(current_part_name) if has_history else None
-                return self._create_professional_dialogue(
-                    current_part_name, current_rag_result, current_part_number,
-                    introduction_count, has_history, historical_ref
-                )
+        # 提交到常驻后台事件循环执行
+        try:
+            return self._background_loop.run(coro, timeout=self.sync_timeout)
+        except Exception as e:
+            logger.error(f"⚠️ 同步智能对话执行失败: {e}")
+            # 返回基于历史的专业对话
+            current_part_number = self.total_parts_introduced + 1
+            has_history = len(self.conversation_history) > 0
+            introduction_count = self.part_introduction_counts.get(current_part_name, 0) + 1
+            historical_ref = self._find_historical_reference(current_part_name) if has_history else None
+            return self._create_professional_dialogue(
+                current_part_name, current_rag_result, current_part_number,
+                introduction_count, has_history, historical_ref
+            )
+
+    def close(self):
+        """关闭同步接口使用的后台事件循环"""
+        self._background_loop.close()
 
     def clear_history(self):
         """清空全局历史记录"""
@@ -900,6 +1062,7 @@ Begin your commentary now!"""
             "recent_part": recent_part,
             "history_enabled": True,
             "global_history": True,
+            "narration_cache": self.narration_cache.get_stats() if self.narration_cache else None,
             "part_introduction_stats": {  # 🆕 新增部件介绍统计
                 "unique_parts": len(self.part_introduction_counts),
                 "top_introduced_parts": top_parts,
@@ -941,15 +1104,16 @@ Begin your commentary now!"""
 dialogue_client = None
 
 
-def init_dialogue_client(llm_client):
+def init_dialogue_client(llm_client, narration_cache: Optional[NarrationCache] = None):
     """
     初始化全局对话客户端
 
     Args:
         llm_client: LLM客户端实例
+        narration_cache: 可选的解说缓存
     """
     global dialogue_client
-    dialogue_client = SmartDialogueClient(llm_client)
+    dialogue_client = SmartDialogueClient(llm_client, narration_cache=narration_cache)
     logger.info("✅ 专业汽车直播解说客户端初始化完成（支持部件多次介绍）")
     logger.info("🎯 核心特性：")
     logger.info("  1. 部件介绍次数统计（区分首次与重复介绍）")
@@ -0,0 +1,261 @@
+"""
+向量存储的公共部分
+MilvusDataManager（Milvus 服务）和 LocalVectorStore（进程内 NumPy 向量库）共用：
+检索结果类型、部件名称目录快速路径和 search_text。
+通过 create_vector_store() 按 MILVUS_CONFIG.backend 选择后端。
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# ========== 路径设置 ==========
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from config.config import MILVUS_CONFIG
+from core.component_directory import ComponentDirectory
+
+logger = logging.getLogger(__name__)
+
+BACKEND_MILVUS = "milvus"
+BACKEND_LOCAL = "local"
+
+
+def as_float32_matrix(vectors) -> np.ndarray:
+    """
+    把向量统一成 (N, dim) 的 float32 连续矩阵
+
+    编码器输出的 float32 矩阵原样返回（不拷贝），一维向量视为一行；
+    二维列表等其他输入才会转换一次
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return np.ascontiguousarray(matrix)
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """一条检索命中结果（不可变：检索结果缓存命中时多个调用方共享同一批实例）"""
+    component_id: str
+    score: float
+    description: str = ""
+
+
+class VectorStoreBase(ABC):
+    """
+    向量存储基类
+    子类必须实现下面的抽象方法，漏实现时实例化就会报 TypeError，而不是在第一次调用时才出错
+    """
+
+    def __init__(self, text_embedder=None, use_directory: bool = True):
+        self.text_embedder = text_embedder  # search_text 使用的编码器，未传入时首次使用再加载
+        # 部件名称目录：search_text 的精确匹配快速路径
+        self.directory = ComponentDirectory() if use_directory else None
+        self._directory_loaded_at = None  # 上次加载目录的时间（time.monotonic）
+        self._directory_lock = threading.Lock()
+        # 目录的定期刷新放在后台线程里做，不占用检索请求的时间
+        self._directory_refresher: Optional[threading.Thread] = None
+        self._directory_stop = threading.Event()
+
+    # ================== 子类实现 ==================
+
+    @abstractmethod
+    def create_collection(self):
+        """创建（或打开）集合"""
+
+    @abstractmethod
+    def insert_component(self, component_id: str, vector, description: str):
+        """写入一个部件"""
+
+    @abstractmethod
+    def upsert_components(self, component_ids: List[str], vectors, descriptions: List[str],
+                          chunk_size: Optional[int] = None, flush: bool = True) -> Dict:
+        """批量写入部件，返回 {"upserted_rows", "failed_ids", ...}"""
+
+    @abstractmethod
+    def delete_components(self, component_ids: List[str]) -> int:
+        """按部件标识批量删除，返回删除的行数；失败时抛出异常"""
+
+    @abstractmethod
+    def flush(self):
+        """把已写入的数据落盘"""
+
+    @abstractmethod
+    def search(self, vectors, top_k: int = 5, nprobe: Optional[int] = None,
+               output_fields: Sequence[str] = ("description",),
+               search_params: Optional[Dict] = None) -> List[List[SearchHit]]:
+        """向量检索，返回与查询向量一一对应的命中列表"""
+
+    @abstractmethod
+    def rebuild_index(self, index_spec=None, batch_size: int = 1000, drop_old: bool = True) -> Dict:
+        """按 index_spec（core.index_spec.IndexSpec）重建索引，重建期间检索不中断"""
+
+    @abstractmethod
+    def _directory_rows(self, batch_size: int) -> Iterable[Tuple[str, str]]:
+        """全量 (component_id, description)"""
+
+    @abstractmethod
+    def export_vectors(self, batch_size: int = 1000) -> Tuple[List[str], np.ndarray]:
+        """全量导出 (component_id 列表, (N, dim) float32 向量矩阵)，用于离线评估和重建索引"""
+
+    @abstractmethod
+    def close(self):
+        """释放资源；实现里需要调用 stop_directory_refresh()"""
+
+    # ================== 部件名称目录 ==================
+
+    def load_directory(self, batch_size: int = 1000) -> int:
+        """
+        全量加载部件名称目录和别名（服务启动时调用；search_text 首次精确匹配时也会自动加载）
+
+        加载后启动后台线程，每 MILVUS_CONFIG.directory_refresh_seconds 秒重新加载一次，
+        同步其他进程的入库结果；close() 时停止
+
+        Returns:
+            目录中的部件数
+        """
+        if self.directory is None:
+            return 0
+
+        start_time = time.perf_counter()
+        count = self.directory.load(self._directory_rows(batch_size))
+        self.directory.load_aliases(MILVUS_CONFIG.alias_file)
+        self._directory_loaded_at = time.monotonic()
+        logger.info(f"部件名称目录已加载: {count} 个部件, 耗时 {time.perf_counter() - start_time:.2f}s")
+        self._start_directory_refresh()
+        return count
+
+    def _start_directory_refresh(self) -> None:
+        """启动目录的后台刷新线程（已在运行或刷新间隔 <= 0 时跳过）"""
+        interval = MILVUS_CONFIG.directory_refresh_seconds
+        if interval <= 0 or self._directory_stop.is_set():
+            return
+        if self._directory_refresher is not None and self._directory_refresher.is_alive():
+            return
+        # 线程只持有弱引用，忘记调用 close() 的实例也能被回收
+        self._directory_refresher = threading.Thread(
+            target=_refresh_directory_loop, args=(weakref.ref(self), self._directory_stop, interval),
+            name="directory-refresh", daemon=True
+        )
+        self._directory_refresher.start()
+
+    def stop_directory_refresh(self, timeout: float = 5.0) -> None:
+        """停止目录的后台刷新线程（子类的 close() 会调用）"""
+        self._directory_stop.set()
+        refresher = self._directory_refresher
+        if refresher is not None and refresher is not threading.current_thread():
+            refresher.join(timeout=timeout)
+        self._directory_refresher = None
+
+    def get_directory_stats(self) -> Dict:
+        """精确匹配快速路径的命中率"""
+        return self.directory.get_stats() if self.directory is not None else {}
+
+    # ================== 文本检索 ==================
+
+    def search_text(self, texts: Union[str, List[str]], top_k: int = 5,
+                    nprobe: Optional[int] = None,
+                    output_fields: Sequence[str] = ("description",),
+                    exact_match: bool = False,
+                    search_params: Optional[Dict] = None) -> List[List[SearchHit]]:
+        """
+        文本检索：先批量编码再调用 search
+
+        Args:
+            texts: 查询文本或文本列表（例如检测标签 "中控屏"）
+            top_k: 每个查询返回的结果数
+            nprobe: 查询时扫描的簇数量
+            output_fields: 需要一并返回的标量字段
+            exact_match: 是否先查部件名称目录（默认关闭）。开启后，精确命中（含别名）的文本
+                不做向量检索，只返回该部件一条 score=1.0 的结果，与 top_k 无关；
+                需要 top_k 个近邻的调用方不要开启
+            search_params: 本次检索覆盖的索引参数，例如 {"ef": 128}
+
+        Returns:
+            与查询文本一一对应的命中列表；向量检索的文本最多 top_k 条，
+            exact_match 精确命中的文本恰好 1 条
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return []
+
+        results: List[Optional[List[SearchHit]]] = [None] * len(texts)
+        pending = list(range(len(texts)))
+        if exact_match and self.directory is not None:
+            # 只有第一次需要在请求路径上加载，之后由后台线程定期刷新
+            if self._directory_loaded_at is None:
+                with self._directory_lock:
+                    if self._directory_loaded_at is None:
+                        self.load_directory()
+            pending = []
+            for i, text in enumerate(texts):
+                entry = self.directory.lookup(text)
+                if entry is None:
+                    pending.append(i)
+                else:
+                    component_id, description = entry
+                    results[i] = [SearchHit(
+                        component_id=component_id,
+                        score=1.0,
+                        description=description if "description" in output_fields else ""
+                    )]
+            if not pending:
+                return results
+
+        from core.embedding_processor import BgeTextEmbedder, USE_CASE_NAME
+        if self.text_embedder is None:
+            self.text_embedder = BgeTextEmbedder()
+
+        # 入库的是部件名称向量，查询文本按同样的短文本场景编码
+        vectors = self.text_embedder.encode_batch([texts[i] for i in pending], use_case=USE_CASE_NAME)
+        hits = self.search(vectors, top_k=top_k, nprobe=nprobe, output_fields=output_fields,
+                           search_params=search_params)
+        for i, text_hits in zip(pending, hits):
+            results[i] = text_hits
+        return results
+
+
+def _refresh_directory_loop(store_ref, stop: threading.Event, interval: float) -> None:
+    """目录后台刷新：每 interval 秒重新加载一次，失败时保留旧目录，下个周期再试"""
+    while not stop.wait(interval):
+        store = store_ref()
+        if store is None:
+            return
+        try:
+            with store._directory_lock:
+                store.load_directory()
+        except Exception as e:
+            logger.warning(f"⚠️ 刷新部件名称目录失败，继续使用旧目录: {e}")
+        del store
+
+
+def create_vector_store(backend: Optional[str] = None, **kwargs) -> VectorStoreBase:
+    """
+    按配置创建向量存储
+
+    Args:
+        backend: "milvus" 或 "local"，默认读取 MILVUS_CONFIG.backend（环境变量 VECTOR_STORE_BACKEND）
+        **kwargs: 传给后端构造函数（text_embedder、use_directory 等）
+    """
+    backend = (backend or MILVUS_CONFIG.backend).lower()
+    if backend == BACKEND_LOCAL:
+        from core.local_vector_store import LocalVectorStore
+        return LocalVectorStore(**kwargs)
+    if backend == BACKEND_MILVUS:
+        # pymilvus 只在使用 Milvus 后端时导入
+        from core.milvus_manager import MilvusDataManager
+        return MilvusDataManager(**kwargs)
+    raise ValueError(f"未知的向量存储后端: {backend}，可选 {BACKEND_MILVUS} / {BACKEND_LOCAL}")
@@ -0,0 +1,279 @@
+"""
+测试公共配置：把项目根目录加入 sys.path，测试里和业务代码一样使用 core. / config. 导入
+"""
+
+import os
+import sys
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+# ================== OpenAI 兼容的桩服务 ==================
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """模拟 vLLM 的 /v1/models 和 /v1/chat/completions（支持流式）"""
+
+    def log_message(self, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端取消了请求（例如对冲请求输掉、超过截止时间）
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send_json({"object": "list", "data": [{"id": "stub", "object": "model", "created": 0, "owned_by": "stub"}]})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.requests.append(request)
+        time.sleep(server.delay)
+        if server.fail:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if not request.get("stream"):
+            self._send_json({
+                "id": "1", "object": "chat.completion", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(server.pieces)}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": len(server.pieces), "total_tokens": 2}
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for piece in server.pieces:
+            chunk = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        usage = {"id": "1", "object": "chat.completion.chunk", "created": 0, "model": "stub", "choices": [],
+                 "usage": {"prompt_tokens": 1, "completion_tokens": len(server.pieces), "total_tokens": 2}}
+        self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+
+@pytest.fixture
+def openai_stub():
+    """
+    启动本地 OpenAI 兼容桩服务的工厂：openai_stub(delay=0.0, pieces=None, fail=False) -> server，
+    server.url 是 base_url，server.requests 记录收到的请求
+    """
+    servers = []
+
+    def start(delay: float = 0.0, pieces=None, fail: bool = False):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        server.daemon_threads = True
+        server.delay = delay
+        server.fail = fail
+        server.pieces = list(pieces or ["你好", "，这是", "一段测试", "文本。"])
+        server.requests = []
+        server.url = f"http://127.0.0.1:{server.server_port}/v1"
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def dead_url():
+    """一个没有服务监听的地址"""
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+# ================== 向量存储 ==================
+
+import hashlib
+
+import numpy as np
+
+
+class HashEmbedder:
+    """按文本哈希生成确定的单位向量，代替 BgeTextEmbedder"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.calls = []
+
+    def vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def encode_batch(self, texts, batch_size: int = 32, use_case: str = None) -> np.ndarray:
+        self.calls.append(list(texts))
+        return np.stack([self.vector(text) for text in texts]) if texts else np.empty((0, self.dim), np.float32)
+
+
+@pytest.fixture
+def local_store(tmp_path, monkeypatch):
+    """
+    在临时目录创建 LocalVectorStore 的工厂：local_store(**kwargs) -> store，
+    text_embedder 默认是 HashEmbedder；别名文件指向一个不存在的路径
+    """
+    from config.config import MILVUS_CONFIG, MODEL_CONFIG
+    from core.local_vector_store import LocalVectorStore
+
+    monkeypatch.setattr(MILVUS_CONFIG, "alias_file", str(tmp_path / "aliases.json"))
+    stores = []
+
+    def create(**kwargs):
+        kwargs.setdefault("store_dir", str(tmp_path / "store"))
+        kwargs.setdefault("text_embedder", HashEmbedder(MODEL_CONFIG.embedding_dim))
+        store = LocalVectorStore(**kwargs)
+        stores.append(store)
+        return store
+
+    yield create
+    for store in stores:
+        store.close()
+
+
+# ================== 内存版 pymilvus ==================
+
+import re
+import types
+import importlib
+
+
+class FakeMilvus:
+    """
+    用字典模拟 pymilvus 的集合、别名和检索（IP 度量的暴力检索），
+    记录 create_index / search 的参数供测试检查
+    """
+
+    def __init__(self):
+        self.collections = {}   # 实际集合名 -> {"rows": {id: (vector, description)}, "index": index_params}
+        self.aliases = {}       # 别名 -> 实际集合名
+        self.searches = []      # 每次 search 的 (实际集合名, param, 查询数)
+        self.fail_next_delete = None
+
+    def resolve(self, name: str) -> str:
+        return self.aliases.get(name, name)
+
+    def module(self) -> types.ModuleType:
+        fake = self
+
+        class Collection:
+            def __init__(self, name, schema=None):
+                self.name = name
+                if schema is not None:
+                    fake.collections[name] = {"rows": {}, "index": None}
+
+            @property
+            def _data(self):
+                return fake.collections[fake.resolve(self.name)]
+
+            def create_index(self, field_name, index_params):
+                self._data["index"] = index_params
+
+            def upsert(self, data):
+                for component_id, vector, description in zip(*data):
+                    self._data["rows"][component_id] = (np.asarray(vector, dtype=np.float32), description)
+
+            insert = upsert
+
+            def flush(self):
+                pass
+
+            def load(self):
+                pass
+
+            def release(self):
+                pass
+
+            def delete(self, expr):
+                if fake.fail_next_delete is not None:
+                    error, fake.fail_next_delete = fake.fail_next_delete, None
+                    raise error
+                ids = json.loads(re.search(r"\[.*\]", expr).group(0))
+                deleted = [i for i in ids if self._data["rows"].pop(i, None) is not None]
+                return types.SimpleNamespace(delete_count=len(deleted))
+
+            def query_iterator(self, batch_size, expr, output_fields):
+                items = list(self._data["rows"].items())
+                batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+                class Iterator:
+                    def next(self):
+                        if not batches:
+                            return []
+                        return [{"component_id": k, "vector": v.tolist(), "description": d}
+                                for k, (v, d) in batches.pop(0)]
+
+                    def close(self):
+                        pass
+
+                return Iterator()
+
+            def search(self, data, anns_field, param, limit, output_fields=()):
+                fake.searches.append((fake.resolve(self.name), param, len(data)))
+                rows = list(self._data["rows"].items())
+                results = []
+                for query in np.asarray(data, dtype=np.float32):
+                    scored = sorted(((float(vector @ query), k, d) for k, (vector, d) in rows), reverse=True)
+                    results.append([types.SimpleNamespace(id=k, distance=score, entity={"description": d})
+                                    for score, k, d in scored[:limit]])
+                return results
+
+        module = types.ModuleType("pymilvus")
+        module.Collection = Collection
+        module.connections = types.SimpleNamespace(connect=lambda **kwargs: None, disconnect=lambda **kwargs: None)
+        module.FieldSchema = lambda *args, **kwargs: object()
+        module.CollectionSchema = lambda *args, **kwargs: object()
+        module.DataType = types.SimpleNamespace(VARCHAR="VARCHAR", FLOAT_VECTOR="FLOAT_VECTOR")
+        module.utility = types.SimpleNamespace(
+            has_collection=lambda name: fake.resolve(name) in fake.collections,
+            list_collections=lambda: list(fake.collections),
+            list_aliases=lambda name: [a for a, target in fake.aliases.items() if target == name],
+            create_alias=lambda name, alias: fake.aliases.__setitem__(alias, name),
+            alter_alias=lambda name, alias: fake.aliases.__setitem__(alias, name),
+            drop_collection=lambda name: fake.collections.pop(name),
+            rename_collection=lambda old, new: fake.collections.__setitem__(new, fake.collections.pop(old)),
+            wait_for_index_building_complete=lambda name: None,
+        )
+        return module
+
+
+@pytest.fixture
+def fake_milvus(monkeypatch):
+    """
+    用内存版 pymilvus 导入 core.milvus_manager：返回 (milvus_manager 模块, FakeMilvus)
+    """
+    fake = FakeMilvus()
+    monkeypatch.setitem(sys.modules, "pymilvus", fake.module())
+    import core.milvus_manager as milvus_manager
+    milvus_manager = importlib.reload(milvus_manager)
+    yield milvus_manager, fake
+    sys.modules.pop("core.milvus_manager", None)
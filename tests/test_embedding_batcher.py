@@ -0,0 +1,135 @@
+"""MicroBatchEmbedder：凑批、错误分发，以及 close 时结束所有未完成的请求"""
+
+import time
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from core.embedding_batcher import BatcherClosed, MicroBatchEmbedder
+from core.embedding_processor import USE_CASE_NAME, USE_CASE_PASSAGE
+
+
+class _StubEmbedder:
+    """向量的每一维都是文本长度，记录每一批的文本"""
+
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.batches = []
+        self.use_cases = []
+        self.started = threading.Event()
+
+    def encode_batch(self, texts, use_case=USE_CASE_PASSAGE):
+        self.batches.append(list(texts))
+        self.use_cases.append(use_case)
+        self.started.set()
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return np.stack([np.full(3, len(text), dtype=np.float32) for text in texts])
+
+
+def test_concurrent_requests_share_one_batch():
+    embedder = _StubEmbedder()
+
+    async def scenario():
+        batcher = MicroBatchEmbedder(embedder, max_batch_size=8, max_wait_ms=50)
+        try:
+            return await batcher.encode_many(["a", "bb", "ccc"]), batcher.get_stats()
+        finally:
+            await batcher.close()
+
+    vectors, stats = asyncio.run(scenario())
+    assert embedder.batches == [["a", "bb", "ccc"]]
+    np.testing.assert_array_equal(vectors[:, 0], [1, 2, 3])
+    assert stats["batches"] == 1 and stats["requests"] == 3
+    # 默认与 search_text 的查询编码一致
+    assert embedder.use_cases == [USE_CASE_NAME]
+
+
+def test_requests_batched_by_use_case():
+    embedder = _StubEmbedder()
+
+    async def scenario():
+        batcher = MicroBatchEmbedder(embedder, max_batch_size=8, max_wait_ms=50)
+        try:
+            return await asyncio.gather(
+                batcher.encode("a"),
+                batcher.encode("bb", use_case=USE_CASE_PASSAGE),
+                batcher.encode("ccc"),
+                batcher.encode_many(["dddd"], use_case=USE_CASE_PASSAGE),
+            )
+        finally:
+            await batcher.close()
+
+    results = asyncio.run(scenario())
+    assert [float(r.ravel()[0]) for r in results] == [1, 2, 3, 4]
+    assert sorted(zip(embedder.use_cases, embedder.batches)) == [
+        (USE_CASE_NAME, ["a", "ccc"]), (USE_CASE_PASSAGE, ["bb", "dddd"])
+    ]
+
+
+def test_max_batch_size_splits_batches():
+    embedder = _StubEmbedder()
+
+    async def scenario():
+        batcher = MicroBatchEmbedder(embedder, max_batch_size=2, max_wait_ms=50)
+        try:
+            return await batcher.encode_many(["a", "b", "c", "d", "e"])
+        finally:
+            await batcher.close()
+
+    assert asyncio.run(scenario()).shape == (5, 3)
+    assert [len(batch) for batch in embedder.batches] == [2, 2, 1]
+
+
+def test_encode_error_reaches_every_caller():
+    embedder = _StubEmbedder(error=ValueError("boom"))
+
+    async def scenario():
+        batcher = MicroBatchEmbedder(embedder, max_wait_ms=10)
+        try:
+            return await asyncio.gather(batcher.encode("a"), batcher.encode("b"), return_exceptions=True)
+        finally:
+            await batcher.close()
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_close_fails_requests_collected_in_current_window():
+    embedder = _StubEmbedder()
+
+    async def scenario():
+        # 凑批窗口很长：两条请求已经被收进当前批次，还在等更多请求
+        batcher = MicroBatchEmbedder(embedder, max_batch_size=8, max_wait_ms=10_000)
+        tasks = [asyncio.ensure_future(batcher.encode(text)) for text in ("a", "b")]
+        while batcher._queue is None or not batcher._queue.empty() or batcher.requests < 2:
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(batcher.close(), timeout=1.0)
+        return await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=1.0)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, BatcherClosed) for r in results)
+    assert embedder.batches == []
+
+
+def test_close_fails_requests_during_forward_and_queued():
+    embedder = _StubEmbedder(delay=0.3)
+
+    async def scenario():
+        batcher = MicroBatchEmbedder(embedder, max_batch_size=1, max_wait_ms=0)
+        running = asyncio.ensure_future(batcher.encode("a"))
+        await asyncio.get_running_loop().run_in_executor(None, embedder.started.wait)
+        queued = asyncio.ensure_future(batcher.encode("b"))
+        await asyncio.sleep(0.01)
+        await batcher.close()
+        results = await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), timeout=1.0)
+        with pytest.raises(BatcherClosed):
+            await batcher.encode("c")
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, BatcherClosed) for r in results)
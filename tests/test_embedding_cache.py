@@ -0,0 +1,104 @@
+"""EmbeddingCache：内存 LRU、memmap 磁盘层，以及 BgeTextEmbedder.encode_batch 的缓存路径"""
+
+import json
+
+import numpy as np
+import pytest
+
+from core.embedding_cache import EmbeddingCache, make_embedding_key, normalize_text
+from core.embedding_processor import BgeTextEmbedder, BACKEND_TORCH, USE_CASE_NAME
+
+DIM = 4
+
+
+def _vec(value: float) -> np.ndarray:
+    return np.full(DIM, value, dtype=np.float32)
+
+
+def test_key_normalizes_width_and_whitespace():
+    assert normalize_text("  中控屏　 ＡＢＣ ") == "中控屏 ABC"
+    assert make_embedding_key("中控屏 ＡＢＣ", "m", 64) == make_embedding_key(" 中控屏  ABC", "m", 64)
+    # 模型和截断长度不同时不共用缓存
+    assert make_embedding_key("中控屏", "m", 64) != make_embedding_key("中控屏", "m", 512)
+    assert make_embedding_key("中控屏", "m", 64) != make_embedding_key("中控屏", "m@onnx", 64)
+
+
+def test_memory_lru_eviction():
+    cache = EmbeddingCache(dim=DIM, max_entries=2)
+    cache.put_many(["a", "b"], np.stack([_vec(1), _vec(2)]))
+    assert cache.get("a") is not None  # a 变成最近使用
+    cache.put_many(["c"], _vec(3)[None])
+
+    a, b, c = cache.get_many(["a", "b", "c"])
+    assert b is None
+    np.testing.assert_array_equal(a, _vec(1))
+    np.testing.assert_array_equal(c, _vec(3))
+    stats = cache.get_stats()
+    assert stats["memory_entries"] == 2
+    assert (stats["memory_hits"], stats["misses"]) == (3, 1)
+
+
+def test_disk_tier_survives_reopen_and_promotes_to_memory(tmp_path):
+    cache = EmbeddingCache(dim=DIM, max_entries=1, disk_dir=str(tmp_path))
+    cache.put_many(["a", "b"], np.stack([_vec(1), _vec(2)]))
+    # a 已被挤出内存层，从磁盘层读出
+    np.testing.assert_array_equal(cache.get("a"), _vec(1))
+    assert cache.get_stats()["disk_hits"] == 1
+    cache.close()
+
+    reopened = EmbeddingCache(dim=DIM, max_entries=4, disk_dir=str(tmp_path))
+    a, b = reopened.get_many(["a", "b"])
+    np.testing.assert_array_equal(a, _vec(1))
+    np.testing.assert_array_equal(b, _vec(2))
+    assert reopened.get_stats()["disk_hits"] == 2
+    reopened.get("a")
+    assert reopened.get_stats()["memory_hits"] == 1
+
+
+def test_disk_capacity_and_rebuild_on_meta_change(tmp_path):
+    cache = EmbeddingCache(dim=DIM, max_entries=1, disk_dir=str(tmp_path), disk_capacity=2)
+    cache.put_many(["a", "b", "c"], np.stack([_vec(1), _vec(2), _vec(3)]))
+    assert cache.get_stats()["disk_entries"] == 2
+    cache.close()
+
+    with open(tmp_path / "index.jsonl", "r", encoding="utf-8") as f:
+        assert [json.loads(line)["key"] for line in f] == ["a", "b"]
+
+    # 维度变化后磁盘层重建，旧向量不会被读出
+    rebuilt = EmbeddingCache(dim=DIM + 1, max_entries=1, disk_dir=str(tmp_path), disk_capacity=2)
+    assert rebuilt.get_stats()["disk_entries"] == 0
+    assert rebuilt.get("a") is None
+
+
+class _CountingEmbedder(BgeTextEmbedder):
+    """不加载模型：向量的每一维都是文本长度，记录真正送进模型的文本"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.model_path = "stub-model"
+        self.backend = BACKEND_TORCH
+        self.hidden_size = DIM
+        self.max_lengths = {USE_CASE_NAME: 64}
+        self.encoded = []
+
+    def _encode_uncached(self, texts, batch_size=32, max_length=None):
+        self.encoded.extend(texts)
+        return np.stack([_vec(len(text)) for text in texts])
+
+
+def test_encode_batch_dedups_misses_and_reuses_cache():
+    embedder = _CountingEmbedder(EmbeddingCache(dim=DIM, max_entries=16))
+
+    first = embedder.encode_batch(["中控屏", "车轮", "中控屏 "], use_case=USE_CASE_NAME)
+    assert embedder.encoded == ["中控屏", "车轮"]
+    np.testing.assert_array_equal(first[0], first[2])
+
+    second = embedder.encode_batch(["车轮", "前灯"], use_case=USE_CASE_NAME)
+    assert embedder.encoded == ["中控屏", "车轮", "前灯"]
+    np.testing.assert_array_equal(second[0], first[1])
+    assert second.dtype == np.float32 and second.shape == (2, DIM)
+
+
+def test_encode_batch_rejects_unknown_use_case():
+    with pytest.raises(ValueError):
+        _CountingEmbedder(None).encode_batch(["中控屏"], use_case="unknown")
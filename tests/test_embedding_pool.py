@@ -0,0 +1,92 @@
+"""EmbeddingProcessPool：ONNX 后端的工作进程（不依赖 torch），结果与单进程编码一致"""
+
+import sys
+import json
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("transformers")
+
+from onnx import TensorProto, helper, numpy_helper
+
+from config.config import MODEL_CONFIG
+from core.embedding_pool import EmbeddingProcessPool
+from core.embedding_processor import BgeTextEmbedder, USE_CASE_NAME
+
+HIDDEN_SIZE = 8
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list("中控屏车轮前灯座椅方向盘")
+
+
+def _torch_loaded() -> bool:
+    """在工作进程里执行：torch 是否被导入过"""
+    return "torch" in sys.modules
+
+
+@pytest.fixture
+def onnx_model(tmp_path, monkeypatch):
+    """
+    手工构造的小 BERT 式模型：分词器目录 + 已"导出"的 ONNX 文件
+    last_hidden_state = 词向量 * mask + 整句词向量之和，[CLS] 位置的输出随文本变化
+    """
+    model_dir = tmp_path / "tiny-bert"
+    model_dir.mkdir()
+    (model_dir / "vocab.txt").write_text("\n".join(VOCAB) + "\n", encoding="utf-8")
+    (model_dir / "tokenizer_config.json").write_text(json.dumps({"tokenizer_class": "BertTokenizer"}))
+    (model_dir / "config.json").write_text(json.dumps(
+        {"model_type": "bert", "hidden_size": HIDDEN_SIZE, "vocab_size": len(VOCAB)}))
+
+    weights = np.random.default_rng(0).standard_normal((len(VOCAB), HIDDEN_SIZE)).astype(np.float32)
+    graph = helper.make_graph(
+        [
+            helper.make_node("Gather", ["emb", "input_ids"], ["tokens"]),
+            helper.make_node("Cast", ["attention_mask"], ["mask"], to=TensorProto.FLOAT),
+            helper.make_node("Unsqueeze", ["mask", "axis_2"], ["mask_3d"]),
+            helper.make_node("Mul", ["tokens", "mask_3d"], ["masked"]),
+            helper.make_node("ReduceSum", ["masked", "axis_1"], ["total"], keepdims=1),
+            helper.make_node("Add", ["masked", "total"], ["last_hidden_state"]),
+        ],
+        "tiny-bert",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "sequence"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "sequence"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "sequence", HIDDEN_SIZE])],
+        [numpy_helper.from_array(weights, "emb"),
+         numpy_helper.from_array(np.array([2], dtype=np.int64), "axis_2"),
+         numpy_helper.from_array(np.array([1], dtype=np.int64), "axis_1")]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 14)])
+    model.ir_version = 8
+
+    # ONNX 缓存比模型目录新，OnnxEncoder 直接使用，不会调用依赖 torch 的 export_onnx
+    cache_dir = tmp_path / "optimized"
+    cache_dir.mkdir()
+    onnx.save(model, str(cache_dir / "tiny-bert.onnx"))
+
+    # 工作进程是 spawn 出来的，通过环境变量拿到缓存目录
+    monkeypatch.setenv("EMBEDDING_BACKEND_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(MODEL_CONFIG, "backend_cache_dir", str(cache_dir))
+    return str(model_dir)
+
+
+def test_onnx_workers_match_single_process(onnx_model):
+    texts = ["中控屏", "车轮", "前灯", "座椅", "方向盘", "中控屏车轮"] * 6
+    expected = BgeTextEmbedder(model_path=onnx_model, backend="onnx", use_cache=False).encode_batch(
+        texts, use_case=USE_CASE_NAME)
+
+    with EmbeddingProcessPool(num_workers=2, threads_per_worker=1, model_path=onnx_model,
+                              backend="onnx", min_chunk_size=4) as pool:
+        assert pool.hidden_size == HIDDEN_SIZE
+        vectors = pool.encode_batch(texts, use_case=USE_CASE_NAME)
+        torch_loaded = pool._executor.submit(_torch_loaded).result()
+
+    np.testing.assert_allclose(vectors, expected, rtol=1e-6)
+    assert not torch_loaded
+    assert len(set(map(tuple, np.round(vectors, 5)))) == 6
+
+
+def test_empty_batch(onnx_model):
+    with EmbeddingProcessPool(num_workers=1, threads_per_worker=1, model_path=onnx_model,
+                              backend="onnx") as pool:
+        assert pool.encode_batch([]).shape == (0, HIDDEN_SIZE)
@@ -0,0 +1,18 @@
+"""导入核心模块不修改全局 logging 配置，日志格式由入口脚本决定"""
+
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_imports_leave_root_logger_untouched():
+    code = (
+        "import logging\n"
+        "import core.llm_client, core.smart_dialogue, core.dialogue_manager\n"
+        "print(len(logging.getLogger().handlers))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "0"
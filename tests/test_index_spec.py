@@ -0,0 +1,100 @@
+"""IndexSpec 的参数校验与默认度量，以及 Milvus 后端按索引类型处理 nprobe、拒绝度量不一致的重建"""
+
+import logging
+
+import numpy as np
+import pytest
+
+from config.config import MILVUS_CONFIG, MODEL_CONFIG
+from core.index_spec import IndexSpec, has_search_param
+
+
+def test_defaults_and_validation():
+    spec = IndexSpec("hnsw", build_params={"M": 8})
+    assert spec.index_type == "HNSW"
+    assert spec.build_params == {"M": 8, "efConstruction": 200}
+    assert spec.metric_type == MILVUS_CONFIG.metric_type
+
+    with pytest.raises(ValueError):
+        IndexSpec("IVF_FLAT", build_params={"M": 8})
+    with pytest.raises(ValueError):
+        IndexSpec("ANNOY")
+    with pytest.raises(ValueError):
+        spec.search_param({"nprobe": 16})
+
+
+def test_metric_type_follows_config(monkeypatch):
+    monkeypatch.setattr(MILVUS_CONFIG, "metric_type", "L2")
+    assert IndexSpec("FLAT").metric_type == "L2"
+    assert IndexSpec("FLAT", metric_type="ip").metric_type == "IP"
+
+
+def test_search_param_raises_ef_to_top_k():
+    spec = IndexSpec("HNSW", search_params={"ef": 32})
+    assert spec.search_param(top_k=100)["params"] == {"ef": 100}
+    assert spec.search_param({"ef": 256}, top_k=10)["params"] == {"ef": 256}
+
+
+def test_has_search_param():
+    assert has_search_param("ivf_pq", "nprobe")
+    assert not has_search_param("HNSW", "nprobe")
+    assert not has_search_param("FLAT", "nprobe")
+
+
+def _filled_manager(milvus_manager, spec=None):
+    manager = milvus_manager.MilvusDataManager(use_directory=False, use_result_cache=False)
+    if spec is not None:
+        manager.index_spec = spec
+    vectors = np.eye(4, MODEL_CONFIG.embedding_dim, dtype=np.float32)
+    manager.upsert_components(list("abcd"), vectors, ["da", "db", "dc", "dd"])
+    return manager, vectors
+
+
+@pytest.mark.parametrize("index_type", ["HNSW", "FLAT", "DISKANN"])
+def test_nprobe_ignored_for_non_ivf_index(fake_milvus, index_type, caplog):
+    milvus_manager, fake = fake_milvus
+    manager, vectors = _filled_manager(milvus_manager, IndexSpec(index_type))
+
+    with caplog.at_level(logging.DEBUG, logger=milvus_manager.logger.name):
+        hits = manager.search(vectors[:1], top_k=2, nprobe=32)[0]
+    assert hits[0].component_id == "a"
+    assert "nprobe" not in fake.searches[-1][1]["params"]
+    assert "忽略 nprobe=32" in caplog.text
+
+
+def test_nprobe_applied_for_ivf_index(fake_milvus):
+    milvus_manager, fake = fake_milvus
+    manager, vectors = _filled_manager(milvus_manager, IndexSpec("IVF_SQ8"))
+    manager.search(vectors[:1], top_k=2, nprobe=32)
+    assert fake.searches[-1][1]["params"] == {"nprobe": 32}
+
+
+def test_rebuild_rejects_metric_mismatch(fake_milvus):
+    milvus_manager, fake = fake_milvus
+    manager, _ = _filled_manager(milvus_manager)
+    other = "L2" if manager.metric_type != "L2" else "IP"
+    with pytest.raises(ValueError):
+        manager.rebuild_index(IndexSpec("HNSW", metric_type=other))
+    assert fake.aliases[manager.collection_name] == f"{manager.collection_name}_v1"
+
+
+def test_rebuild_swaps_alias_and_keeps_rows(fake_milvus):
+    milvus_manager, fake = fake_milvus
+    manager, vectors = _filled_manager(milvus_manager)
+    name = manager.collection_name
+
+    stats = manager.rebuild_index(IndexSpec("HNSW", build_params={"M": 8}), batch_size=3)
+    assert fake.aliases[name] == f"{name}_v2"
+    assert sorted(fake.collections) == [f"{name}_v2"]
+    assert fake.collections[f"{name}_v2"]["index"]["index_type"] == "HNSW"
+    assert len(fake.collections[f"{name}_v2"]["rows"]) == 4
+    assert manager.index_spec.index_type == "HNSW"
+    assert manager.search(vectors[1:2], top_k=1)[0][0].component_id == "b"
+    assert stats is not None
+
+
+def test_local_rebuild_rejects_metric_mismatch(local_store):
+    store = local_store()
+    other = "L2" if store.metric_type != "L2" else "IP"
+    with pytest.raises(ValueError):
+        store.rebuild_index(IndexSpec("IVF_FLAT", metric_type=other))
@@ -0,0 +1,120 @@
+"""AdmissionController：并发上限、优先级放行顺序、排队时间预算"""
+
+import asyncio
+
+import pytest
+
+from core.llm_admission import AdmissionController, AdmissionTimeout, PRIORITY_BACKGROUND, PRIORITY_LIVE
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _queue(controller, order, name, priority):
+    """排队拿到名额后记录名字，然后马上归还"""
+    await controller.acquire(priority=priority, queue_timeout=5.0)
+    order.append(name)
+    controller.release()
+
+
+async def _wait_queued(controller, depth):
+    while controller.get_stats()["queue_depth"] < depth:
+        await asyncio.sleep(0)
+
+
+def test_live_requests_admitted_before_background():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire()
+        order = []
+        tasks = [
+            asyncio.create_task(_queue(controller, order, "bg-1", PRIORITY_BACKGROUND)),
+            asyncio.create_task(_queue(controller, order, "bg-2", PRIORITY_BACKGROUND)),
+            asyncio.create_task(_queue(controller, order, "live-1", PRIORITY_LIVE)),
+            asyncio.create_task(_queue(controller, order, "live-2", PRIORITY_LIVE)),
+        ]
+        await _wait_queued(controller, 4)
+        controller.release()
+        await asyncio.gather(*tasks)
+        return order, controller.get_stats()
+
+    order, stats = _run(scenario())
+    # 同优先级按到达顺序放行
+    assert order == ["live-1", "live-2", "bg-1", "bg-2"]
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["admitted"] == 5
+
+
+def test_new_arrival_does_not_jump_queue():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire()
+        order = []
+        queued = asyncio.create_task(_queue(controller, order, "queued", PRIORITY_BACKGROUND))
+        await _wait_queued(controller, 1)
+        controller.release()
+        # 名额已经转交给排队请求，新来的请求即使优先级更高也要排在后面
+        await _queue(controller, order, "late-live", PRIORITY_LIVE)
+        await queued
+        return order
+
+    assert _run(scenario()) == ["queued", "late-live"]
+
+
+def test_concurrency_limit():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=2)
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            async with controller.slot(queue_timeout=5.0):
+                peak = max(peak, controller.get_stats()["in_flight"])
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(work() for _ in range(6)))
+        return peak, controller.get_stats()
+
+    peak, stats = _run(scenario())
+    assert peak == 2
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 6
+
+
+def test_queue_timeout_rejects_and_skips_abandoned_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire()
+        with pytest.raises(AdmissionTimeout):
+            await controller.acquire(queue_timeout=0.01)
+        stats = controller.get_stats()
+        assert stats["rejected"] == 1
+        assert stats["queue_depth"] == 0
+
+        # 超时的请求不会再拿到名额，归还后名额直接空出来
+        controller.release()
+        assert controller.get_stats()["in_flight"] == 0
+        assert await controller.acquire(queue_timeout=0.01) == 0.0
+
+    _run(scenario())
+
+
+def test_cancelled_waiter_is_skipped():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire()
+        order = []
+        cancelled = asyncio.create_task(_queue(controller, order, "cancelled", PRIORITY_LIVE))
+        kept = asyncio.create_task(_queue(controller, order, "kept", PRIORITY_BACKGROUND))
+        await _wait_queued(controller, 2)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        controller.release()
+        await kept
+        return order, controller.get_stats()
+
+    order, stats = _run(scenario())
+    assert order == ["kept"]
+    assert stats["in_flight"] == 0
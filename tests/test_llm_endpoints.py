@@ -0,0 +1,57 @@
+"""EndpointPool：副本路由、失败重试、健康检查摘除与恢复（本地桩服务）"""
+
+import time
+import asyncio
+
+from core.llm_client import QwenLLMClient
+from core.llm_endpoints import Endpoint, EndpointPool
+from core.llm_hedging import HedgePolicy
+
+
+def test_endpoint_timeout_only_passed_when_set():
+    default = Endpoint("http://127.0.0.1:1/v1")
+    assert default.client.timeout is not None  # 沿用 SDK 默认超时
+    assert Endpoint("http://127.0.0.1:1/v1", timeout=5.0).client.timeout == 5.0
+
+
+def test_requests_spread_across_replicas(openai_stub):
+    servers = [openai_stub(delay=0.05), openai_stub(delay=0.05)]
+    client = QwenLLMClient(endpoints=[s.url for s in servers], hedge_policy=HedgePolicy(enabled=False))
+
+    async def scenario():
+        return await asyncio.gather(*(client.generate_summary("ctx", "zh-CN") for _ in range(6)))
+
+    results = asyncio.run(scenario())
+    assert results == ["你好，这是一段测试文本。"] * 6
+    assert [len(s.requests) for s in servers] == [3, 3]
+
+
+def test_failed_replica_retried_on_other_and_ejected(openai_stub):
+    good, bad = openai_stub(), openai_stub(fail=True)
+    client = QwenLLMClient(endpoints=[bad.url, good.url], hedge_policy=HedgePolicy(enabled=False))
+    client.endpoints.failure_threshold = 2
+    bad_endpoint = client.endpoints.endpoints[0]
+    bad_endpoint.client = bad_endpoint.client.with_options(max_retries=0)
+
+    async def scenario():
+        return [await client.generate_summary("ctx", "zh-CN") for _ in range(6)]
+
+    assert asyncio.run(scenario()) == ["你好，这是一段测试文本。"] * 6
+    # 连续失败两次后被摘除，之后的请求不再发往它
+    assert len(bad.requests) == 2
+    assert bad_endpoint.total_failures == 2
+    assert not bad_endpoint.available(time.monotonic())
+
+
+def test_probe_ejects_dead_replica_and_restores(openai_stub, dead_url):
+    live = openai_stub()
+    pool = EndpointPool([dead_url, live.url], probe_timeout=1.0)
+
+    assert asyncio.run(pool.probe_all()) == {dead_url: False, live.url: True}
+    assert all(pool.pick() is pool.endpoints[1] for _ in range(4))
+
+    # 副本恢复后健康检查把它重新加入
+    pool.endpoints[0].client = pool.endpoints[1].client
+    asyncio.run(pool.probe(pool.endpoints[0]))
+    picked = {id(pool.pick()) for _ in range(4)}
+    assert picked == {id(e) for e in pool.endpoints}
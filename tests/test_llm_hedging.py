@@ -0,0 +1,76 @@
+"""对冲请求：只发往另一个可用副本，并且占用准入名额（本地桩服务）"""
+
+import time
+import asyncio
+
+from core.llm_client import QwenLLMClient
+from core.llm_hedging import HedgePolicy
+
+TEXT = "你好，这是一段测试文本。"
+
+
+def _hedging_client(slow, fast, max_concurrency: int = 4) -> QwenLLMClient:
+    """主请求固定选中慢副本：ewma 路由下慢副本的历史延迟更低"""
+    client = QwenLLMClient(endpoints=[slow.url, fast.url], routing_strategy="ewma",
+                           max_concurrency=max_concurrency,
+                           hedge_policy=HedgePolicy(enabled=True, initial_delay=0.05))
+    client.endpoints.health_interval = 0
+    slow_endpoint, fast_endpoint = client.endpoints.endpoints
+    slow_endpoint.ewma_latency, fast_endpoint.ewma_latency = 0.01, 1.0
+    return client
+
+
+def test_hedging_is_opt_in(openai_stub):
+    servers = [openai_stub(), openai_stub()]
+    client = QwenLLMClient(endpoints=[s.url for s in servers])
+    assert asyncio.run(client.generate_summary("ctx", "zh-CN")) == TEXT
+    assert all(not r.get("stream") for s in servers for r in s.requests)
+    assert client.hedge_policy.get_stats()["requests"] == 0
+
+
+def test_hedge_goes_to_other_replica(openai_stub):
+    slow, fast = openai_stub(delay=0.5), openai_stub()
+    client = _hedging_client(slow, fast)
+
+    start_time = time.perf_counter()
+    assert asyncio.run(client.generate_summary("ctx", "zh-CN")) == TEXT
+    assert time.perf_counter() - start_time < 0.45
+
+    stats = client.hedge_policy.get_stats()
+    assert stats["hedges_fired"] == 1 and stats["hedge_wins"] == 1
+    assert len(slow.requests) == 1 and len(fast.requests) == 1
+    # 对冲请求结束后名额全部归还
+    assert client.admission.get_stats()["in_flight"] == 0
+
+
+def test_no_hedge_to_primary_when_other_replica_ejected(openai_stub):
+    slow, fast = openai_stub(delay=0.3), openai_stub()
+    client = _hedging_client(slow, fast)
+    client.endpoints.endpoints[1].ejected_until = time.monotonic() + 60
+
+    async def scenario():
+        # 可用副本不足两个时 generate_summary 不走对冲；直接调用也不会对冲到主副本
+        assert await client.generate_summary("ctx", "zh-CN") == TEXT
+        return await client._hedged_completion(client._build_messages("ctx", "zh-CN"), 50)
+
+    assert asyncio.run(scenario()) == TEXT
+    assert len(slow.requests) == 2 and len(fast.requests) == 0
+    assert client.hedge_policy.hedges_fired == 0
+    assert client.hedge_policy.hedges_skipped == 1
+
+
+def test_no_hedge_without_admission_slot(openai_stub):
+    slow, fast = openai_stub(delay=0.3), openai_stub()
+    client = _hedging_client(slow, fast, max_concurrency=1)
+
+    async def scenario():
+        await client.admission.acquire()  # 占掉两个名额中的一个
+        try:
+            return await client.generate_summary("ctx", "zh-CN")
+        finally:
+            client.admission.release()
+
+    assert asyncio.run(scenario()) == TEXT
+    assert len(fast.requests) == 0
+    assert client.hedge_policy.hedges_skipped == 1
+    assert client.admission.get_stats()["in_flight"] == 0
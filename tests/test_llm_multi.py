@@ -0,0 +1,41 @@
+"""generate_summary_multi：失败的语言返回明确的错误，而不是原文本"""
+
+import asyncio
+
+from core.llm_client import QwenLLMClient
+
+
+def _collect(client, languages, **kwargs):
+    async def scenario():
+        return [r async for r in client.generate_summary_multi("商品信息", languages=languages, **kwargs)]
+    return {r["language"]: r for r in asyncio.run(scenario())}
+
+
+def test_all_languages_succeed(openai_stub):
+    server = openai_stub()
+    results = _collect(QwenLLMClient(base_url=server.url), ["zh-CN", "en-US"])
+    assert {r["text"] for r in results.values()} == {"你好，这是一段测试文本。"}
+    assert all(r["error"] is None for r in results.values())
+    assert len(server.requests) == 2
+
+
+def test_failed_language_reports_error_not_prompt(openai_stub):
+    server = openai_stub(fail=True)
+    client = QwenLLMClient(base_url=server.url)
+    client.endpoints.endpoints[0].client = client.endpoints.endpoints[0].client.with_options(max_retries=0)
+
+    results = _collect(client, ["zh-CN", "en-US"])
+    for result in results.values():
+        assert result["text"] is None
+        assert result["error"]
+        assert result["latency_ms"] is not None
+
+    # 单语言接口保持原有行为：出错时返回原文本
+    assert asyncio.run(client.generate_summary("商品信息", "zh-CN")) == "商品信息"
+
+
+def test_deadline_counts_as_failure(openai_stub):
+    server = openai_stub(delay=0.5)
+    results = _collect(QwenLLMClient(base_url=server.url), ["zh-CN"], deadline=0.1)
+    assert results["zh-CN"]["text"] is None
+    assert results["zh-CN"]["error"].startswith("DeadlineExceeded")
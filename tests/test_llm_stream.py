@@ -0,0 +1,128 @@
+"""generate_summary_stream：名额归还、增量长度和违禁词规则、首字延迟统计"""
+
+import asyncio
+import contextlib
+
+from core.llm_client import QwenLLMClient, StreamPostProcessor
+from core.smart_dialogue import SmartDialogueClient
+
+
+def _assert_released(client):
+    assert client.admission.get_stats()["in_flight"] == 0
+    assert all(endpoint.outstanding == 0 for endpoint in client.endpoints.endpoints)
+
+
+def test_early_exit_with_aclosing_releases_slot(openai_stub):
+    server = openai_stub(delay=0.05)
+    client = QwenLLMClient(base_url=server.url)
+
+    async def scenario():
+        async with contextlib.aclosing(client.generate_summary_stream("商品信息", "zh-CN")) as stream:
+            async for piece in stream:
+                assert client.admission.get_stats()["in_flight"] == 1
+                return piece
+
+    assert asyncio.run(scenario()) == "你好"
+    _assert_released(client)
+
+
+def test_pick_failure_releases_slot(openai_stub):
+    server = openai_stub()
+    client = QwenLLMClient(base_url=server.url)
+
+    def broken_pick(*args, **kwargs):
+        raise RuntimeError("no endpoint")
+    client.endpoints.pick = broken_pick
+
+    async def scenario():
+        return [piece async for piece in client.generate_summary_stream("商品信息", "zh-CN")]
+
+    # 与 generate_summary 一致，出错时返回原文本
+    assert asyncio.run(scenario()) == ["商品信息"]
+    assert client.admission.get_stats()["in_flight"] == 0
+
+
+def test_dialogue_stream_records_history(openai_stub):
+    server = openai_stub()
+    client = QwenLLMClient(base_url=server.url)
+    dialogue = SmartDialogueClient(client)
+
+    async def scenario():
+        return [piece async for piece in dialogue.generate_connected_description_stream("车轮", "轮毂采用铝合金")]
+
+    try:
+        assert "".join(asyncio.run(scenario())) == "你好，这是一段测试文本。"
+        assert dialogue.get_part_introduction_count("车轮") == 1
+        assert dialogue.conversation_history[-1]["conversation_result"] == "你好，这是一段测试文本。"
+        _assert_released(client)
+    finally:
+        dialogue.close()
+
+
+def test_dialogue_stream_falls_back_on_error(openai_stub):
+    server = openai_stub(fail=True)
+    client = QwenLLMClient(base_url=server.url)
+    client.endpoints.endpoints[0].client = client.endpoints.endpoints[0].client.with_options(max_retries=0)
+    dialogue = SmartDialogueClient(client)
+
+    async def scenario():
+        return [piece async for piece in dialogue.generate_connected_description_stream("车轮", "轮毂采用铝合金")]
+
+    try:
+        pieces = asyncio.run(scenario())
+        assert len(pieces) == 1 and "车轮" in pieces[0]
+        assert dialogue.get_part_introduction_count("车轮") == 1
+    finally:
+        dialogue.close()
+
+
+def test_forbidden_word_split_across_deltas_is_held_back():
+    processor = StreamPostProcessor()
+    # "遥遥" 可能是 "遥遥领先" 的前缀，暂存不输出
+    assert processor.feed("这款车遥遥") == "这款"
+    assert processor.feed("领先同级") == "车…"
+    assert processor.forbidden_hit and processor.finished
+    assert processor.feed("。") == ""
+
+
+def test_held_back_text_is_flushed_when_safe():
+    processor = StreamPostProcessor()
+    out = processor.feed("这款车遥遥") + processor.feed("控制。") + processor.flush()
+    assert out == "这款车遥遥控制。"
+    assert not processor.forbidden_hit
+
+
+def test_length_limit_applies_across_deltas():
+    processor = StreamPostProcessor(max_chars=6)
+    out = processor.feed("一二三四") + processor.feed("五六七八")
+    assert out == "一二三四五六…"
+    assert processor.truncated and processor.finished
+
+
+def test_stream_truncates_before_split_forbidden_word(openai_stub):
+    server = openai_stub(pieces=["这款车遥", "遥", "领先同级", "。"])
+    client = QwenLLMClient(base_url=server.url)
+
+    async def scenario():
+        return [piece async for piece in client.generate_summary_stream("商品信息", "zh-CN", apply_post_process=True)]
+
+    assert "".join(asyncio.run(scenario())) == "这款车…"
+    metrics = client.last_stream_metrics
+    assert metrics["forbidden_hit"] and not metrics["truncated"]
+    assert metrics["emitted_chars"] == len("这款车…")
+    _assert_released(client)
+
+
+def test_stream_reports_ttft_and_speed(openai_stub):
+    server = openai_stub(delay=0.1)
+    client = QwenLLMClient(base_url=server.url)
+
+    async def scenario():
+        return [piece async for piece in client.generate_summary_stream("商品信息", "zh-CN")]
+
+    assert asyncio.run(scenario()) == ["你好", "，这是", "一段测试", "文本。"]
+    metrics = client.last_stream_metrics
+    assert metrics["ttft_ms"] >= 100
+    assert metrics["total_ms"] >= metrics["ttft_ms"]
+    assert metrics["completion_tokens"] == 4  # 以服务端 usage 为准
+    assert metrics["tokens_per_sec"] > 0
@@ -0,0 +1,173 @@
+"""LocalVectorStore：upsert、删除时的行交换、持久化、IVF 检索，以及 VectorStoreBase 的抽象接口"""
+
+import numpy as np
+import pytest
+
+from config.config import MODEL_CONFIG
+from core.index_spec import IndexSpec
+from core.vector_store import VectorStoreBase, create_vector_store
+
+DIM = MODEL_CONFIG.embedding_dim
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    return (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _random_vectors(n: int, seed: int = 0) -> np.ndarray:
+    return _normalize(np.random.default_rng(seed).standard_normal((n, DIM)))
+
+
+def _ids(hits):
+    return [hit.component_id for hit in hits]
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        VectorStoreBase()
+
+    class Incomplete(VectorStoreBase):
+        def search(self, vectors, top_k=5, nprobe=None, output_fields=("description",), search_params=None):
+            return []
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_create_vector_store_local(tmp_path):
+    store = create_vector_store("local", store_dir=str(tmp_path))
+    try:
+        assert isinstance(store, VectorStoreBase)
+        assert len(store) == 0
+    finally:
+        store.close()
+    with pytest.raises(ValueError):
+        create_vector_store("faiss")
+
+
+def test_upsert_inserts_and_updates_in_place(local_store):
+    store = local_store()
+    vectors = _random_vectors(4)
+    stats = store.upsert_components(["a", "b", "c", "a"], vectors, ["a0", "b", "c", "a1"])
+    assert stats["upserted_rows"] == 4 and stats["failed_ids"] == []
+    assert len(store) == 3  # 同一批里重复的 id 以最后一次为准
+
+    hits = store.search(vectors[3], top_k=1)[0]
+    assert _ids(hits) == ["a"] and hits[0].description == "a1"
+    assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+
+    # 更新已有的行，不新增
+    store.upsert_components(["b"], vectors[0:1], ["b-new"])
+    assert len(store) == 3
+    hits = store.search(vectors[0], top_k=2)[0]
+    assert set(_ids(hits)) == {"a", "b"}
+    assert store.search(vectors[1], top_k=1)[0][0].score < 0.5  # b 的旧向量已被覆盖
+
+
+def test_upsert_validates_shapes(local_store):
+    store = local_store()
+    with pytest.raises(ValueError):
+        store.upsert_components(["a", "b"], _random_vectors(1), ["a", "b"])
+    with pytest.raises(ValueError):
+        store.upsert_components(["a"], np.ones((1, DIM + 1), np.float32), ["a"])
+
+
+def test_delete_swaps_last_row_and_persists(local_store):
+    store = local_store()
+    vectors = _random_vectors(5)
+    ids = ["c0", "c1", "c2", "c3", "c4"]
+    store.upsert_components(ids, vectors, [f"d-{i}" for i in ids])
+
+    assert store.delete_components(["c1", "missing"]) == 1
+    assert len(store) == 4
+    # 最后一行挪到被删除的位置，行号映射同步更新
+    assert store._ids == ["c0", "c4", "c2", "c3"]
+    assert store._rows == {"c0": 0, "c4": 1, "c2": 2, "c3": 3}
+    hits = store.search(vectors[4], top_k=1)[0]
+    assert _ids(hits) == ["c4"] and hits[0].description == "d-c4"
+    assert "c1" not in _ids(store.search(vectors[1], top_k=4)[0])
+
+    # 删除最后一行不需要交换
+    assert store.delete_components(["c3"]) == 1
+    assert store._ids == ["c0", "c4", "c2"]
+    store.close()
+
+    reopened = local_store()
+    assert len(reopened) == 3
+    ids, exported = reopened.export_vectors()
+    assert ids == ["c0", "c4", "c2"]
+    np.testing.assert_allclose(exported, vectors[[0, 4, 2]], rtol=1e-6)
+
+
+def test_flat_matches_brute_force(local_store):
+    store = local_store()
+    vectors = _random_vectors(500, seed=1)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    store.upsert_components(ids, vectors, ids)
+
+    queries = _random_vectors(10, seed=2)
+    expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+    results = store.search(queries, top_k=5)
+    assert [_ids(hits) for hits in results] == [[f"c{j}" for j in row] for row in expected]
+
+
+def _clustered(n: int, clusters: int, seed: int = 3):
+    rng = np.random.default_rng(seed)
+    centers = _random_vectors(clusters, seed=seed)
+    labels = rng.integers(0, clusters, n)
+    return _normalize(centers[labels] + 0.05 * rng.standard_normal((n, DIM)))
+
+
+def test_ivf_recall_and_writes_after_training(local_store):
+    store = local_store(index_type="IVF", nlist=16, ivf_min_rows=100)
+    vectors = _clustered(2000, 16)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    store.upsert_components(ids, vectors, ids)
+
+    queries = vectors[:50]
+    expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :10]
+    results = store.search(queries, top_k=10, nprobe=4)
+    assert store._ivf.centroids is not None
+    recall = np.mean([len(set(_ids(hits)) & {f"c{j}" for j in row}) / 10
+                      for hits, row in zip(results, expected)])
+    assert recall >= 0.95
+
+    # 训练后的写入和删除直接进入对应的簇
+    store.upsert_components(["new"], vectors[7:8], ["new"])
+    assert "new" in _ids(store.search(vectors[7], top_k=2, nprobe=4)[0])
+    store.delete_components(["c7", "new"])
+    assert not {"c7", "new"} & set(_ids(store.search(vectors[7], top_k=5, nprobe=4)[0]))
+
+
+def test_rebuild_index_switches_between_flat_and_ivf(local_store):
+    store = local_store(ivf_min_rows=100)
+    vectors = _clustered(1000, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    store.upsert_components(ids, vectors, ids)
+
+    stats = store.rebuild_index(IndexSpec("IVF_FLAT", build_params={"nlist": 8}, search_params={"nprobe": 8}))
+    assert stats["index_type"] == "IVF" and stats["rows"] == 1000
+    assert (store.nlist, store.nprobe) == (8, 8)
+    # nprobe 等于 nlist 时扫描全部簇，结果与暴力检索一致
+    assert _ids(store.search(vectors[0], top_k=3)[0])[0] == "c0"
+
+    assert store.rebuild_index(IndexSpec("FLAT"))["index_type"] == "FLAT"
+    assert store._ivf is None
+    with pytest.raises(ValueError):
+        store.rebuild_index(IndexSpec("HNSW"))
+
+
+def test_rebuild_index_without_spec_keeps_index_type(local_store):
+    vectors = _clustered(500, 8)
+    ids = [f"c{i}" for i in range(len(vectors))]
+
+    flat = local_store(index_type="FLAT")
+    flat.upsert_components(ids, vectors, ids)
+    assert flat.rebuild_index()["index_type"] == "FLAT"
+    assert flat.index_type == "FLAT" and flat._ivf is None
+
+    ivf = local_store(index_type="IVF", nlist=8, ivf_min_rows=100)
+    ivf.upsert_components(ids, vectors, ids)
+    old = ivf._ivf
+    assert ivf.rebuild_index()["index_type"] == "IVF"
+    assert ivf._ivf is not old and ivf._ivf.centroids is not None
@@ -0,0 +1,142 @@
+"""SearchResultCache 与 MilvusDataManager 检索结果缓存：命中、部分命中、写入失效、等待期和 TTL"""
+
+import dataclasses
+import time
+
+import numpy as np
+import pytest
+
+from config.config import MILVUS_CONFIG, MODEL_CONFIG
+from core.search_cache import SearchResultCache
+from core.vector_store import SearchHit
+
+
+def _key(i: int, top_k: int = 3) -> str:
+    vector = np.zeros(4, dtype=np.float32)
+    vector[i] = 1.0
+    return SearchResultCache.make_key(vector, top_k, {"metric_type": "IP", "params": {}}, ["description"])
+
+
+def test_key_covers_vector_top_k_params_and_fields():
+    vector = np.ones(4, dtype=np.float32)
+    base = SearchResultCache.make_key(vector, 3, {"params": {"ef": 64}}, ["description"])
+    assert base == SearchResultCache.make_key(vector.copy(), 3, {"params": {"ef": 64}}, ["description"])
+    assert base != SearchResultCache.make_key(vector, 5, {"params": {"ef": 64}}, ["description"])
+    assert base != SearchResultCache.make_key(vector, 3, {"params": {"ef": 128}}, ["description"])
+    assert base != SearchResultCache.make_key(vector, 3, {"params": {"ef": 64}}, [])
+    assert base != SearchResultCache.make_key(vector * 2, 3, {"params": {"ef": 64}}, ["description"])
+
+
+def test_put_rejected_after_bump_and_during_settle():
+    cache = SearchResultCache(settle_seconds=0.0)
+    version, started_at = cache.version, time.monotonic()
+    cache.bump()  # 检索期间有写入
+    assert not cache.put_many([_key(0)], [[SearchHit("a", 1.0)]], version, started_at)
+
+    cache = SearchResultCache(settle_seconds=60.0)
+    cache.bump()
+    assert not cache.put_many([_key(0)], [[SearchHit("a", 1.0)]], cache.version, time.monotonic())
+    assert cache.get_stats()["rejected_puts"] == 1
+
+
+def test_hits_are_immutable_and_lists_not_shared():
+    cache = SearchResultCache(settle_seconds=0.0)
+    assert cache.put_many([_key(0)], [[SearchHit("a", 1.0, "da")]], cache.version, time.monotonic())
+
+    first = cache.get_many([_key(0)])[0]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        first[0].score = 0.0
+    first.append(SearchHit("x", 0.0))
+    assert cache.get_many([_key(0)])[0] == [SearchHit("a", 1.0, "da")]
+
+
+def test_lru_and_ttl():
+    cache = SearchResultCache(max_entries=2, ttl_seconds=60.0, settle_seconds=0.0)
+    cache.put_many([_key(0), _key(1)], [[], []], cache.version, time.monotonic())
+    cache.get_many([_key(0)])
+    cache.put_many([_key(2)], [[]], cache.version, time.monotonic())
+    assert [hit is not None for hit in cache.get_many([_key(0), _key(1), _key(2)])] == [True, False, True]
+
+    cache = SearchResultCache(ttl_seconds=0.01, settle_seconds=0.0)
+    cache.put_many([_key(0)], [[]], cache.version, time.monotonic())
+    time.sleep(0.02)
+    assert cache.get_many([_key(0)]) == [None]
+    assert cache.get_stats()["expired"] == 1
+
+
+@pytest.fixture
+def cached_manager(fake_milvus, monkeypatch):
+    """开启结果缓存、没有写入等待期的 MilvusDataManager，已写入 a-d 四个部件"""
+    milvus_manager, fake = fake_milvus
+    monkeypatch.setattr(MILVUS_CONFIG, "result_cache_settle_seconds", 0.0)
+    monkeypatch.setattr(MILVUS_CONFIG, "result_cache_size", 128)
+    manager = milvus_manager.MilvusDataManager(use_directory=False)
+    vectors = np.eye(4, MODEL_CONFIG.embedding_dim, dtype=np.float32)
+    manager.upsert_components(list("abcd"), vectors, ["da", "db", "dc", "dd"])
+    return manager, fake, vectors
+
+
+def test_manager_serves_repeats_from_cache(cached_manager):
+    manager, fake, vectors = cached_manager
+    first = manager.search(vectors[:2], top_k=3)
+    assert manager.search(vectors[:2], top_k=3) == first
+    assert len(fake.searches) == 1
+
+    # 部分命中：只把未命中的向量发给 Milvus
+    third = manager.search(vectors[:3], top_k=3)
+    assert third[:2] == first
+    assert fake.searches[-1][2] == 1
+
+    # top_k 或检索参数不同不共用缓存
+    manager.search(vectors[:2], top_k=4)
+    assert len(fake.searches) == 3
+    stats = manager.get_result_cache_stats()
+    assert stats["hits"] == 4 and stats["misses"] == 5
+
+
+@pytest.mark.parametrize("write", ["upsert", "delete", "insert", "rebuild"])
+def test_manager_writes_invalidate_cache(cached_manager, write):
+    manager, fake, vectors = cached_manager
+    before = manager.search(vectors[:1], top_k=4)[0]
+    assert [hit.component_id for hit in before][0] == "a"
+
+    if write == "upsert":
+        manager.upsert_components(["a"], vectors[1:2], ["moved"])
+    elif write == "delete":
+        manager.delete_components(["a"])
+    elif write == "insert":
+        manager.insert_component("e", vectors[0], "de")
+    else:
+        from core.index_spec import IndexSpec
+        manager.rebuild_index(IndexSpec("HNSW"))
+
+    after = manager.search(vectors[:1], top_k=4)[0]
+    assert len(fake.searches) == 2
+    if write == "upsert":
+        assert after[0].component_id != "a"
+    elif write == "delete":
+        assert "a" not in [hit.component_id for hit in after]
+    elif write == "insert":
+        assert {"a", "e"} <= {hit.component_id for hit in after}
+    else:
+        assert after == before
+
+
+def test_failed_write_still_invalidates(cached_manager):
+    manager, fake, vectors = cached_manager
+    manager.search(vectors[:1], top_k=2)
+    fake.fail_next_delete = RuntimeError("milvus down")
+    with pytest.raises(RuntimeError):
+        manager.delete_components(["a"])
+    manager.search(vectors[:1], top_k=2)
+    assert len(fake.searches) == 2
+
+
+def test_settle_window_skips_caching(cached_manager):
+    manager, fake, vectors = cached_manager
+    manager.result_cache.settle_seconds = 60.0
+    manager.upsert_components(["e"], vectors[:1], ["de"])
+    manager.search(vectors[:1], top_k=2)
+    manager.search(vectors[:1], top_k=2)
+    assert len(fake.searches) == 2
+    assert manager.get_result_cache_stats()["rejected_puts"] == 2
@@ -0,0 +1,25 @@
+"""向量交接：float32 矩阵切片可以直接交给 pymilvus 打包，不需要先 .tolist()"""
+
+import numpy as np
+import pytest
+
+from benchmarks.vector_handoff import measure_client_packing, new_handoff
+
+
+def test_entity_to_field_data_accepts_ndarray():
+    pytest.importorskip("pymilvus")
+    from pymilvus.client import entity_helper
+    from pymilvus.client.types import DataType
+
+    matrix = np.random.default_rng(0).standard_normal((6, 4), dtype=np.float32)
+    chunk = new_handoff(matrix, chunk_size=6)[0]
+    assert isinstance(chunk, np.ndarray)
+
+    entity = {"name": "vector", "type": DataType.FLOAT_VECTOR, "values": chunk}
+    field_info = {"name": "vector", "type": DataType.FLOAT_VECTOR, "params": {"dim": 4}}
+    field_data = entity_helper.entity_to_field_data(entity, field_info, len(chunk))
+    assert field_data.vectors.dim == 4
+    np.testing.assert_allclose(np.asarray(field_data.vectors.float_vector.data, dtype=np.float32), matrix.ravel())
+
+    # 基准里的打包路径也能直接处理矩阵切片
+    assert measure_client_packing(new_handoff(matrix, chunk_size=4)) >= 0
@@ -0,0 +1,93 @@
+"""search_text 的部件名称目录快速路径：默认关闭、命中形状、别名，以及后台刷新"""
+
+import json
+import time
+import threading
+
+from config.config import MILVUS_CONFIG
+
+COMPONENTS = ["中控屏", "方向盘", "座椅", "前灯", "车轮", "后视镜"]
+
+
+def _fill(store):
+    embedder = store.text_embedder
+    store.upsert_components(COMPONENTS, [embedder.vector(c) for c in COMPONENTS],
+                            [f"{c}的描述" for c in COMPONENTS])
+
+
+def test_exact_match_is_opt_in_and_returns_top_k(local_store):
+    store = local_store()
+    _fill(store)
+
+    hits = store.search_text("中控屏", top_k=3)[0]
+    assert len(hits) == 3
+    assert hits[0].component_id == "中控屏"
+    assert store.text_embedder.calls == [["中控屏"]]
+    assert store._directory_loaded_at is None  # 默认不走目录
+
+
+def test_exact_match_returns_single_hit(local_store, tmp_path):
+    with open(tmp_path / "aliases.json", "w", encoding="utf-8") as f:
+        json.dump({"中控屏": ["中控大屏"]}, f, ensure_ascii=False)
+    store = local_store()
+    _fill(store)
+
+    results = store.search_text(["中控屏", "中控大屏", " 方 向 盘 ", "天窗"], top_k=3, exact_match=True)
+    for text_hits in results[:3]:
+        assert len(text_hits) == 1 and text_hits[0].score == 1.0
+    assert [r[0].component_id for r in results[:3]] == ["中控屏", "中控屏", "方向盘"]
+    assert results[0][0].description == "中控屏的描述"
+    # 没有精确命中的文本才做向量检索
+    assert len(results[3]) == 3
+    assert store.text_embedder.calls == [["天窗"]]
+
+
+def test_directory_refreshes_in_background(local_store, monkeypatch):
+    monkeypatch.setattr(MILVUS_CONFIG, "directory_refresh_seconds", 0.05)
+    store = local_store()
+    rows = [("中控屏", "d1")]
+    loads = []
+
+    def directory_rows(batch_size):
+        loads.append(threading.current_thread().name)
+        return list(rows)
+
+    monkeypatch.setattr(store, "_directory_rows", directory_rows)
+    assert store.search_text("中控屏", exact_match=True)[0][0].component_id == "中控屏"
+    assert loads == [threading.current_thread().name]
+
+    # 其他进程入库的新部件由后台线程加载进来，检索路径不再触发加载
+    rows.append(("天窗", "d2"))
+    deadline = time.monotonic() + 5
+    while store.directory.lookup("天窗") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.directory.lookup("天窗") is not None
+    assert set(loads[1:]) == {"directory-refresh"}
+
+    refresher = store._directory_refresher
+    store.close()
+    assert not refresher.is_alive()
+    count = len(loads)
+    time.sleep(0.15)
+    assert len(loads) == count
+
+
+def test_refresh_failure_keeps_old_directory(local_store, monkeypatch):
+    monkeypatch.setattr(MILVUS_CONFIG, "directory_refresh_seconds", 0.02)
+    store = local_store()
+    _fill(store)
+    store.load_directory()
+
+    calls = []
+
+    def broken(batch_size):
+        calls.append(1)
+        raise RuntimeError("milvus down")
+
+    monkeypatch.setattr(store, "_directory_rows", broken)
+    deadline = time.monotonic() + 5
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) >= 2
+    assert store.directory.lookup("座椅") is not None
+    assert store._directory_refresher.is_alive()